@@ -1,4 +1,7 @@
-from news_mcp_server.app import app
+from news_mcp_server.app import create_app
+
+# 应用只在入口处创建；也可以直接 uvicorn news_mcp_server.app:create_app --factory
+app = create_app()
 
 __all__ = ["app"]
 
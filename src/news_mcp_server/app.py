@@ -1,46 +1,75 @@
-from fastapi import FastAPI
-from starlette.middleware import Middleware
-from starlette.middleware.cors import CORSMiddleware
-from .mcp_server import mcp_app
-from .middlewares.auth import SimpleAuthMiddleware
-from .middlewares.monitor import MonitorMiddleware, metrics
-from .middlewares.rate_limit import RedisRateLimitMiddleware
-from .config.settings import app_settings
-
-middlewares = [
-    # IP 速率限制
-    Middleware(RedisRateLimitMiddleware,
-               redis_url=app_settings.REDIS_URL,
-               max_requests=app_settings.RATE_LIMIT_MAX,
-               window_seconds=app_settings.RATE_LIMIT_WINDOW),
-    # 监控中间件
-    Middleware(MonitorMiddleware),
-    # 简单认证
-    Middleware(SimpleAuthMiddleware),
-]
+"""
+应用工厂。FastAPI / fastmcp / elasticsearch / redis / prometheus 等依赖只在 create_app() 中导入，
+import 本模块几乎没有开销；应用实例只在入口（main.py 或 uvicorn --factory）中创建。
+"""
 
 allow_origins = [
     "http://localhost:8000",
 ]
 
 
+def build_middlewares() -> list:
+    from starlette.middleware import Middleware
+    from .config.settings import app_settings
+    from .middlewares.auth import SimpleAuthMiddleware
+    from .middlewares.monitor import MonitorMiddleware
+    from .middlewares.profiling import RequestWindowProfilingMiddleware
+    from .middlewares.rate_limit import RedisRateLimitMiddleware
+    from .middlewares.tracing import SpanMiddleware, TracingMiddleware
+
+    return [
+        # 按需采样（最外层，覆盖整条中间件链）
+        Middleware(RequestWindowProfilingMiddleware),
+        # 链路追踪根 span，之后每层中间件各有一个 span
+        Middleware(TracingMiddleware),
+        # IP 速率限制
+        Middleware(SpanMiddleware, name="rate_limit"),
+        Middleware(RedisRateLimitMiddleware,
+                   redis_url=app_settings.REDIS_URL,
+                   max_requests=app_settings.RATE_LIMIT_MAX,
+                   window_seconds=app_settings.RATE_LIMIT_WINDOW),
+        # 监控中间件
+        Middleware(SpanMiddleware, name="monitor"),
+        Middleware(MonitorMiddleware),
+        # 简单认证
+        Middleware(SpanMiddleware, name="auth"),
+        Middleware(SimpleAuthMiddleware),
+        # 按租户配额限流（依赖认证识别出的租户）
+        Middleware(SpanMiddleware, name="tenant_rate_limit"),
+        Middleware(RedisRateLimitMiddleware,
+                   redis_url=app_settings.REDIS_URL,
+                   max_requests=app_settings.RATE_LIMIT_MAX,
+                   window_seconds=app_settings.RATE_LIMIT_WINDOW,
+                   per_tenant=True),
+    ]
+
+
+async def healthcheck():
+    return {"status": "ok"}
+
+
 def create_app():
-    app = FastAPI(lifespan=mcp_app.lifespan, middleware=middlewares)
+    from fastapi import FastAPI
+    from starlette.middleware.cors import CORSMiddleware
+    from .config.settings import app_settings
+    from .mcp_server import create_http_app, mcp
+    from .middlewares.monitor import metrics
+    from .middlewares.profiling import get_profile, profile_window
+    from .utils.logger import configure_logging
+    from .utils.tracing import setup_tracing
+
+    configure_logging()
+    setup_tracing(app_settings)
+    mcp_app = create_http_app(mcp)
+    app = FastAPI(lifespan=mcp_app.lifespan, middleware=build_middlewares())
     app.add_middleware(CORSMiddleware,
                        allow_origins=allow_origins,
                        allow_credentials=True,
                        allow_methods=["*"],
                        allow_headers=["*"])
+    app.add_api_route("/healthcheck", healthcheck, methods=["GET"])
     app.add_route("/metrics", metrics)
+    app.add_route("/debug/profile", profile_window, methods=["POST"])
+    app.add_route("/debug/profile/{profile_id}", get_profile, methods=["GET"])
     app.mount("/mcp-server", mcp_app)
     return app
-
-app = create_app()
-
-
-@app.get("/healthcheck")
-async def healthcheck():
-    return {"status": "ok"}
-
-
-
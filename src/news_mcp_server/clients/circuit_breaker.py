@@ -0,0 +1,119 @@
+"""
+ES 调用熔断器：
+- closed：正常放行，在滑动时间窗口内统计失败与慢调用
+- open：失败率或慢调用率超过阈值后打开，期间直接拒绝，不再消耗 tenacity 重试
+- half_open：打开一段时间后放行少量探测请求，全部成功则关闭，任一失败或过慢则重新打开
+"""
+import asyncio
+import time
+from collections import deque
+from elastic_transport import TransportError
+from elasticsearch import ApiError
+from prometheus_client import Counter, Gauge
+from ..exceptions import CircuitOpenException
+from ..utils.logger import logger
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+BREAKER_STATE = Gauge("mcp_es_breaker_state", "ES 熔断器状态 (0=closed, 1=half_open, 2=open)")
+BREAKER_TRANSITIONS = Counter("mcp_es_breaker_transitions_total", "ES 熔断器状态切换次数", ["state"])
+BREAKER_REJECTED = Counter("mcp_es_breaker_rejected_total", "熔断器打开期间被拒绝的 ES 调用数")
+
+_STATE_VALUES = {STATE_CLOSED: 0, STATE_HALF_OPEN: 1, STATE_OPEN: 2}
+
+
+def is_breaker_failure(exc: BaseException) -> bool:
+    """只有连接/超时错误与 5xx 计为失败，4xx（查询本身有误）不影响熔断"""
+    if isinstance(exc, ApiError):
+        return exc.meta.status >= 500
+    return isinstance(exc, (TransportError, asyncio.TimeoutError))
+
+
+class CircuitBreaker:
+    def __init__(self,
+                 failure_rate: float = 0.5,
+                 slow_call_threshold: float = 2.0,
+                 slow_call_rate: float = 0.8,
+                 min_calls: int = 10,
+                 window: float = 30.0,
+                 open_seconds: float = 15.0,
+                 half_open_calls: int = 3):
+        self.failure_rate = failure_rate
+        self.slow_call_threshold = slow_call_threshold
+        self.slow_call_rate = slow_call_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        self.state = STATE_CLOSED
+        self._calls = deque()  # (结束时间, 是否失败, 是否慢调用)
+        self._opened_at = 0.0
+        self._probes = 0  # 半开状态下已放行的探测数
+        self._probe_successes = 0
+        BREAKER_STATE.set(0)
+
+    def _transition(self, state: str) -> None:
+        if state == self.state:
+            return
+        logger.warning("es-breaker-transition", previous=self.state, state=state)
+        self.state = state
+        BREAKER_STATE.set(_STATE_VALUES[state])
+        BREAKER_TRANSITIONS.labels(state=state).inc()
+        if state == STATE_OPEN:
+            self._opened_at = time.monotonic()
+        elif state == STATE_HALF_OPEN:
+            self._probes = self._probe_successes = 0
+        else:
+            self._calls.clear()
+
+    def before_call(self) -> None:
+        """调用 ES 前检查，熔断打开或半开探测名额已满时抛出 CircuitOpenException"""
+        if self.state == STATE_OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._transition(STATE_HALF_OPEN)
+        if self.state == STATE_CLOSED:
+            return
+        if self.state == STATE_HALF_OPEN and self._probes < self.half_open_calls:
+            self._probes += 1
+            return
+        BREAKER_REJECTED.inc()
+        raise CircuitOpenException("Elasticsearch circuit breaker is open")
+
+    def on_success(self, latency: float) -> None:
+        slow = latency >= self.slow_call_threshold
+        if self.state == STATE_HALF_OPEN:
+            if slow:
+                self._transition(STATE_OPEN)
+                return
+            self._probe_successes += 1
+            if self._probe_successes >= self.half_open_calls:
+                self._transition(STATE_CLOSED)
+            return
+        self._record(failed=False, slow=slow)
+
+    def on_failure(self) -> None:
+        if self.state == STATE_HALF_OPEN:
+            self._transition(STATE_OPEN)
+            return
+        self._record(failed=True, slow=False)
+
+    def on_ignored(self) -> None:
+        """调用被取消或因请求本身出错，不计入统计；半开状态下归还探测名额"""
+        if self.state == STATE_HALF_OPEN and self._probes > 0:
+            self._probes -= 1
+
+    def _record(self, failed: bool, slow: bool) -> None:
+        if self.state != STATE_CLOSED:
+            return
+        now = time.monotonic()
+        self._calls.append((now, failed, slow))
+        while self._calls and self._calls[0][0] < now - self.window:
+            self._calls.popleft()
+        total = len(self._calls)
+        if total < self.min_calls:
+            return
+        failures = sum(1 for _, f, _ in self._calls if f)
+        slow_calls = sum(1 for _, _, s in self._calls if s)
+        if failures / total >= self.failure_rate or slow_calls / total >= self.slow_call_rate:
+            self._transition(STATE_OPEN)
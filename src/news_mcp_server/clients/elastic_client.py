@@ -1,46 +1,179 @@
 import asyncio
+import copy
+import json
+import time
+import uuid
 from dataclasses import dataclass
+from datetime import date
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
 from elastic_transport import TransportError
-from typing import List
+from typing import List, Optional, Tuple
 from elasticsearch import AsyncElasticsearch
 from ..config.settings import es_settings
-from ..exceptions import ToolException
+from .circuit_breaker import CircuitBreaker, is_breaker_failure
+from .index_partition import (PARTITION_MONTHLY, PARTITION_NONE, build_index_template, build_routing_pipeline,
+                              monthly_index_name, resolve_indices, routing_pipeline_name)
+from .ranking import RankingProfile, apply_ranking
+from .serializers import SEARCH_FILTER_PATH, TERMS_FILTER_PATH, build_serializer
+from .stale_cache import serve_stale
+from ..exceptions import CircuitOpenException, RequestCancelledException, ToolException
+from ..utils.cancellation import CANCELLED_WORK, CancelToken
 from ..utils.logger import logger
+from ..utils.tracing import tracer
 
 
 OUTPUT_SOURCE_FIELDS = ['news_id', 'title', 'source', 'url', 'release_time']
 
 
+def stop_if_cancelled(retry_state) -> bool:
+    """tenacity 停止条件：调用方已取消时不再重试"""
+    token = retry_state.kwargs.get('cancel_token')
+    if token is None or not token.cancelled:
+        return False
+    CANCELLED_WORK.labels(stage='retry').inc()
+    return True
+
+
 class AsyncElasticClient:
     @dataclass
     class SearchResponse:
         data: List[dict]
         total: int = 0
+        sort: Optional[list] = None  # 最后一条命中的排序值（search_after 游标）
+        scores: Optional[List[float]] = None  # 按相关性排序时各条的得分
 
-    def __init__(self):
+    def __init__(self, breaker: CircuitBreaker = None, stale_cache=None):
+        """
+        breaker: 可选的熔断器，打开期间不再请求 ES
+        stale_cache: 可选的结果缓存（RedisStaleCache / DiskStaleCache），ES 不可用时返回上次结果
+        """
+        self.breaker = breaker
+        self.stale_cache = stale_cache
         # 初始化异步 ElasticSearch 客户端
         self._client = AsyncElasticsearch(es_settings.URL,
-                                          api_key=es_settings.api_key, verify_certs=False)
+                                          api_key=es_settings.api_key, verify_certs=False,
+                                          serializer=build_serializer(es_settings.ES_SERIALIZER),
+                                          http_compress=es_settings.ES_HTTP_COMPRESS)
         self.index = es_settings.ES_INDEX
+        self.partition = es_settings.ES_INDEX_PARTITION
+        self.index_prefix = es_settings.ES_INDEX_PREFIX
+
+    def for_index(self, index: str, index_prefix: str = None) -> "AsyncElasticClient":
+        """
+        查询指定索引/别名的轻量视图（多租户），与原客户端共享连接池、熔断器与降级缓存。
+        未给出分区前缀时直接查询别名，不做分区裁剪。
+        """
+        view = copy.copy(self)
+        view.index = index
+        view.index_prefix = index_prefix or self.index_prefix
+        view.partition = self.partition if index_prefix else PARTITION_NONE
+        return view
+
+    def _resolve_index(self, date_from: str = None, date_to: str = None) -> str:
+        """按 release_time 范围裁剪需要查询的分区，未分区时即为 ES_INDEX"""
+        return resolve_indices(self.index, self.index_prefix, self.partition,
+                               date_from, date_to, es_settings.ES_INDEX_PARTITION_MAX)
+
+    async def _search(self, body: dict, size: int, date_from: str = None, date_to: str = None,
+                      cancel_token: CancelToken = None, filter_path: List[str] = None) -> dict:
+        """统一的 search 调用入口：裁剪分区并记录 es.search span"""
+        params = {'index': self._resolve_index(date_from, date_to),
+                  'body': body,
+                  'size': size,
+                  'source_includes': OUTPUT_SOURCE_FIELDS}
+        if es_settings.ES_FILTER_PATH:
+            params['filter_path'] = filter_path or SEARCH_FILTER_PATH
+        if self.partition == PARTITION_MONTHLY:
+            # 范围内可能存在尚未创建的月份分区
+            params.update(ignore_unavailable=True, allow_no_indices=True)
+        with tracer.start_span("es.search", **{"db.system": "elasticsearch",
+                                               "es.index": params['index'],
+                                               "es.size": size,
+                                               "es.query_bytes": len(json.dumps(body, ensure_ascii=False))}) as span:
+            response = await self._guarded_search(params, cancel_token)
+            shards = response.get('_shards', {})
+            span.set_attributes(**{"es.took_ms": response.get('took'),
+                                   "es.shards.total": shards.get('total'),
+                                   "es.shards.failed": shards.get('failed'),
+                                   "es.hits.total": response.get('hits', {}).get('total', {}).get('value')})
+            return response
+
+    async def _guarded_search(self, params: dict, cancel_token: CancelToken = None) -> dict:
+        """经过熔断器执行查询，按结果与耗时更新熔断统计"""
+        if self.breaker is None:
+            return await self._execute_search(params, cancel_token)
+        self.breaker.before_call()
+        start = time.monotonic()
+        try:
+            response = await self._execute_search(params, cancel_token)
+        except BaseException as e:
+            if is_breaker_failure(e):
+                self.breaker.on_failure()
+            else:
+                self.breaker.on_ignored()
+            raise
+        self.breaker.on_success(time.monotonic() - start)
+        return response
+
+    async def _execute_search(self, params: dict, cancel_token: CancelToken = None) -> dict:
+        """执行查询，cancel_token 触发时中止进行中的请求"""
+        if cancel_token is None:
+            return await self._client.search(**params)
+
+        cancel_token.raise_if_cancelled('es_request')
+        opaque_id = uuid.uuid4().hex
+        search = asyncio.ensure_future(self._client.options(opaque_id=opaque_id).search(**params))
+        cancelled = asyncio.ensure_future(cancel_token.wait())
+        start = time.monotonic()
+        try:
+            await asyncio.wait({search, cancelled}, return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            search.cancel()
+            raise
+        finally:
+            cancelled.cancel()
+        if search.done():
+            return search.result()
+        search.cancel()
+        CANCELLED_WORK.labels(stage='es_request').inc()
+        if time.monotonic() - start >= es_settings.ES_TASK_CANCEL_AFTER:
+            # 长查询：断开连接后再显式取消 ES 端的搜索任务
+            asyncio.create_task(self._cancel_es_tasks(opaque_id))
+        raise RequestCancelledException(f"Search cancelled: {cancel_token.reason}")
+
+    async def _cancel_es_tasks(self, opaque_id: str) -> None:
+        """按 X-Opaque-Id 查找并取消 ES 上仍在运行的搜索任务"""
+        try:
+            response = await self._client.tasks.list(actions='*search*', detailed=True)
+            for node in response.get('nodes', {}).values():
+                for task_id, task in node.get('tasks', {}).items():
+                    if task.get('headers', {}).get('X-Opaque-Id') != opaque_id:
+                        continue
+                    await self._client.tasks.cancel(task_id=task_id)
+                    CANCELLED_WORK.labels(stage='es_task').inc()
+        except Exception as e:
+            logger.warning("es-task-cancel-failed", opaque_id=opaque_id, error=str(e))
 
+    @serve_stale()
     @retry(
         reraise=True,
-        stop=stop_after_attempt(3),
+        stop=stop_after_attempt(3) | stop_if_cancelled,
         wait=wait_exponential(multiplier=1, min=1, max=10),
         retry=(
                 retry_if_exception_type(TransportError) |
                 retry_if_exception_type(asyncio.TimeoutError)
         ),
     )
-    async def search_news(self, query: str, source: str = None, date_from: str = None, date_to: str = None, max_results: int = 10) -> list:
+    async def search_news(self, query: str, source: str = None, date_from: str = None, date_to: str = None, max_results: int = 10,
+                          cancel_token: CancelToken = None, ranking: RankingProfile = None) -> list:
         """
-        ElasticSearch 异步搜索新闻
+        ElasticSearch 异步搜索新闻；ranking 为空时按 BM25 相关性排序
         """
+        title_field = ranking.title_field() if ranking else 'title'
         must_clauses = []
         if query:
             must_clauses.append({'multi_match': {'query': query,
-                                                 'fields': ['title', 'content']}})
+                                                 'fields': [title_field, 'content']}})
         if source:
             must_clauses.append({'term': {'source.keyword': source}})
         if date_from or date_to:
@@ -55,14 +188,14 @@ class AsyncElasticClient:
             body = {'query': {'bool': {'must': must_clauses}}}
         else:
             body = {'query': {'match_all': {}}}
+        if ranking is not None:
+            apply_ranking(body, ranking)
 
-        response = await self._client.search(index=self.index,
-                                             body=body,
-                                             size=max_results,
-                                             source_includes=OUTPUT_SOURCE_FIELDS)
+        response = await self._search(body, max_results, date_from, date_to, cancel_token=cancel_token)
         hits = response.get('hits', {}).get('hits', [])
         return [hit.get('_source', {}) for hit in hits]
 
+    @serve_stale()
     async def search_news_with_secondary_filter(
         self,
         primary_query: str,
@@ -70,7 +203,9 @@ class AsyncElasticClient:
         max_results: int = 10,
         source: str = None,
         date_from: str = None,
-        date_to: str = None
+        date_to: str = None,
+        cancel_token: CancelToken = None,
+        ranking: RankingProfile = None
     ) -> list:
         """
         异步联合搜索：按主查询词和次查询词搜索新闻，支持来源和时间范围过滤
@@ -78,12 +213,13 @@ class AsyncElasticClient:
         logger.info(f"search_news_with_secondary_filter: {primary_query}, {secondary_query}")
         # 限制最大返回结果数
         limit = min(max_results, es_settings.MAX_RESULTS_LIMIT)
+        title_field = ranking.title_field() if ranking else 'title'
         # 构建 bool must 子句
         must_clauses = []
         if primary_query:
-            must_clauses.append({'multi_match': {'query': primary_query, 'fields': ['title', 'content']}})
+            must_clauses.append({'multi_match': {'query': primary_query, 'fields': [title_field, 'content']}})
         if secondary_query:
-            must_clauses.append({'multi_match': {'query': secondary_query, 'fields': ['title', 'content']}})
+            must_clauses.append({'multi_match': {'query': secondary_query, 'fields': [title_field, 'content']}})
         if source:
             must_clauses.append({'term': {'source.keyword': source}})
         if date_from or date_to:
@@ -99,38 +235,57 @@ class AsyncElasticClient:
             body = {'query': {'bool': {'must': must_clauses}}}
         else:
             body = {'query': {'match_all': {}}}
+        if ranking is not None:
+            apply_ranking(body, ranking)
 
         # 执行搜索
-        response = await self._client.search(
-            index=self.index,
-            body=body,
-            size=limit,
-            source_includes=OUTPUT_SOURCE_FIELDS
-        )
+        response = await self._search(body, limit, date_from, date_to, cancel_token=cancel_token)
         hits = response.get('hits', {}).get('hits', [])
         return [hit.get('_source', {}) for hit in hits]
 
-    async def get_by_id(self, news_id: str) -> dict:
+    async def get_by_id(self, news_id: str, cancel_token: CancelToken = None) -> dict:
         """
         ElasticSearch 异步按 ID 查询单条新闻
         """
         try:
-            body = {
-                "query": {
-                    "match": {
-                        "news_id": news_id
-                    }
-                }
-            }
-            response = await self._client.search(index=self.index,
-                                                 body=body,
-                                                 source_includes=OUTPUT_SOURCE_FIELDS,
-                                                 size=1)
-            hits = response.get('hits', {}).get('hits', [])
-            return hits[0].get('_source', {}) if hits else {}
+            return await self._get_by_id(news_id, cancel_token=cancel_token)
+        except (RequestCancelledException, CircuitOpenException):
+            raise
         except Exception:
+            # ES 故障先交给熔断器与降级缓存处理，缓存未命中时才包装为工具异常
             raise ToolException(f'Tool call exception with news_id {news_id}')
 
+    @serve_stale()
+    async def _get_by_id(self, news_id: str, cancel_token: CancelToken = None) -> dict:
+        body = {
+            "query": {
+                "match": {
+                    "news_id": news_id
+                }
+            }
+        }
+        response = await self._search(body, 1, cancel_token=cancel_token)
+        hits = response.get('hits', {}).get('hits', [])
+        return hits[0].get('_source', {}) if hits else {}
+
+    async def get_many(self, news_ids: List[str], cancel_token: CancelToken = None) -> dict:
+        """
+        一次请求批量获取多条新闻，返回 {news_id: _source}，匹配方式与 get_by_id 一致
+        """
+        if not news_ids:
+            return {}
+        body = {'query': {'bool': {'should': [{'match': {'news_id': news_id}} for news_id in news_ids],
+                                   'minimum_should_match': 1}}}
+        # match 可能带回相近 ID，多取一些再按 news_id 精确过滤
+        response = await self._search(body, len(news_ids) * 2, cancel_token=cancel_token)
+        wanted = set(news_ids)
+        docs = {}
+        for hit in response.get('hits', {}).get('hits', []):
+            source = hit.get('_source', {})
+            if source.get('news_id') in wanted:
+                docs.setdefault(source['news_id'], source)
+        return docs
+
     def _append_common_filters(self, must: list, search_word: str, date_from: str, date_to: str):
         """提炼公共过滤器: 添加 search_word 和时间范围到 must 列表"""
         if search_word:
@@ -161,9 +316,22 @@ class AsyncElasticClient:
             self._append_common_filters(must, search_word, date_from, date_to)
             should_clauses.append({'bool': {'must': must}})
 
+    def _build_topic_query(self, primary_queries: List[str], secondary_query: List[str], sources: List[str],
+                           search_word: str, date_from: str, date_to: str, title_boost: float = None) -> dict:
+        """构建 <label>&<filtered_words>|<label>|<source>&<filtered_words>|... 的 bool 查询；title_boost 提高标题命中分支的得分"""
+        secondary_queries = secondary_query or []
+        should_clauses = []
+        for primary in primary_queries or []:
+            phrase = {'query': primary, 'boost': title_boost} if title_boost else primary
+            self._add_clauses(should_clauses, [{'match_phrase': {'title': phrase}}], secondary_queries, search_word, date_from, date_to)
+        for source in sources or []:
+            self._add_clauses(should_clauses, [{'term': {'source.keyword': source}}], secondary_queries, search_word, date_from, date_to)
+        return {'bool': {'should': should_clauses}}
+
+    @serve_stale(result_type="SearchResponse")
     @retry(
         reraise=True,
-        stop=stop_after_attempt(3),
+        stop=stop_after_attempt(3) | stop_if_cancelled,
         wait=wait_exponential(multiplier=1, min=1, max=10),
         retry=(
             retry_if_exception_type(TransportError) |
@@ -178,7 +346,10 @@ class AsyncElasticClient:
             sources: List[str] = None,
             search_word=None,
             date_from: str = None,
-            date_to: str = None
+            date_to: str = None,
+            cancel_token: CancelToken = None,
+            filter_only: bool = False,
+            ranking: RankingProfile = None
     ) -> SearchResponse:
         """
         "根据多个标签列表、筛选词列表(组)、数据源列表以 OR 关系批量查询新闻，支持时间范围筛选. "
@@ -186,27 +357,117 @@ class AsyncElasticClient:
         "允许在基本查询逻辑之上再搜索"
         """
         limit = min(max_results, es_settings.MAX_RESULTS_LIMIT)
-        secondary_queries = secondary_query or []
-        should_clauses = []
-        for primary in primary_queries or []:
-            self._add_clauses(should_clauses, [{'match_phrase': {'title': primary}}], secondary_queries, search_word, date_from, date_to)
-        for source in sources or []:
-            self._add_clauses(should_clauses, [{'term': {'source.keyword': source}}], secondary_queries, search_word, date_from, date_to)
-        body = {'query': {'bool': {'should': should_clauses}}}
-        # 按发布日期降序排序
-        body['sort'] = [{'release_time': {'order': 'desc'}}]
-
-        response = await self._client.search(
-            index=self.index,
-            body=body,
-            size=limit,
-            source_includes=OUTPUT_SOURCE_FIELDS
-        )
+        ranking = ranking or RankingProfile()
+        title_boost = ranking.title_boost if ranking.scored and ranking.title_boost != 1 else None
+        query = self._build_topic_query(primary_queries, secondary_query, sources, search_word, date_from, date_to,
+                                        title_boost=title_boost)
+        if filter_only:
+            # 降级：filter 上下文不计算得分，子句结果可进入 ES 查询缓存
+            query = {'bool': {'filter': [query]}}
+        # 默认按发布日期降序排序
+        body = apply_ranking({'query': query}, ranking)
+
+        response = await self._search(body, limit, date_from, date_to, cancel_token=cancel_token)
         raw_hits = response.get('hits', {})
         hits = raw_hits.get('hits', [])
         total = raw_hits.get("total", {}).get("value", 0)
-        return self.SearchResponse(data=[hit.get('_source', {}) for hit in hits], total=total)
+        return self.SearchResponse(data=[hit.get('_source', {}) for hit in hits], total=total,
+                                   scores=[hit.get('_score') or 0.0 for hit in hits] if ranking.scored else None)
+
+    @retry(
+        reraise=True,
+        stop=stop_after_attempt(3) | stop_if_cancelled,
+        wait=wait_exponential(multiplier=1, min=1, max=10),
+        retry=(
+            retry_if_exception_type(TransportError) |
+            retry_if_exception_type(asyncio.TimeoutError)
+        ),
+    )
+    async def watch_topic_news(
+            self,
+            primary_queries: List[str],
+            secondary_query: List[str] = None,
+            max_results: int = 10,
+            sources: List[str] = None,
+            search_word=None,
+            date_from: str = None,
+            search_after: list = None,
+            cancel_token: CancelToken = None,
+            filter_only: bool = False
+    ) -> SearchResponse:
+        """
+        增量拉取：查询条件与 search_topic_news 相同，但按 (release_time, news_id) 升序排序，
+        并从 search_after 水位之后继续，只返回比上次看到的更新的新闻。
+        date_from 作为下界用于裁剪分区，与 search_after 同时使用时应传入水位的 release_time。
+        返回的 sort 为最后一条命中的排序值，可作为下一次的 search_after。
+        """
+        limit = min(max_results, es_settings.MAX_RESULTS_LIMIT)
+        query = self._build_topic_query(primary_queries, secondary_query, sources, search_word, date_from, None)
+        body = {
+            'query': {'bool': {'filter': [query]}} if filter_only else query,
+            'sort': [{'release_time': {'order': 'asc'}}, {es_settings.ES_TIEBREAK_FIELD: {'order': 'asc'}}],
+            # 只需判断是否还有更多，不必精确计数
+            'track_total_hits': False,
+        }
+        if search_after:
+            body['search_after'] = search_after
 
+        response = await self._search(body, limit, date_from, None, cancel_token=cancel_token)
+        hits = response.get('hits', {}).get('hits', [])
+        return self.SearchResponse(data=[hit.get('_source', {}) for hit in hits],
+                                   total=len(hits),
+                                   sort=hits[-1].get('sort') if hits else None)
+
+    async def terms(self, field: str, size: int, date_from: str = None,
+                    cancel_token: CancelToken = None) -> List[Tuple[str, int]]:
+        """terms 聚合：返回字段取值及文档数，按文档数降序；date_from 限定统计的发布时间范围"""
+        query = {'range': {'release_time': {'gte': date_from}}} if date_from else {'match_all': {}}
+        body = {'query': query,
+                'track_total_hits': False,
+                'aggs': {'values': {'terms': {'field': field, 'size': size}}}}
+        response = await self._search(body, 0, date_from, None, cancel_token=cancel_token,
+                                      filter_path=TERMS_FILTER_PATH)
+        buckets = response.get('aggregations', {}).get('values', {}).get('buckets', [])
+        return [(bucket['key'], bucket['doc_count']) for bucket in buckets]
+
+    async def suggest_titles(self, prefix: str, max_results: int = 5, cancel_token: CancelToken = None) -> List[dict]:
+        """标题输入补全：search_as_you_type 字段上的 bool_prefix 查询，最后一个词按前缀匹配"""
+        field = es_settings.ES_SUGGEST_TITLE_FIELD
+        body = {'query': {'multi_match': {'query': prefix,
+                                          'type': 'bool_prefix',
+                                          'fields': [field, f'{field}._2gram', f'{field}._3gram']}},
+                'track_total_hits': False}
+        response = await self._search(body, max_results, cancel_token=cancel_token)
+        return [hit.get('_source', {}) for hit in response.get('hits', {}).get('hits', [])]
+
+    async def put_routing_pipeline(self):
+        """写入按 release_time 月份路由文档的 ingest pipeline，需在 put_index_template 之前调用"""
+        return await self._client.ingest.put_pipeline(id=routing_pipeline_name(self.index_prefix),
+                                                      **build_routing_pipeline(self.index_prefix))
+
+    async def put_index_template(self, name: str = None, shards: int = 1, replicas: int = 1):
+        """写入分区索引模板，新建的 <prefix>* 分区自动获得映射、查询别名与写入路由 pipeline"""
+        template = build_index_template(self.index_prefix, self.index, shards=shards, replicas=replicas,
+                                        pipeline=routing_pipeline_name(self.index_prefix))
+        return await self._client.indices.put_index_template(name=name or f"{self.index_prefix}template",
+                                                             **template)
+
+    async def rollover(self, day: date = None) -> dict:
+        """
+        按月滚动：将写别名切换到 day 所在月份的分区。
+        写别名不存在时直接创建该分区并设为写索引。
+        写别名只是写入入口，文档最终落在哪个分区由默认 pipeline 按 release_time 决定，
+        晚到的旧新闻仍写入其发布月份的分区，不会因按日期裁剪分区而查不到。
+        """
+        write_alias = es_settings.ES_WRITE_ALIAS or f"{self.index}-write"
+        new_index = monthly_index_name(self.index_prefix, day or date.today())
+        if not await self._client.indices.exists_alias(name=write_alias):
+            await self._client.indices.create(index=new_index, aliases={write_alias: {'is_write_index': True}})
+            return {'rolled_over': True, 'new_index': new_index}
+        if await self._client.indices.exists(index=new_index):
+            return {'rolled_over': False, 'new_index': new_index}
+        response = await self._client.indices.rollover(alias=write_alias, new_index=new_index)
+        return {'rolled_over': response.get('rolled_over', False), 'new_index': new_index}
 
     async def close(self):
         await self._client.close()
\ No newline at end of file
@@ -0,0 +1,132 @@
+"""
+按时间分区的索引辅助函数：
+- 根据 release_time 查询范围计算需要命中的最小分区集合
+- 生成分区索引模板，供滚动创建新分区时使用
+- 生成写入路由的 ingest pipeline：文档按 release_time 所在月份写入对应分区，
+  与查询时按 release_time 裁剪分区保持一致（补录的旧新闻也能被按日期查到）
+"""
+from datetime import date, datetime
+from typing import Iterator, Optional
+
+PARTITION_NONE = "none"
+PARTITION_MONTHLY = "monthly"
+
+
+def parse_date(value: Optional[str]) -> Optional[date]:
+    """解析 YYYY-MM-DD（允许带时间部分），无法解析时返回 None"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.strip()[:10]).date()
+    except ValueError:
+        return None
+
+
+def monthly_index_name(prefix: str, day: date) -> str:
+    """按月分区的索引名，例如 news-2024.06"""
+    return f"{prefix}{day.year:04d}.{day.month:02d}"
+
+
+def iter_months(start: date, end: date) -> Iterator[date]:
+    """按月遍历 [start, end]，返回每月第一天"""
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        yield date(year, month, 1)
+        month += 1
+        if month > 12:
+            year, month = year + 1, 1
+
+
+def resolve_indices(alias: str,
+                    prefix: str,
+                    partition: str,
+                    date_from: Optional[str] = None,
+                    date_to: Optional[str] = None,
+                    max_partitions: int = 24,
+                    today: Optional[date] = None) -> str:
+    """
+    根据时间范围计算查询目标。无法裁剪（未分区、无起始日期、日期非法、跨度过大）时回退到别名，
+    否则返回逗号分隔的分区索引列表。
+    """
+    if partition != PARTITION_MONTHLY:
+        return alias
+    start = parse_date(date_from)
+    if start is None:
+        return alias
+    end = parse_date(date_to) or today or date.today()
+    if end < start:
+        return alias
+    months = list(iter_months(start, end))
+    if len(months) > max_partitions:
+        return alias
+    return ",".join(monthly_index_name(prefix, month) for month in months)
+
+
+def routing_pipeline_name(prefix: str) -> str:
+    return f"{prefix}route-by-release-time"
+
+
+def build_routing_pipeline(prefix: str) -> dict:
+    """按 release_time 月份改写 _index 的 ingest pipeline，分区不存在时由索引模板自动创建"""
+    return {
+        "description": f"Route documents to {prefix}YYYY.MM by release_time",
+        "processors": [{
+            "date_index_name": {
+                "field": "release_time",
+                "index_name_prefix": prefix,
+                "date_rounding": "M",
+                "index_name_format": "yyyy.MM",
+                "date_formats": ["yyyy-MM-dd HH:mm:ss", "yyyy-MM-dd", "ISO8601", "UNIX_MS"],
+            }
+        }],
+    }
+
+
+def build_index_template(prefix: str, alias: str, shards: int = 1, replicas: int = 1,
+                         pipeline: Optional[str] = None) -> dict:
+    """分区索引模板：所有 <prefix>* 索引共享映射，并自动加入查询别名；pipeline 为写入路由的默认 pipeline"""
+    template = {
+        "index_patterns": [f"{prefix}*"],
+        "template": {
+            "settings": {
+                "number_of_shards": shards,
+                "number_of_replicas": replicas,
+                "analysis": {
+                    "filter": {
+                        "title_shingle": {"type": "shingle", "min_shingle_size": 2, "max_shingle_size": 4,
+                                          "output_unigrams": False},
+                    },
+                    "analyzer": {
+                        "title_phrases": {"type": "custom", "tokenizer": "standard",
+                                          "filter": ["lowercase", "title_shingle"]},
+                    },
+                },
+            },
+            "mappings": {
+                "properties": {
+                    "news_id": {"type": "text", "fields": {"keyword": {"type": "keyword"}}},
+                    "title": {
+                        "type": "text",
+                        "fields": {
+                            # 标题输入补全
+                            "suggest": {"type": "search_as_you_type"},
+                            # 标题短语（2-4 词的 shingle），供 terms 聚合统计高频短语；只加载出现频率足够的词项
+                            "phrases": {"type": "text", "analyzer": "title_phrases", "fielddata": True,
+                                        "fielddata_frequency_filter": {"min": 0.0001, "min_segment_size": 500}},
+                        },
+                    },
+                    "content": {"type": "text"},
+                    "source": {"type": "text", "fields": {"keyword": {"type": "keyword"}}},
+                    "url": {"type": "keyword"},
+                    "release_time": {
+                        "type": "date",
+                        "format": "yyyy-MM-dd HH:mm:ss||yyyy-MM-dd||strict_date_optional_time||epoch_millis",
+                    },
+                }
+            },
+            "aliases": {alias: {}},
+        },
+    }
+    if pipeline:
+        template["template"]["settings"]["index.default_pipeline"] = pipeline
+    return template
@@ -0,0 +1,87 @@
+"""
+排序配置：在 ES 端完成相关性与时效性的平衡，调用方取前 N 条即可，无需拉取大量结果后自行重排。
+- time：按 release_time 降序
+- relevance：按 BM25 相关性，可通过 title_boost 为标题字段加权
+- hybrid：相关性 × 时效衰减。function_score 以 release_time 的衰减函数计算时效分，
+  最终得分 = BM25 × ((1 - recency_weight) + recency_weight × decay)，
+  recency_weight 为 0 时等同 relevance，为 1 时完全按衰减函数压低旧新闻
+"""
+from dataclasses import dataclass, fields, replace
+from typing import Optional
+
+RANKING_TIME = "time"
+RANKING_RELEVANCE = "relevance"
+RANKING_HYBRID = "hybrid"
+RANKING_MODES = (RANKING_TIME, RANKING_RELEVANCE, RANKING_HYBRID)
+
+
+@dataclass(frozen=True)
+class RankingProfile:
+    mode: str = RANKING_TIME
+    title_boost: float = 1.0  # 标题相对正文的权重，默认不加权，与引入排序配置前的查询一致
+    decay_function: str = "gauss"  # gauss | exp | linear
+    scale: str = "3d"  # 距 origin 为 offset + scale 时衰减到 decay
+    offset: str = "12h"  # 该时间内的新闻不衰减
+    decay: float = 0.5
+    recency_weight: float = 0.7
+
+    @property
+    def scored(self) -> bool:
+        return self.mode != RANKING_TIME
+
+    def with_mode(self, mode: Optional[str]) -> "RankingProfile":
+        if not mode:
+            return self
+        if mode not in RANKING_MODES:
+            raise ValueError(f"Unsupported ranking mode: {mode}")
+        return replace(self, mode=mode)
+
+    def title_field(self, field: str = "title") -> str:
+        return f"{field}^{self.title_boost:g}" if self.scored and self.title_boost != 1 else field
+
+
+# 各工具默认排序，保持与引入排序配置前一致；可通过 RANKING_PROFILES 按工具覆盖
+DEFAULT_PROFILES = {
+    "search_news": RankingProfile(mode=RANKING_RELEVANCE),
+    "search_news_with_secondary_filter": RankingProfile(mode=RANKING_RELEVANCE),
+    "search_topic_news": RankingProfile(mode=RANKING_TIME),
+}
+
+
+def load_profiles(overrides: dict) -> dict:
+    """合并默认配置与 {tool: {field: value}} 形式的覆盖项"""
+    names = {f.name for f in fields(RankingProfile)}
+    profiles = dict(DEFAULT_PROFILES)
+    for tool, values in (overrides or {}).items():
+        unknown = set(values) - names
+        if unknown:
+            raise ValueError(f"Unknown ranking settings for {tool}: {sorted(unknown)}")
+        profile = replace(profiles.get(tool, RankingProfile()), **values)
+        profile.with_mode(profile.mode)  # 校验 mode
+        profiles[tool] = profile
+    return profiles
+
+
+def apply_ranking(body: dict, profile: Optional[RankingProfile]) -> dict:
+    """按排序配置补充 body 的 sort 或把 query 包装为 function_score"""
+    profile = profile or RankingProfile()
+    if profile.mode == RANKING_TIME:
+        body['sort'] = [{'release_time': {'order': 'desc'}}]
+    elif profile.mode == RANKING_HYBRID:
+        functions = []
+        if profile.recency_weight < 1:
+            # 常数项：保证旧新闻仍保留 (1 - recency_weight) 的相关性得分
+            functions.append({'weight': 1 - profile.recency_weight})
+        if profile.recency_weight > 0:
+            functions.append({profile.decay_function: {'release_time': {'origin': 'now',
+                                                                        'scale': profile.scale,
+                                                                        'offset': profile.offset,
+                                                                        'decay': profile.decay}},
+                              'weight': profile.recency_weight})
+        body['query'] = {'function_score': {
+            'query': body['query'],
+            'functions': functions,
+            'score_mode': 'sum',
+            'boost_mode': 'multiply',
+        }}
+    return body
@@ -0,0 +1,231 @@
+"""
+ES 查询结果的持久化缓存，用于 ES 不可用时的降级返回：
+- 每次查询成功后按 (方法, 参数) 写入最近一次结果
+- 熔断打开或重试耗尽时，相同查询返回缓存结果，并在每条结果上标记 stale 与 cached_at
+缓存可存于 Redis（多实例共享）或本地磁盘（单实例、无 Redis 依赖）。
+磁盘缓存没有 Redis 的过期机制，读到过期文件即删除，写入时定期清扫过期文件并限制文件总数。
+"""
+import asyncio
+import functools
+import hashlib
+import heapq
+import inspect
+import json
+import os
+import time
+from dataclasses import asdict, is_dataclass
+from datetime import datetime, timezone
+from typing import Optional
+from prometheus_client import Counter
+from ..exceptions import CircuitOpenException
+from ..utils.logger import logger
+from ..utils.tracing import tracer
+from .circuit_breaker import is_breaker_failure
+
+STALE_CACHE_LOOKUPS = Counter("mcp_stale_cache_lookups_total", "ES 不可用时的缓存查询次数", ["method", "result"])
+
+
+def cache_key(method: str, arguments: dict) -> str:
+    payload = json.dumps({"method": method, "arguments": arguments}, sort_keys=True, ensure_ascii=False, default=str)
+    return f"{method}:{hashlib.sha1(payload.encode()).hexdigest()}"
+
+
+class RedisStaleCache:
+    KEY_PREFIX = "es-stale:"
+
+    def __init__(self, redis_url: str, ttl: int = 24 * 60 * 60):
+        self.redis_url = redis_url
+        self.ttl = ttl
+        self._redis = None
+
+    async def _get_redis(self):
+        if self._redis is None:
+            from redis import asyncio as aioredis
+            self._redis = await aioredis.from_url(self.redis_url, encoding="utf-8", decode_responses=True)
+        return self._redis
+
+    async def get(self, key: str) -> Optional[dict]:
+        redis = await self._get_redis()
+        with tracer.start_span("redis.get", **{"db.system": "redis"}):
+            raw = await redis.get(self.KEY_PREFIX + key)
+        return json.loads(raw) if raw else None
+
+    async def set(self, key: str, value: dict) -> None:
+        redis = await self._get_redis()
+        with tracer.start_span("redis.setex", **{"db.system": "redis"}):
+            await redis.setex(self.KEY_PREFIX + key, self.ttl, json.dumps(value, ensure_ascii=False))
+
+    async def close(self) -> None:
+        if self._redis is not None:
+            await self._redis.close()
+            self._redis = None
+
+
+class DiskStaleCache:
+    """
+    每个 key 一个 JSON 文件，写入先落临时文件再原子替换；文件 I/O 放到线程池执行。
+    写入时至多每 sweep_interval 秒清扫一次：删除过期文件，仍超过 max_entries 时删除最旧的。
+    """
+
+    def __init__(self, directory: str, ttl: int = 24 * 60 * 60, max_entries: int = 10000,
+                 sweep_interval: Optional[float] = None):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.sweep_interval = min(ttl, 300) if sweep_interval is None else sweep_interval
+        self._next_sweep = 0.0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key.replace(":", "_") + ".json")
+
+    def _read(self, key: str) -> Optional[dict]:
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                self._remove(path)
+                return None
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def _write(self, key: str, value: dict) -> None:
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(value, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        if time.monotonic() >= self._next_sweep:
+            self._next_sweep = time.monotonic() + self.sweep_interval
+            self.sweep()
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def sweep(self) -> int:
+        """删除过期文件（含中断写入残留的临时文件），超出 max_entries 时按修改时间删除最旧的，返回删除数"""
+        now = time.time()
+        entries = []
+        removed = 0
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                try:
+                    mtime = entry.stat().st_mtime
+                except OSError:
+                    continue
+                if now - mtime > self.ttl:
+                    self._remove(entry.path)
+                    removed += 1
+                elif entry.name.endswith(".json"):
+                    entries.append((mtime, entry.path))
+        overflow = len(entries) - self.max_entries
+        if overflow > 0:
+            for _, path in heapq.nsmallest(overflow, entries):
+                self._remove(path)
+            removed += overflow
+        return removed
+
+    async def get(self, key: str) -> Optional[dict]:
+        return await asyncio.to_thread(self._read, key)
+
+    async def set(self, key: str, value: dict) -> None:
+        await asyncio.to_thread(self._write, key, value)
+
+    async def close(self) -> None:
+        pass
+
+
+def build_stale_cache(backend: str, redis_url: str, directory: str, ttl: int, max_entries: int = 10000):
+    """按配置创建缓存，none 时返回 None；max_entries 只作用于磁盘缓存"""
+    if backend == "redis":
+        return RedisStaleCache(redis_url, ttl=ttl)
+    if backend == "disk":
+        return DiskStaleCache(directory, ttl=ttl, max_entries=max_entries)
+    if backend != "none":
+        raise ValueError(f"Unsupported STALE_CACHE: {backend}")
+    return None
+
+
+def _encode(result) -> dict:
+    if is_dataclass(result):
+        return {"kind": "dataclass", "value": asdict(result), "cached_at": time.time()}
+    return {"kind": "raw", "value": result, "cached_at": time.time()}
+
+
+def _mark_stale(item, cached_at: str):
+    if isinstance(item, dict) and item:
+        return {**item, "stale": True, "cached_at": cached_at}
+    return item
+
+
+def _decode(entry: dict, result_type):
+    cached_at = datetime.fromtimestamp(entry["cached_at"], timezone.utc).isoformat()
+    value = entry["value"]
+    if entry["kind"] == "dataclass":
+        value["data"] = [_mark_stale(item, cached_at) for item in value.get("data", [])]
+        return result_type(**value)
+    if isinstance(value, list):
+        return [_mark_stale(item, cached_at) for item in value]
+    return _mark_stale(value, cached_at)
+
+
+_pending_writes = set()
+
+
+async def _lookup(cache, key: str) -> Optional[dict]:
+    try:
+        return await cache.get(key)
+    except Exception as e:
+        logger.warning("stale-cache-read-failed", key=key, error=str(e))
+        return None
+
+
+async def _store(cache, key: str, entry: dict) -> None:
+    try:
+        await cache.set(key, entry)
+    except Exception as e:
+        logger.warning("stale-cache-write-failed", key=key, error=str(e))
+
+
+def serve_stale(result_type=None):
+    """
+    AsyncElasticClient 方法装饰器（置于 @retry 之外）：成功结果异步写入 self.stale_cache，
+    熔断打开或 ES 故障时改为返回相同参数的最近一次结果；未配置缓存或没有缓存时原样抛出。
+    result_type 为结果 dataclass 的属性名（如 "SearchResponse"），用于还原缓存结果。
+    """
+    def decorator(method):
+        signature = inspect.signature(method)
+
+        @functools.wraps(method)
+        async def wrapper(self, *args, **kwargs):
+            if self.stale_cache is None:
+                return await method(self, *args, **kwargs)
+            bound = signature.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            arguments = {k: v for k, v in bound.arguments.items() if k not in ("self", "cancel_token")}
+            # 多租户视图查询不同索引，相同参数的结果不能共用
+            arguments["_index"] = self.index
+            key = cache_key(method.__name__, arguments)
+            try:
+                result = await method(self, *args, **kwargs)
+            except Exception as e:
+                if not (isinstance(e, CircuitOpenException) or is_breaker_failure(e)):
+                    raise
+                entry = await _lookup(self.stale_cache, key)
+                STALE_CACHE_LOOKUPS.labels(method=method.__name__, result="hit" if entry else "miss").inc()
+                if entry is None:
+                    raise
+                logger.warning("es-serving-stale", method=method.__name__, error=type(e).__name__)
+                return _decode(entry, getattr(type(self), result_type) if result_type else None)
+            # 写缓存不阻塞本次返回
+            task = asyncio.create_task(_store(self.stale_cache, key, _encode(result)))
+            _pending_writes.add(task)
+            task.add_done_callback(_pending_writes.discard)
+            return result
+        return wrapper
+    return decorator
@@ -1,3 +1,4 @@
+import json
 import os
 from dotenv import load_dotenv
 from pydantic import BaseModel, Field
@@ -12,10 +13,82 @@ class ApplicationSettings(BaseModel):
     API_KEY: str | None = os.getenv("NEWS_MCP_API_KEY")
     SESSION_SECRET_KEY: str = os.getenv("SESSION_SECRET_KEY")
     REDIS_URL: str = os.getenv("REDIS_URL", "redis://redis:6379/0")
+    # 多租户：TENANTS_FILE 为租户 JSON 配置（见 services/tenants.py），TENANT_DEFAULT 为白名单 IP 免认证请求所用租户
+    TENANTS_FILE: str | None = os.getenv("TENANTS_FILE")
+    TENANT_DEFAULT: str | None = os.getenv("TENANT_DEFAULT")
+    # 免认证的 IP/CIDR 白名单（逗号分隔），私有网络与回环地址默认放行
+    AUTH_ALLOW_CIDRS: list = [c.strip() for c in os.getenv("AUTH_ALLOW_CIDRS", "172.20.80.1,127.0.0.1").split(",") if c.strip()]
+    AUTH_ALLOW_PRIVATE: bool = os.getenv("AUTH_ALLOW_PRIVATE", "true").lower() == "true"
+    AUTH_IP_CACHE_SIZE: int = int(os.getenv("AUTH_IP_CACHE_SIZE", 4096))  # IP 判定结果的 LRU 缓存条数
     # IP 限流配置
     RATE_LIMIT_MAX: int = int(os.getenv("RATE_LIMIT_MAX", 100))  # 单个 IP 在时间窗口内最大请求数
     RATE_LIMIT_WINDOW: int = int(os.getenv("RATE_LIMIT_WINDOW", 60))  # 限流窗口时长（秒）
     TRANSPORT: str = "streamable-http"
+    # 工具调用准入控制：并发上限按观测延迟自适应调整(AIMD)，超出等待队列或等待超时直接拒绝
+    ADMISSION_ENABLED: bool = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+    ADMISSION_INITIAL_LIMIT: int = int(os.getenv("ADMISSION_INITIAL_LIMIT", 32))
+    ADMISSION_MIN_LIMIT: int = int(os.getenv("ADMISSION_MIN_LIMIT", 4))
+    ADMISSION_MAX_LIMIT: int = int(os.getenv("ADMISSION_MAX_LIMIT", 256))
+    ADMISSION_MAX_QUEUE: int = int(os.getenv("ADMISSION_MAX_QUEUE", 128))
+    ADMISSION_QUEUE_TIMEOUT: float = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", 2.0))  # 排队最长等待（秒）
+    ADMISSION_TARGET_LATENCY: float = float(os.getenv("ADMISSION_TARGET_LATENCY", 0.5))  # 目标延迟（秒），超过则收缩并发上限
+    # 客户端断开检测的轮询间隔（秒）
+    DISCONNECT_POLL_INTERVAL: float = float(os.getenv("DISCONNECT_POLL_INTERVAL", 0.5))
+    # 按需性能采样：设置 PROFILE_TOKEN 后，携带 X-Profile-Token 头的请求或 /debug/profile 端点可触发采样
+    PROFILE_TOKEN: str | None = os.getenv("PROFILE_TOKEN")
+    PROFILE_INTERVAL: float = float(os.getenv("PROFILE_INTERVAL", 0.005))  # 采样间隔（秒）
+    PROFILE_MAX_SECONDS: float = float(os.getenv("PROFILE_MAX_SECONDS", 60))
+    PROFILE_KEEP: int = int(os.getenv("PROFILE_KEEP", 20))  # 保留的请求窗口采样结果数
+    # 链路追踪：span 按 trace 缓冲后做尾部采样，出错/慢请求必留，其余按比例抽样
+    TRACING_ENABLED: bool = os.getenv("TRACING_ENABLED", "false").lower() == "true"
+    TRACE_EXPORTER: str = os.getenv("TRACE_EXPORTER", "file")  # file | otlp
+    TRACE_FILE: str = os.getenv("TRACE_FILE", "logs/traces.jsonl")
+    TRACE_OTLP_ENDPOINT: str = os.getenv("TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+    TRACE_SAMPLE_RATIO: float = float(os.getenv("TRACE_SAMPLE_RATIO", 0.01))
+    TRACE_LATENCY_THRESHOLD: float = float(os.getenv("TRACE_LATENCY_THRESHOLD", 1.0))  # 秒
+    # 搜索后预取前 K 条详情到按会话隔离的缓存，read_single_news 命中时不再访问 ES
+    PREFETCH_ENABLED: bool = os.getenv("PREFETCH_ENABLED", "false").lower() == "true"
+    PREFETCH_TOP_K: int = int(os.getenv("PREFETCH_TOP_K", 3))
+    PREFETCH_TTL: int = int(os.getenv("PREFETCH_TTL", 300))  # 缓存有效期（秒）
+    PREFETCH_MAX_SESSIONS: int = int(os.getenv("PREFETCH_MAX_SESSIONS", 1000))
+    PREFETCH_MAX_ITEMS: int = int(os.getenv("PREFETCH_MAX_ITEMS", 50))  # 单会话最多缓存条数
+    PREFETCH_MAX_CONCURRENT: int = int(os.getenv("PREFETCH_MAX_CONCURRENT", 2))
+    # 准入控制的在途请求占并发上限比例超过该值时不预取，避免与前台查询争抢 ES
+    PREFETCH_MAX_LOAD: float = float(os.getenv("PREFETCH_MAX_LOAD", 0.5))
+    # 增量订阅 watch_topic_news：水位存于 Redis，首次调用未指定 date_from 时回看 WATCH_DEFAULT_LOOKBACK
+    WATCH_DEFAULT_LOOKBACK: str = os.getenv("WATCH_DEFAULT_LOOKBACK", "now-1d")  # ES 日期表达式
+    WATCH_TTL: int = int(os.getenv("WATCH_TTL", 7 * 24 * 60 * 60))  # 水位过期时间（秒）
+    # search_topic_news 查询代价预算：超出分支/子句预算时拆分扇出，超出代价预算时降级，超出上限时拒绝
+    QUERY_MAX_BRANCHES: int = int(os.getenv("QUERY_MAX_BRANCHES", 64))
+    QUERY_MAX_CLAUSES: int = int(os.getenv("QUERY_MAX_CLAUSES", 1024))
+    QUERY_MAX_COST: int = int(os.getenv("QUERY_MAX_COST", 2000))  # 估算的词项展开量
+    QUERY_REJECT_COST: int = int(os.getenv("QUERY_REJECT_COST", 20000))
+    QUERY_MAX_FANOUT: int = int(os.getenv("QUERY_MAX_FANOUT", 8))  # 拆分后最多子查询数
+    QUERY_FANOUT_CONCURRENCY: int = int(os.getenv("QUERY_FANOUT_CONCURRENCY", 4))  # 子查询并发数
+    QUERY_DOWNGRADE_SIZE: int = int(os.getenv("QUERY_DOWNGRADE_SIZE", 20))
+    # ES 不可用时的降级缓存：redis | disk | none，熔断打开或重试耗尽时对相同查询返回上次结果并标记 stale
+    STALE_CACHE: str = os.getenv("STALE_CACHE", "none")
+    STALE_CACHE_DIR: str = os.getenv("STALE_CACHE_DIR", "cache/es-stale")
+    STALE_CACHE_TTL: int = int(os.getenv("STALE_CACHE_TTL", 24 * 60 * 60))  # 秒
+    STALE_CACHE_MAX_ENTRIES: int = int(os.getenv("STALE_CACHE_MAX_ENTRIES", 10000))  # 磁盘缓存最多保留的文件数
+    # 按工具覆盖排序配置（JSON），如 {"search_news": {"mode": "hybrid", "scale": "2d", "recency_weight": 0.6}}
+    # mode: time | relevance | hybrid，未配置的工具保持默认排序
+    RANKING_PROFILES: dict = json.loads(os.getenv("RANKING_PROFILES", "{}"))
+    # suggest 工具：来源名与标题高频短语的内存前缀索引，按 terms 聚合定期刷新
+    SUGGEST_ENABLED: bool = os.getenv("SUGGEST_ENABLED", "true").lower() == "true"
+    SUGGEST_REFRESH_INTERVAL: int = int(os.getenv("SUGGEST_REFRESH_INTERVAL", 600))  # 秒
+    SUGGEST_SOURCE_SIZE: int = int(os.getenv("SUGGEST_SOURCE_SIZE", 2000))
+    SUGGEST_PHRASE_SIZE: int = int(os.getenv("SUGGEST_PHRASE_SIZE", 5000))
+    SUGGEST_PHRASE_LOOKBACK: str = os.getenv("SUGGEST_PHRASE_LOOKBACK", "now-30d")  # 只统计该时间之后的标题
+    # 工具优先级，数值越小越优先；未列出的工具使用 1
+    TOOL_PRIORITIES: dict = {
+        "read_single_news": 0,
+        "suggest": 0,
+        "search_news": 1,
+        "search_news_with_secondary_filter": 1,
+        "search_topic_news": 2,
+        "watch_topic_news": 2,
+    }
 
 
 class ElasticSearchSettings(BaseModel):
@@ -24,6 +97,36 @@ class ElasticSearchSettings(BaseModel):
     ES_INDEX: str = os.getenv("ES_INDEX")
     URL: str = os.getenv("ES_HOST")
     MAX_RESULTS_LIMIT: int = 100
+    # 时间分区索引：none 为单索引；monthly 为按月分区(<ES_INDEX_PREFIX>YYYY.MM)，此时 ES_INDEX 为覆盖全部分区的别名
+    ES_INDEX_PARTITION: str = os.getenv("ES_INDEX_PARTITION", "none")
+    ES_INDEX_PREFIX: str = os.getenv("ES_INDEX_PREFIX", "news-")
+    # 时间范围跨越的分区数超过该值时直接查询别名，避免请求行过长
+    ES_INDEX_PARTITION_MAX: int = int(os.getenv("ES_INDEX_PARTITION_MAX", 24))
+    # 写别名，滚动时指向当月分区
+    ES_WRITE_ALIAS: str | None = os.getenv("ES_WRITE_ALIAS")
+    # 客户端断开时，已执行超过该时长（秒）的查询额外通过 Tasks API 取消
+    ES_TASK_CANCEL_AFTER: float = float(os.getenv("ES_TASK_CANCEL_AFTER", 2.0))
+    # ES 熔断器：窗口内失败率或慢调用率超过阈值时打开，打开期间不再请求 ES，到期后放行少量探测请求
+    ES_BREAKER_ENABLED: bool = os.getenv("ES_BREAKER_ENABLED", "true").lower() == "true"
+    ES_BREAKER_FAILURE_RATE: float = float(os.getenv("ES_BREAKER_FAILURE_RATE", 0.5))
+    ES_BREAKER_SLOW_CALL_THRESHOLD: float = float(os.getenv("ES_BREAKER_SLOW_CALL_THRESHOLD", 2.0))  # 秒
+    ES_BREAKER_SLOW_CALL_RATE: float = float(os.getenv("ES_BREAKER_SLOW_CALL_RATE", 0.8))
+    ES_BREAKER_MIN_CALLS: int = int(os.getenv("ES_BREAKER_MIN_CALLS", 10))  # 窗口内至少这么多调用才做判断
+    ES_BREAKER_WINDOW: float = float(os.getenv("ES_BREAKER_WINDOW", 30))  # 统计窗口（秒）
+    ES_BREAKER_OPEN_SECONDS: float = float(os.getenv("ES_BREAKER_OPEN_SECONDS", 15))
+    ES_BREAKER_HALF_OPEN_CALLS: int = int(os.getenv("ES_BREAKER_HALF_OPEN_CALLS", 3))
+    # 传输层序列化：json（标准库）| orjson（需安装 orjson，响应解析更快）
+    ES_SERIALIZER: str = os.getenv("ES_SERIALIZER", "json")
+    # 启用后请求体 gzip 压缩，并以 Accept-Encoding: gzip 请求压缩响应，适合带宽受限的链路
+    ES_HTTP_COMPRESS: bool = os.getenv("ES_HTTP_COMPRESS", "false").lower() == "true"
+    # search 响应按 filter_path 裁剪，只返回 _source、排序值与总数
+    ES_FILTER_PATH: bool = os.getenv("ES_FILTER_PATH", "true").lower() == "true"
+    # 增量拉取时 release_time 相同的文档按该字段排序，须为唯一且可排序的字段
+    ES_TIEBREAK_FIELD: str = os.getenv("ES_TIEBREAK_FIELD", "news_id.keyword")
+    # suggest 使用的字段：来源名 keyword 字段、标题短语字段（terms 聚合）与 search_as_you_type 标题字段
+    ES_SUGGEST_SOURCE_FIELD: str = os.getenv("ES_SUGGEST_SOURCE_FIELD", "source.keyword")
+    ES_SUGGEST_PHRASE_FIELD: str = os.getenv("ES_SUGGEST_PHRASE_FIELD", "title.phrases")
+    ES_SUGGEST_TITLE_FIELD: str = os.getenv("ES_SUGGEST_TITLE_FIELD", "title.suggest")
 
 
     @property
@@ -36,4 +139,3 @@ class ElasticSearchSettings(BaseModel):
 
 es_settings = ElasticSearchSettings()
 app_settings = ApplicationSettings()
-print(es_settings.ES_HOST)
\ No newline at end of file
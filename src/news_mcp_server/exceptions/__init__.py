@@ -10,4 +10,27 @@ class ResourceException(MCPException):
 
 class ToolException(MCPException):
     """资源未找到异常"""
-    pass
\ No newline at end of file
+    pass
+
+
+class OverloadException(MCPException):
+    """服务过载，请求被准入控制拒绝"""
+    pass
+
+
+class RequestCancelledException(MCPException):
+    """客户端已断开，请求被取消"""
+    pass
+
+
+class QueryTooCostlyException(MCPException):
+    """查询估算代价超出预算，被拒绝执行"""
+
+    def __init__(self, message: str, feedback: dict):
+        super().__init__(message)
+        self.feedback = feedback
+
+
+class CircuitOpenException(MCPException):
+    """ES 熔断器已打开，调用被直接拒绝"""
+    pass
@@ -1,11 +1,24 @@
+import contextlib
+import json
 from typing import List
 from fastmcp import FastMCP, Context
 from fastmcp.server.http import Middleware
+from fastmcp.tools.tool import ToolResult
+from mcp import McpError
+from mcp.types import ErrorData, TextContent
 from pydantic import Field
-import contextlib
 from .services.news_service import NewsService
-from .clients.elastic_client import AsyncElasticClient
+from .services.prefetch import DetailPrefetcher, PrefetchCache
+from .services.query_cost import QUERY_TOO_COSTLY_ERROR_CODE, QueryBudget
+from .services.suggest import SuggestIndex
+from .services.tenants import TENANT_SCOPE_KEY
+from .services.watermark import WatermarkStore
 from .middlewares.audit import AuditMiddleware
+from .middlewares.admission import AdaptiveLimiter, AdmissionMiddleware
+from .middlewares.tracing import SpanMiddleware, ToolTracingMiddleware
+from .config.settings import app_settings, es_settings
+from .exceptions import QueryTooCostlyException
+from .utils.cancellation import cancel_on_disconnect
 from .utils.logger import logger
 logger.info("News MCP module")
 
@@ -16,6 +29,7 @@ class NewsMCP(FastMCP):
 
 def create_http_app(mcp):
     middlewares = [
+        Middleware(SpanMiddleware, name="audit"),
         Middleware(AuditMiddleware)
     ]
     mcp_app = mcp.http_app("/es-news-mcp", middleware=middlewares)
@@ -23,19 +37,114 @@ def create_http_app(mcp):
 app_services = {}
 
 
+def tenant_service(ctx: Context) -> NewsService:
+    """认证中间件把租户写入 ASGI scope，按租户取对应的 NewsService 视图（索引与配额）"""
+    request = ctx.request_context.request
+    tenant = request.scope.get(TENANT_SCOPE_KEY) if request is not None else None
+    return app_services["news_service"].for_tenant(tenant)
+
+
+def disconnect_guard(ctx: Context):
+    """监听本次工具调用对应的 HTTP 连接，客户端断开后取消 ES 查询"""
+    return cancel_on_disconnect(ctx.request_context.request, app_settings.DISCONNECT_POLL_INTERVAL)
+
+
+@contextlib.asynccontextmanager
+async def reject_costly_queries():
+    """查询代价超出预算时以 JSON-RPC 错误返回，data 中带有估算值、预算与调整建议"""
+    try:
+        yield
+    except QueryTooCostlyException as e:
+        raise McpError(ErrorData(code=QUERY_TOO_COSTLY_ERROR_CODE, message=str(e), data=e.feedback))
+
+
+def with_query_plan(items: List[dict], query_plan: dict) -> ToolResult:
+    """查询被拆分或降级时，在结果之后附加一段 query_plan 说明，结构化结果保持不变"""
+    return ToolResult(
+        content=[TextContent(type="text", text=json.dumps(items, ensure_ascii=False)),
+                 TextContent(type="text", text=json.dumps({"query_plan": query_plan}, ensure_ascii=False))],
+        structured_content={"result": items},
+    )
+
+
+def is_foreground_busy() -> bool:
+    """前台有排队或在途请求占比过高时，预取让路"""
+    return (admission_limiter.queued > 0
+            or admission_limiter.inflight >= admission_limiter.limit * app_settings.PREFETCH_MAX_LOAD)
+
+
 @contextlib.asynccontextmanager
 async def lifespan(app: FastMCP):
     """Lifespan context manager for FastMCP server."""
     logger.info("Server started")
-    es_client = AsyncElasticClient()
+    # elasticsearch 客户端较重，推迟到服务真正启动时再导入
+    from .clients.elastic_client import AsyncElasticClient
+    from .clients.circuit_breaker import CircuitBreaker
+    from .clients.stale_cache import build_stale_cache
+    from .clients.ranking import load_profiles
+    breaker = None
+    if es_settings.ES_BREAKER_ENABLED:
+        breaker = CircuitBreaker(failure_rate=es_settings.ES_BREAKER_FAILURE_RATE,
+                                 slow_call_threshold=es_settings.ES_BREAKER_SLOW_CALL_THRESHOLD,
+                                 slow_call_rate=es_settings.ES_BREAKER_SLOW_CALL_RATE,
+                                 min_calls=es_settings.ES_BREAKER_MIN_CALLS,
+                                 window=es_settings.ES_BREAKER_WINDOW,
+                                 open_seconds=es_settings.ES_BREAKER_OPEN_SECONDS,
+                                 half_open_calls=es_settings.ES_BREAKER_HALF_OPEN_CALLS)
+    stale_cache = build_stale_cache(app_settings.STALE_CACHE, app_settings.REDIS_URL,
+                                    app_settings.STALE_CACHE_DIR, app_settings.STALE_CACHE_TTL,
+                                    max_entries=app_settings.STALE_CACHE_MAX_ENTRIES)
+    es_client = AsyncElasticClient(breaker=breaker, stale_cache=stale_cache)
+    prefetcher = None
+    if app_settings.PREFETCH_ENABLED:
+        prefetcher = DetailPrefetcher(
+            es_client,
+            PrefetchCache(max_sessions=app_settings.PREFETCH_MAX_SESSIONS,
+                          max_items=app_settings.PREFETCH_MAX_ITEMS,
+                          ttl=app_settings.PREFETCH_TTL),
+            top_k=app_settings.PREFETCH_TOP_K,
+            max_concurrent=app_settings.PREFETCH_MAX_CONCURRENT,
+            is_busy=is_foreground_busy,
+        )
+    watermarks = WatermarkStore(app_settings.REDIS_URL, ttl=app_settings.WATCH_TTL)
+    suggestions = None
+    if app_settings.SUGGEST_ENABLED:
+        suggestions = SuggestIndex(es_client,
+                                   source_field=es_settings.ES_SUGGEST_SOURCE_FIELD,
+                                   phrase_field=es_settings.ES_SUGGEST_PHRASE_FIELD,
+                                   refresh_interval=app_settings.SUGGEST_REFRESH_INTERVAL,
+                                   source_size=app_settings.SUGGEST_SOURCE_SIZE,
+                                   phrase_size=app_settings.SUGGEST_PHRASE_SIZE,
+                                   phrase_lookback=app_settings.SUGGEST_PHRASE_LOOKBACK,
+                                   # 每个节点保留的候选数不少于 max_results 上限，否则大 max_results 会被截断
+                                   top_k=es_settings.MAX_RESULTS_LIMIT)
+        # 启动时即在后台加载，首次 suggest 调用无需等待
+        suggestions.schedule_refresh()
     try:
-        app_services["news_service"] = NewsService(es_client)
+        budget = QueryBudget(max_branches=app_settings.QUERY_MAX_BRANCHES,
+                             max_clauses=app_settings.QUERY_MAX_CLAUSES,
+                             max_cost=app_settings.QUERY_MAX_COST,
+                             reject_cost=app_settings.QUERY_REJECT_COST,
+                             max_fanout=app_settings.QUERY_MAX_FANOUT,
+                             downgrade_size=app_settings.QUERY_DOWNGRADE_SIZE,
+                             fanout_concurrency=app_settings.QUERY_FANOUT_CONCURRENCY)
+        app_services["news_service"] = NewsService(es_client, prefetcher=prefetcher, watermarks=watermarks,
+                                                   budget=budget,
+                                                   rankings=load_profiles(app_settings.RANKING_PROFILES),
+                                                   suggestions=suggestions)
         logger.info("Server started")
         yield
     except Exception as e:
         logger.error("Server error", error=str(e))
         raise e
     finally:
+        if prefetcher is not None:
+            await prefetcher.close()
+        await watermarks.close()
+        if suggestions is not None:
+            await suggestions.close()
+        if stale_cache is not None:
+            await stale_cache.close()
         await es_client.close()
         logger.info("Server closed")
 
@@ -50,6 +159,19 @@ mcp = NewsMCP(
     lifespan=lifespan
 )
 
+# 工具分发 span 在最外层，包含准入排队时间
+mcp.add_middleware(ToolTracingMiddleware())
+admission_limiter = AdaptiveLimiter(
+    initial_limit=app_settings.ADMISSION_INITIAL_LIMIT,
+    min_limit=app_settings.ADMISSION_MIN_LIMIT,
+    max_limit=app_settings.ADMISSION_MAX_LIMIT,
+    max_queue=app_settings.ADMISSION_MAX_QUEUE,
+    queue_timeout=app_settings.ADMISSION_QUEUE_TIMEOUT,
+    target_latency=app_settings.ADMISSION_TARGET_LATENCY,
+)
+if app_settings.ADMISSION_ENABLED:
+    mcp.add_middleware(AdmissionMiddleware(admission_limiter, priorities=app_settings.TOOL_PRIORITIES))
+
 
 @mcp.prompt()
 async def search_news_prompt():
@@ -62,20 +184,26 @@ async def search_news_prompt():
     tags={"news search_news engine"}
 )
 async def search_news(
+        ctx: Context,
         query: str = Field(description="请输入用于检索新闻的关键词或短语。例如：'人工智能'、'华为 5G'、'经济形势'。支持单个词、多个词或短语，系统将返回与关键词相关的新闻。"),
         max_results: int  = Field(default=20, description="请输入希望返回的新闻条数（1-100）。默认值为20，最大不超过100。建议根据实际需求设置，避免一次性获取过多数据。"),
         date_from: str = Field(default="", description="请输入起始日期，格式为 YYYY-MM-DD。例如：'2024-06-01'。系统将只返回该日期及之后发布的新闻。可选参数，不填则不限制起始时间。"),
-        date_to: str = Field(default="", description="请输入结束日期，格式为 YYYY-MM-DD。例如：'2024-06-12'。系统将只返回该日期及之前发布的新闻。可选参数，不填则不限制结束时间。")
+        date_to: str = Field(default="", description="请输入结束日期，格式为 YYYY-MM-DD。例如：'2024-06-12'。系统将只返回该日期及之前发布的新闻。可选参数，不填则不限制结束时间。"),
+        ranking: str = Field(default="", description="【可选】排序方式：time 按发布时间；relevance 按相关性；hybrid 相关性结合时效衰减，越新的新闻得分越高。不填则使用服务端默认排序")
 ) -> List[dict]:
     """MCP 工具：按关键词、来源、时间范围搜索新闻"""
     logger.info(f"Call Tool search_news {query}")
-    news_items = await app_services["news_service"].search_news(
-        query=query,
-        max_results=max_results,
-        source=None,
-        date_from=date_from,
-        date_to=date_to
-    )
+    async with disconnect_guard(ctx) as cancel_token:
+        news_items = await tenant_service(ctx).search_news(
+            query=query,
+            max_results=max_results,
+            source=None,
+            date_from=date_from,
+            date_to=date_to,
+            cancel_token=cancel_token,
+            session_id=ctx.session_id,
+            ranking=ranking
+        )
     return [item.model_dump() for item in news_items]
 
 
@@ -83,20 +211,26 @@ async def search_news(
     name="search_news_with_secondary_filter",
     description="根据主关键词和次关键词联合检索新闻。该工具会先用主关键词在新闻库中查找相关内容，再用次关键词对结果进行进一步过滤，最终返回同时包含主关键词和次关键词的新闻列表。可选参数还支持按发布时间范围筛选结果。适用于需要多条件复合筛选新闻的场景。"
 )
-async def search_news_with_secondary_filter(primary_query: str = Field(description="请输入用于检索新闻的关键词或短语。例如：'人工智能'、'华为 5G'、'经济形势'。支持单个词、多个词或短语，系统将返回与关键词相关的新闻。"),
+async def search_news_with_secondary_filter(ctx: Context,
+                      primary_query: str = Field(description="请输入用于检索新闻的关键词或短语。例如：'人工智能'、'华为 5G'、'经济形势'。支持单个词、多个词或短语，系统将返回与关键词相关的新闻。"),
                       secondary_query: str=Field(description="请输入用于过滤新闻的次要关键词或短语。例如：'人工智能'、'华为 5G'、'经济形势'。支持单个词、多个词或短语，系统将返回与次要关键词相关的新闻。"),
                       max_results: int = Field(default=20, description="请输入希望返回的新闻条数（1-100）。默认值为20，最大不超过100。建议根据实际需求设置，避免一次性获取过多数据。"),
                       date_from: str = Field(default="", description="起始日期，格式为 YYYY-MM-DD。系统将只返回该日期及之后发布的新闻"),
-                      date_to: str = Field(default="", description="结束日期，格式为 YYYY-MM-DD。系统将只返回该日期及之前发布的新闻")) -> list:
+                      date_to: str = Field(default="", description="结束日期，格式为 YYYY-MM-DD。系统将只返回该日期及之前发布的新闻"),
+                      ranking: str = Field(default="", description="【可选】排序方式：time 按发布时间；relevance 按相关性；hybrid 相关性结合时效衰减，越新的新闻得分越高。不填则使用服务端默认排序")) -> list:
     logger.info(f"Call Tool search_news_with_secondary_filter {primary_query}, {secondary_query}")
-    news_items = await app_services["news_service"].search_news_with_secondary_filter(
-        primary_query=primary_query,
-        secondary_query=secondary_query,
-        max_results=max_results,
-        source=None,
-        date_from=date_from,
-        date_to=date_to
-    )
+    async with disconnect_guard(ctx) as cancel_token:
+        news_items = await tenant_service(ctx).search_news_with_secondary_filter(
+            primary_query=primary_query,
+            secondary_query=secondary_query,
+            max_results=max_results,
+            source=None,
+            date_from=date_from,
+            date_to=date_to,
+            cancel_token=cancel_token,
+            session_id=ctx.session_id,
+            ranking=ranking
+        )
     return [item.model_dump() for item in news_items]
 
 @mcp.tool(
@@ -107,15 +241,44 @@ async def read_single_news( ctx: Context,
                             news_id: str = Field(description="请输入要获取的新闻ID（news_id），通常来源于 search_news/search_news_with_secondary_filter 返回结果中的 id 字段。例如：'600001_1'。")) -> dict:
     """MCP 工具：按 ID 获取单条新闻内容"""
     logger.info(f"Call Tool read_single_news {news_id}\n{ctx.session}")
-    news_item = await app_services["news_service"].read_news(news_id)
+    async with disconnect_guard(ctx) as cancel_token:
+        news_item = await tenant_service(ctx).read_news(news_id, cancel_token=cancel_token,
+                                                                   session_id=ctx.session_id)
     return news_item.model_dump()
 
 
+@mcp.tool(
+    name="suggest",
+    description="输入前缀，返回匹配的数据源名称（sources）、标题高频短语（phrases）与新闻标题补全（titles）。"
+                "在调用 search_topic_news 等工具前用它确认 sources 的准确取值和 primary_queries 的常用写法，"
+                "避免因来源名或关键词写法不符导致空结果。sources/phrases 来自内存索引，几乎没有延迟；"
+                "prefix 为空时返回最常见的数据源与短语。"
+)
+async def suggest(
+    ctx: Context,
+    prefix: str = Field(default="", description="输入的前缀，例如 '新华'、'人工智'，不区分大小写"),
+    kind: str = Field(
+        default="",
+        description="【可选】补全类型：sources 数据源名称；phrases 标题高频短语；titles 新闻标题（需查询 ES）。不填则全部返回"
+    ),
+    max_results: int = Field(default=10, description="【可选】每种类型最多返回的条数，默认10")
+) -> dict:
+    """MCP 工具：按前缀补全数据源名称、标题短语与新闻标题"""
+    logger.info("Call suggest", prefix=prefix, kind=kind)
+    async with disconnect_guard(ctx) as cancel_token:
+        result = await tenant_service(ctx).suggest(prefix, kind=kind or None, max_results=max_results,
+                                                   cancel_token=cancel_token)
+    if "titles" in result:
+        result["titles"] = [item.model_dump() for item in result["titles"]]
+    return result
+
+
 @mcp.tool(
     name="search_topic_news",
     description="根据多个主关键词列表、筛选词列表(组)、数据源列表以 OR 关系批量查询新闻，支持时间范围筛选. "
                 "基本查询逻辑：<label1>&<filtered_words>|<label2>&<filtered_words>|<source1>&<filtered_words>|...|"
-                "允许在基本查询逻辑之上再搜索"
+                "允许在基本查询逻辑之上再搜索。"
+                "组合数过多时查询会被拆分或降级（结果后附 query_plan 说明），超出上限时返回错误及调整建议"
 )
 async def search_topic_news(
     ctx: Context,
@@ -141,6 +304,10 @@ async def search_topic_news(
     date_to: str = Field(
         default="",
         description="【可选】结束发布日期，格式 YYYY-MM-DD"
+    ),
+    ranking: str = Field(
+        default="",
+        description="【可选】排序方式：time 按发布时间（默认）；relevance 按相关性；hybrid 相关性结合时效衰减，越新的新闻得分越高"
     )
 ) -> List[dict]:
     """MCP 工具：按多个主关键词与次关键词组合(A&D|B&D|...)批量搜索新闻"""
@@ -153,17 +320,76 @@ async def search_topic_news(
         secondary_querys = [secondary_querys]
     if isinstance(sources, str) and len(sources.strip())>0:
         sources = [sources]
-    news_items = await app_services["news_service"].search_topic_news(
-        primary_queries=primary_queries,
-        secondary_query=secondary_querys,
-        max_results=max_results,
-        sources=sources,
-        search_word=search_word,
-        date_from=date_from,
-        date_to=date_to
-    )
+    async with disconnect_guard(ctx) as cancel_token, reject_costly_queries():
+        news_items = await tenant_service(ctx).search_topic_news(
+            primary_queries=primary_queries,
+            secondary_query=secondary_querys,
+            max_results=max_results,
+            sources=sources,
+            search_word=search_word,
+            date_from=date_from,
+            date_to=date_to,
+            cancel_token=cancel_token,
+            session_id=ctx.session_id,
+            ranking=ranking
+        )
     logger.info(f"Call search_topic_news", total=news_items.get("total"), primary_queries_count=len(primary_queries),secondary_query_count=len(secondary_querys), ctx=ctx.request_context.request['state'])
-    return [item.model_dump() for item in news_items.get("data")]
+    items = [item.model_dump() for item in news_items.get("data")]
+    if news_items.get("query_plan"):
+        return with_query_plan(items, news_items["query_plan"])
+    return items
 
 
-mcp_app = create_http_app(mcp)
+@mcp.tool(
+    name="watch_topic_news",
+    description="增量监控主题新闻。查询条件与 search_topic_news 相同，但只返回自上次调用以来新发布的新闻，"
+                "按发布时间升序排列。水位按会话或 subscription 名称记录在服务端，适合定时轮询的监控场景；"
+                "has_more 为 true 时说明还有未取完的新闻，可立即再次调用。"
+)
+async def watch_topic_news(
+    ctx: Context,
+    primary_queries: List[str] = Field(
+        description="【必填】主关键词列表，与 search_topic_news 相同"
+    ),
+    secondary_querys: List[str] = Field(default_factory=list,
+        description="筛选词，将与每个主关键词进行 AND 运算"
+    ),
+    sources: List[str] = Field(default_factory=list,
+        description="数据源列表，将与每个主关键词进行 AND 运算"
+    ),
+    search_word: str = Field(default="", description="搜索词"),
+    subscription: str = Field(
+        default="",
+        description="【可选】订阅名称。指定后水位按名称保存，可跨会话继续；不填则按当前会话和查询条件保存"
+    ),
+    max_results: int = Field(
+        default=50,
+        description="【可选】单次最多返回的新闻数量，取值1-100，默认50"
+    ),
+    date_from: str = Field(
+        default="",
+        description="【可选】首次调用（尚无水位）时的起始发布日期，格式 YYYY-MM-DD，默认回看一天"
+    )
+) -> dict:
+    """MCP 工具：按 search_topic_news 的条件增量拉取新发布的新闻"""
+    logger.info("Call watch_topic_news", primary_queries=primary_queries, subscription=subscription)
+    if isinstance(primary_queries, str) and len(primary_queries.strip()) > 0:
+        primary_queries = [primary_queries]
+    if isinstance(secondary_querys, str) and len(secondary_querys.strip()) > 0:
+        secondary_querys = [secondary_querys]
+    if isinstance(sources, str) and len(sources.strip()) > 0:
+        sources = [sources]
+    async with disconnect_guard(ctx) as cancel_token, reject_costly_queries():
+        result = await tenant_service(ctx).watch_topic_news(
+            primary_queries=primary_queries,
+            secondary_query=secondary_querys,
+            max_results=max_results,
+            sources=sources,
+            search_word=search_word,
+            date_from=date_from,
+            subscription=subscription,
+            cancel_token=cancel_token,
+            session_id=ctx.session_id
+        )
+    result["data"] = [item.model_dump() for item in result["data"]]
+    return result
@@ -0,0 +1,161 @@
+import asyncio
+import heapq
+import itertools
+import time
+from fastmcp.server.middleware import Middleware, MiddlewareContext
+from mcp import McpError
+from mcp.types import ErrorData
+from prometheus_client import Counter, Gauge
+from ..exceptions import OverloadException
+from ..utils.logger import logger
+
+# JSON-RPC 实现自定义错误码区间 (-32000 ~ -32099)
+OVERLOADED_ERROR_CODE = -32003
+
+ADMISSION_LIMIT = Gauge("mcp_admission_limit", "当前自适应并发上限")
+ADMISSION_INFLIGHT = Gauge("mcp_admission_inflight", "正在执行的工具调用数")
+ADMISSION_QUEUED = Gauge("mcp_admission_queued", "排队等待的工具调用数")
+ADMISSION_REJECTED = Counter("mcp_admission_rejected_total", "被准入控制拒绝的工具调用数", ["tool", "reason"])
+
+
+class AdaptiveLimiter:
+    """
+    带优先级有界等待队列的自适应并发限制器。
+    - 并发数未达上限时直接放行，否则按 (优先级, 到达顺序) 排队
+    - 队列已满时，新请求若比队列中最低优先级者更重要则挤掉对方，否则立即拒绝
+    - 上限按 AIMD 调整：延迟低于目标时每个“轮次”加 1，超过目标时乘性收缩
+    """
+
+    def __init__(self,
+                 initial_limit: int = 32,
+                 min_limit: int = 4,
+                 max_limit: int = 256,
+                 max_queue: int = 128,
+                 queue_timeout: float = 2.0,
+                 target_latency: float = 0.5,
+                 backoff: float = 0.9):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.target_latency = target_latency
+        self.backoff = backoff
+        self.inflight = 0
+        self._waiters = []  # 堆元素: [priority, seq, future]
+        self._queued = 0  # 尚未被放行、挤掉或超时的等待者数，入队/出队时增减
+        self._seq = itertools.count()
+        self._last_decrease = 0.0
+        ADMISSION_LIMIT.set(self.limit)
+
+    @property
+    def queued(self) -> int:
+        return self._queued
+
+    async def acquire(self, priority: int = 1) -> None:
+        """获取执行槽位，过载时抛出 OverloadException"""
+        if self.inflight < int(self.limit) and self.queued == 0:
+            self._set_inflight(self.inflight + 1)
+            return
+        if self.queued >= self.max_queue:
+            self._shed_for(priority)
+        future = asyncio.get_running_loop().create_future()
+        entry = [priority, next(self._seq), future]
+        heapq.heappush(self._waiters, entry)
+        self._set_queued(self._queued + 1)
+        try:
+            await asyncio.wait_for(future, self.queue_timeout)
+        except asyncio.TimeoutError:
+            # 放行与超时落在同一轮事件循环时 wait_for 仍抛出超时，此时槽位已移交给本请求，照常执行
+            if future.done() and not future.cancelled() and future.exception() is None:
+                return
+            raise OverloadException("queue_timeout")
+        except asyncio.CancelledError:
+            # 槽位已移交给本请求但调用方被取消，归还槽位
+            if future.done() and not future.cancelled() and future.exception() is None:
+                self.release()
+            raise
+        finally:
+            # 超时或被取消时 future 由 wait_for 取消，放行与挤掉已在对应位置出队
+            if future.cancelled():
+                self._set_queued(self._queued - 1)
+            self._compact()
+
+    def release(self, latency: float = None) -> None:
+        """归还槽位，并用本次调用耗时调整并发上限"""
+        if latency is not None:
+            self._adjust(latency)
+        self._set_inflight(self.inflight - 1)
+        self._grant()
+
+    def _shed_for(self, priority: int) -> None:
+        """队列已满：挤掉优先级最低、最晚到达的等待者，若其不低于新请求则拒绝新请求"""
+        pending = [entry for entry in self._waiters if not entry[2].done()]
+        # max_queue=0 时没有可挤掉的等待者，直接拒绝新请求
+        if not pending:
+            raise OverloadException("queue_full")
+        victim = max(pending, key=lambda entry: (entry[0], entry[1]))
+        if victim[0] <= priority:
+            raise OverloadException("queue_full")
+        victim[2].set_exception(OverloadException("shed"))
+        self._set_queued(self._queued - 1)
+
+    def _grant(self) -> None:
+        """在并发上限内按优先级唤醒等待者，槽位直接移交"""
+        while self._waiters and self.inflight < int(self.limit):
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue
+            self._set_inflight(self.inflight + 1)
+            future.set_result(None)
+            self._set_queued(self._queued - 1)
+
+    def _adjust(self, latency: float) -> None:
+        now = time.monotonic()
+        if latency > self.target_latency:
+            # 同一个目标延迟周期内只收缩一次，避免突发慢请求把上限打到底
+            if now - self._last_decrease >= self.target_latency:
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+                self._last_decrease = now
+        elif self.inflight >= int(self.limit):
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        ADMISSION_LIMIT.set(self.limit)
+
+    def _compact(self) -> None:
+        self._waiters = [entry for entry in self._waiters if not entry[2].done()]
+        heapq.heapify(self._waiters)
+
+    def _set_inflight(self, value: int) -> None:
+        self.inflight = value
+        ADMISSION_INFLIGHT.set(value)
+
+    def _set_queued(self, value: int) -> None:
+        self._queued = value
+        ADMISSION_QUEUED.set(value)
+
+
+class AdmissionMiddleware(Middleware):
+    """工具调用准入控制：按工具优先级排队，过载时快速返回 JSON-RPC 错误"""
+
+    def __init__(self, limiter: AdaptiveLimiter, priorities: dict = None, default_priority: int = 1):
+        self.limiter = limiter
+        self.priorities = priorities or {}
+        self.default_priority = default_priority
+
+    async def on_call_tool(self, context: MiddlewareContext, call_next):
+        tool = context.message.name
+        try:
+            await self.limiter.acquire(self.priorities.get(tool, self.default_priority))
+        except OverloadException as e:
+            reason = str(e)
+            ADMISSION_REJECTED.labels(tool=tool, reason=reason).inc()
+            logger.warning("admission-rejected", tool=tool, reason=reason,
+                           limit=int(self.limiter.limit), inflight=self.limiter.inflight)
+            raise McpError(ErrorData(code=OVERLOADED_ERROR_CODE,
+                                     message="Server overloaded, please retry later",
+                                     data={"reason": reason, "retry_after": self.limiter.queue_timeout}))
+        start = time.perf_counter()
+        try:
+            return await call_next(context)
+        finally:
+            self.limiter.release(time.perf_counter() - start)
@@ -4,12 +4,43 @@ from starlette.responses import JSONResponse
 from starlette import status
 from structlog import get_logger
 logger = get_logger(__name__)
+import functools
 import os
-from typing import Optional
+from typing import Iterable, Optional
 import ipaddress
+from ..config.settings import app_settings
+from ..services.tenants import TENANT_SCOPE_KEY, TenantRegistry, key_fingerprint
 
 ALLOW_HOSTS = ["172.20.80.1", "127.0.0.1"]
 
+
+class IpAllowlist:
+    """
+    预编译的 IP/CIDR 白名单。网段在初始化时解析一次，
+    每个 IP 的判定结果进入有界 LRU 缓存，重复来源无需再解析地址。
+    """
+
+    def __init__(self, cidrs: Iterable[str], allow_private: bool = True, cache_size: int = 4096):
+        self.networks = tuple(ipaddress.ip_network(cidr, strict=False) for cidr in cidrs)
+        self.allow_private = allow_private
+        self.is_allowed = functools.lru_cache(maxsize=cache_size)(self._decide)
+
+    def _decide(self, client_ip: str) -> bool:
+        try:
+            ip = ipaddress.ip_address(client_ip)
+        except ValueError:
+            return False
+        # 私有网络或回环地址自动放行
+        if self.allow_private and (ip.is_private or ip.is_loopback):
+            return True
+        # 额外白名单
+        return any(ip in network for network in self.networks if network.version == ip.version)
+
+
+default_allowlist = IpAllowlist(app_settings.AUTH_ALLOW_CIDRS or ALLOW_HOSTS,
+                                allow_private=app_settings.AUTH_ALLOW_PRIVATE,
+                                cache_size=app_settings.AUTH_IP_CACHE_SIZE)
+
 # 提取获取客户端真实 IP 的函数
 def get_client_ip(request: Request) -> str:
     headers = request.headers
@@ -23,15 +54,7 @@ def get_client_ip(request: Request) -> str:
 
 # 提取 IP 白名单判断函数
 def is_ip_allowed(client_ip: str) -> bool:
-    try:
-        ip = ipaddress.ip_address(client_ip)
-    except ValueError:
-        return False
-    # 私有网络或回环地址自动放行
-    if ip.is_private or ip.is_loopback:
-        return True
-    # 额外白名单
-    return client_ip in ALLOW_HOSTS
+    return default_allowlist.is_allowed(client_ip)
 
 # 提取解析 Bearer Token 的函数
 def get_bearer_token(auth_header: Optional[str]) -> Optional[str]:
@@ -47,30 +70,40 @@ def mark_session_authenticated(request: Request) -> None:
         session["is_authenticated"] = True
 
 class SimpleAuthMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app, api_key_env="API_KEY"):
+    """
+    Bearer Token 认证。token 按租户注册表校验，识别出的租户写入 scope[TENANT_SCOPE_KEY]；
+    白名单 IP 免认证，使用 TENANT_DEFAULT 租户。
+    """
+    def __init__(self, app, api_key_env="API_KEY", registry: TenantRegistry = None, allowlist: IpAllowlist = None):
         super().__init__(app)
-        self.api_key = os.getenv(api_key_env)
-        if not self.api_key:
-            raise RuntimeError("API_KEY must be set for SimpleAuthMiddleware")
-        logger.info("SimpleAuthMiddleware initialized")
+        self.registry = registry or TenantRegistry.from_config(app_settings.TENANTS_FILE,
+                                                               api_key=os.getenv(api_key_env),
+                                                               default=app_settings.TENANT_DEFAULT)
+        if not len(self.registry):
+            raise RuntimeError("API_KEY or TENANTS_FILE must be set for SimpleAuthMiddleware")
+        self.allowlist = allowlist or default_allowlist
+        logger.info("SimpleAuthMiddleware initialized", tenants=len(self.registry))
 
     async def dispatch(self, request: Request, call_next):
         auth_header = request.headers.get("authorization")
         client_ip = get_client_ip(request)
-        if is_ip_allowed(client_ip):
+        if self.allowlist.is_allowed(client_ip):
+            request.scope[TENANT_SCOPE_KEY] = self.registry.default
             mark_session_authenticated(request)
             return await call_next(request)
-        logger.info("simple-auth", client_ip=client_ip, header=auth_header)
 
         token = get_bearer_token(auth_header)
         if token is None:
-            logger.warning("simple-auth", client_ip=client_ip, detail="Bearer Token Not Provided", header=auth_header)
+            logger.warning("simple-auth", client_ip=client_ip, detail="Bearer Token Not Provided")
             return JSONResponse({"detail": "Bearer Token Not Provided"}, status_code=status.HTTP_401_UNAUTHORIZED)
 
-        if token != self.api_key:
-            logger.warning("simple-auth", client_ip=client_ip, detail="Invalid Token", token=token, header=auth_header)
+        tenant = self.registry.authenticate(token)
+        if tenant is None:
+            logger.warning("simple-auth", client_ip=client_ip, detail="Invalid Token", key_id=key_fingerprint(token))
             return JSONResponse({"detail": "Invalid Token"}, status_code=status.HTTP_403_FORBIDDEN)
+        logger.info("simple-auth", client_ip=client_ip, tenant=tenant.name)
 
-        # 认证通过，设置 session 标识并继续处理
+        # 认证通过，设置租户与 session 标识并继续处理
+        request.scope[TENANT_SCOPE_KEY] = tenant
         mark_session_authenticated(request)
-        return await call_next(request)
\ No newline at end of file
+        return await call_next(request)
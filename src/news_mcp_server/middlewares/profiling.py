@@ -0,0 +1,106 @@
+import asyncio
+import hmac
+import uuid
+from collections import OrderedDict
+from typing import Optional
+from starlette.datastructures import MutableHeaders
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse
+from starlette import status
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from ..config.settings import app_settings
+from ..utils.logger import logger
+from ..utils.profiler import SamplingProfiler
+
+PROFILE_HEADER = "x-profile-token"
+_PROFILE_HEADER_BYTES = PROFILE_HEADER.encode()
+
+# 同一时刻只允许一个采样会话，避免叠加开销
+_profile_lock = asyncio.Lock()
+# 最近若干次请求期间的采样结果，按 profile_id 取回
+_profiles = OrderedDict()
+
+
+def _token_matches(token: Optional[str]) -> bool:
+    if not app_settings.PROFILE_TOKEN or not token:
+        return False
+    return hmac.compare_digest(token.encode(), app_settings.PROFILE_TOKEN.encode())
+
+
+def is_profile_authorized(request: Request) -> bool:
+    return _token_matches(request.headers.get(PROFILE_HEADER))
+
+
+def _store_profile(profile_id: str, profiler: SamplingProfiler) -> None:
+    _profiles[profile_id] = profiler.folded()
+    while len(_profiles) > app_settings.PROFILE_KEEP:
+        _profiles.popitem(last=False)
+    logger.info("profile-captured", profile_id=profile_id,
+                samples=profiler.sample_count, duration_ms=int(profiler.duration * 1000))
+
+
+class RequestWindowProfilingMiddleware:
+    """
+    纯 ASGI 中间件：携带合法 X-Profile-Token 头的请求从进入到响应体发送完毕为一个采样窗口，
+    响应头 X-Profile-Id 可用于从 /debug/profile/{profile_id} 取回折叠栈。
+    采样的是窗口内事件循环线程上的全部调用栈（含同期其他请求与后台任务），
+    而不只是本请求：工具调用在会话任务中执行，按任务过滤反而会丢掉真正的处理过程。
+    未配置 PROFILE_TOKEN 或未携带该头的请求直接透传，不经过任何包装。
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not app_settings.PROFILE_TOKEN:
+            return await self.app(scope, receive, send)
+        token = next((value for name, value in scope["headers"] if name == _PROFILE_HEADER_BYTES), None)
+        if token is None or not _token_matches(token.decode("latin-1")) or _profile_lock.locked():
+            return await self.app(scope, receive, send)
+
+        await _profile_lock.acquire()
+        profile_id = uuid.uuid4().hex
+        profiler = SamplingProfiler(interval=app_settings.PROFILE_INTERVAL).start()
+
+        async def send_with_profile_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append("X-Profile-Id", profile_id)
+            await send(message)
+
+        try:
+            # ASGI 应用返回时响应体（含流式响应）已发送完毕
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            _store_profile(profile_id, profiler.stop())
+            _profile_lock.release()
+
+
+async def profile_window(request: Request):
+    """管理端点：对整个进程采样 seconds 秒，直接返回折叠栈"""
+    if not is_profile_authorized(request):
+        return JSONResponse({"detail": "Profiling not authorized"}, status_code=status.HTTP_403_FORBIDDEN)
+    try:
+        seconds = float(request.query_params.get("seconds", 10))
+    except ValueError:
+        return JSONResponse({"detail": "Invalid seconds"}, status_code=status.HTTP_400_BAD_REQUEST)
+    seconds = min(max(seconds, 0.1), app_settings.PROFILE_MAX_SECONDS)
+    if _profile_lock.locked():
+        return JSONResponse({"detail": "Profiling already in progress"}, status_code=status.HTTP_409_CONFLICT)
+    async with _profile_lock:
+        profiler = SamplingProfiler(interval=app_settings.PROFILE_INTERVAL).start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profiler.stop()
+    logger.info("profile-window", seconds=seconds, samples=profiler.sample_count)
+    return PlainTextResponse(profiler.folded())
+
+
+async def get_profile(request: Request):
+    """管理端点：取回请求窗口的采样结果"""
+    if not is_profile_authorized(request):
+        return JSONResponse({"detail": "Profiling not authorized"}, status_code=status.HTTP_403_FORBIDDEN)
+    folded = _profiles.get(request.path_params["profile_id"])
+    if folded is None:
+        return JSONResponse({"detail": "Profile not found"}, status_code=status.HTTP_404_NOT_FOUND)
+    return PlainTextResponse(folded)
@@ -3,24 +3,28 @@ from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request
 from starlette.responses import JSONResponse
 from starlette import status
-from redis import asyncio as aioredis
+from ..services.tenants import TENANT_SCOPE_KEY
 from ..utils.logger import logger
+from ..utils.tracing import tracer
 
 
 class RedisRateLimitMiddleware(BaseHTTPMiddleware):
     """
     基于 Redis 的简单 IP 限流中间件。
     每个 IP 在固定时间窗口内最多允许 max_requests 次请求。
+    per_tenant=True 时改为按租户计数（需放在认证中间件之后），上限取租户的 rate_limit，未设置则不限。
     """
-    def __init__(self, app, redis_url: str, max_requests: int, window_seconds: int):
+    def __init__(self, app, redis_url: str, max_requests: int, window_seconds: int, per_tenant: bool = False):
         super().__init__(app)
         self.redis_url = redis_url
         self.max_requests = max_requests
         self.window = window_seconds
+        self.per_tenant = per_tenant
         self._redis = None
 
     async def _get_redis(self):
         if self._redis is None:
+            from redis import asyncio as aioredis
             # 仅在首次调用时创建 Redis 连接
             self._redis = await aioredis.from_url(
                 self.redis_url, encoding="utf-8", decode_responses=True
@@ -28,8 +32,15 @@ class RedisRateLimitMiddleware(BaseHTTPMiddleware):
         return self._redis
 
     async def dispatch(self, request: Request, call_next):
-        # 获取客户端 IP
-        client_host = request.client.host if request.client else "unknown"
+        if self.per_tenant:
+            tenant = request.scope.get(TENANT_SCOPE_KEY)
+            if tenant is None or not tenant.rate_limit:
+                return await call_next(request)
+            client_host, max_requests = f"tenant:{tenant.name}", tenant.rate_limit
+        else:
+            # 获取客户端 IP
+            client_host = request.client.host if request.client else "unknown"
+            max_requests = self.max_requests
         logger.debug("rate-limiter", host=client_host)
         # 计算当前时间窗口
         now = int(time.time())
@@ -37,13 +48,15 @@ class RedisRateLimitMiddleware(BaseHTTPMiddleware):
         key = f"ratelimit:{client_host}:{window_key}"
         redis = await self._get_redis()
         # 自增计数
-        count = await redis.incr(key)
+        with tracer.start_span("redis.incr", **{"db.system": "redis"}):
+            count = await redis.incr(key)
         if count == 1:
             # 设置过期时间为一个窗口长度
-            await redis.expire(key, self.window)
+            with tracer.start_span("redis.expire", **{"db.system": "redis"}):
+                await redis.expire(key, self.window)
 
         # 超出限流阈值，返回 429
-        if count > self.max_requests:
+        if count > max_requests:
             logger.info("rate-limiter", host=client_host, key=key)
             return JSONResponse(
                 {"detail": "请求过多，请稍后重试"},
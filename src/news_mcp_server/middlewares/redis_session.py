@@ -4,7 +4,7 @@ from itsdangerous import TimestampSigner, BadSignature
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request
 from starlette.responses import Response
-from redis import asyncio as aioredis
+from ..utils.tracing import tracer
 
 
 class RedisSessionMiddleware(BaseHTTPMiddleware):
@@ -25,6 +25,7 @@ class RedisSessionMiddleware(BaseHTTPMiddleware):
 
     async def _get_redis(self):
         if self._redis is None:
+            from redis import asyncio as aioredis
             self._redis = await aioredis.from_url(self.redis_url, encoding="utf-8", decode_responses=True)
         return self._redis
 
@@ -43,7 +44,8 @@ class RedisSessionMiddleware(BaseHTTPMiddleware):
 
         # 取 Redis 中的数据
         redis = await self._get_redis()
-        raw = await redis.get(f"session:{session_id}")
+        with tracer.start_span("redis.get", **{"db.system": "redis"}):
+            raw = await redis.get(f"session:{session_id}")
         try:
             session_data = json.loads(raw) if raw else {}
         except json.JSONDecodeError:
@@ -54,7 +56,8 @@ class RedisSessionMiddleware(BaseHTTPMiddleware):
         response: Response = await call_next(request)
 
         # 写回 Redis
-        await redis.setex(f"session:{session_id}", self.max_age, json.dumps(request.scope.get('session', {})))
+        with tracer.start_span("redis.setex", **{"db.system": "redis"}):
+            await redis.setex(f"session:{session_id}", self.max_age, json.dumps(request.scope.get('session', {})))
 
         # 设置 cookie
         signed = self.signer.sign(session_id.encode()).decode()
@@ -0,0 +1,67 @@
+from fastmcp.server.middleware import Middleware as MCPMiddleware, MiddlewareContext
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from ..utils.tracing import STATUS_ERROR, parse_traceparent, tracer
+
+# 根 span 存放在 ASGI scope 中：streamable-http 下工具在 session 任务里执行，
+# contextvars 无法从 HTTP 请求传递过去，只能经由 ctx.request_context.request.scope 取回
+TRACE_SCOPE_KEY = "news_mcp.trace_span"
+
+
+class TracingMiddleware:
+    """根 span：解析 W3C traceparent，记录 HTTP 信息，并通过响应头返回 traceparent / X-Trace-Id"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        headers = dict(scope.get("headers", []))
+        remote = parse_traceparent(headers.get(b"traceparent", b"").decode("latin-1"))
+        attributes = {"http.method": scope.get("method"), "http.target": scope.get("path")}
+        if scope.get("client"):
+            attributes["client.address"] = scope["client"][0]
+        with tracer.start_span("http.request", traceparent=remote, **attributes) as span:
+            scope[TRACE_SCOPE_KEY] = span
+
+            async def send_with_trace(message: Message):
+                if message["type"] == "http.response.start":
+                    span.set_attributes(**{"http.status_code": message["status"]})
+                    if message["status"] >= 500:
+                        span.status = STATUS_ERROR
+                    message = {**message, "headers": [*message.get("headers", []),
+                                                      (b"traceparent", span.traceparent.encode()),
+                                                      (b"x-trace-id", span.trace_id.encode())]}
+                await send(message)
+
+            await self.app(scope, receive, send_with_trace)
+
+
+class SpanMiddleware:
+    """为紧随其后的中间件创建 span，name 用于区分各层"""
+
+    def __init__(self, app: ASGIApp, name: str):
+        self.app = app
+        self.span_name = f"middleware.{name}"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        with tracer.start_span(self.span_name):
+            await self.app(scope, receive, send)
+
+
+class ToolTracingMiddleware(MCPMiddleware):
+    """工具分发 span，父 span 取自触发本次调用的 HTTP 请求"""
+
+    async def on_call_tool(self, context: MiddlewareContext, call_next):
+        parent = None
+        try:
+            request = context.fastmcp_context.request_context.request
+        except (AttributeError, ValueError):
+            request = None
+        if request is not None:
+            parent = request.scope.get(TRACE_SCOPE_KEY)
+        tool = context.message.name
+        with tracer.start_span(f"mcp.tool {tool}", parent=parent, **{"mcp.tool": tool}):
+            return await call_next(context)
@@ -1,11 +1,82 @@
-from typing import Optional, List
-from ..clients.elastic_client import AsyncElasticClient
+import asyncio
+from typing import TYPE_CHECKING, Optional, List, Tuple
 from ..schemas.news import NewsBaseItem, NewsDetailItem
-from ..config.settings import es_settings
+from ..config.settings import app_settings, es_settings
+from ..exceptions import QueryTooCostlyException, ToolException
+from ..utils.cancellation import CancelToken
+from ..utils.tracing import tracer
+from ..clients.ranking import DEFAULT_PROFILES, RANKING_TIME, RankingProfile
+from .prefetch import DetailPrefetcher
+from .query_cost import QUERY_PLANS, QueryBudget, QueryPlan, plan_topic_query
+from .suggest import SUGGEST_KINDS, SUGGEST_TITLES, SuggestIndex
+from .tenants import Tenant
+from .watermark import WatermarkStore, watermark_key
+
+if TYPE_CHECKING:
+    from ..clients.elastic_client import AsyncElasticClient
+
+
+def _check_cancelled(cancel_token: Optional[CancelToken]) -> None:
+    """客户端已断开时跳过结果转换"""
+    if cancel_token is not None:
+        cancel_token.raise_if_cancelled('conversion')
+
+
+def _convert(model, items: List[dict]) -> list:
+    """ES 结果转换为 Pydantic 模型"""
+    with tracer.start_span("service.convert", model=model.__name__, items=len(items)):
+        return [model(**item) for item in items]
+
 
 class NewsService:
-    def __init__(self, client: AsyncElasticClient):
+    def __init__(self, client: "AsyncElasticClient", prefetcher: Optional[DetailPrefetcher] = None,
+                 watermarks: Optional[WatermarkStore] = None, budget: Optional[QueryBudget] = None,
+                 tenant: Optional[Tenant] = None, rankings: Optional[dict] = None,
+                 suggestions: Optional[SuggestIndex] = None):
         self.client = client
+        self.prefetcher = prefetcher
+        self.watermarks = watermarks
+        self.budget = budget or QueryBudget()
+        self.tenant = tenant
+        self.rankings = rankings or DEFAULT_PROFILES
+        self.suggestions = suggestions
+        self.max_results = min(tenant.max_results or es_settings.MAX_RESULTS_LIMIT, es_settings.MAX_RESULTS_LIMIT) \
+            if tenant else es_settings.MAX_RESULTS_LIMIT
+        self._tenant_views = {}
+
+    def for_tenant(self, tenant: Optional[Tenant]) -> "NewsService":
+        """
+        返回租户对应的服务视图：查询租户的索引/别名并套用其返回条数上限。
+        视图按租户名缓存，与本实例共享 ES 连接、预取、水位存储与代价预算。
+        """
+        if tenant is None:
+            return self
+        view = self._tenant_views.get(tenant.name)
+        if view is None or view.tenant is not tenant:
+            client = self.client.for_index(tenant.index, tenant.index_prefix) if tenant.index else self.client
+            # 独立索引的租户使用自己的前缀索引，来源名不会跨租户泄露
+            suggestions = self.suggestions
+            if suggestions is not None and tenant.index:
+                suggestions = suggestions.for_client(client)
+            view = NewsService(client, prefetcher=self.prefetcher, watermarks=self.watermarks,
+                               budget=self.budget, tenant=tenant, rankings=self.rankings,
+                               suggestions=suggestions)
+            self._tenant_views[tenant.name] = view
+        return view
+
+    def _ranking(self, tool: str, mode: Optional[str]) -> RankingProfile:
+        """工具的排序配置；调用方传入 mode 时覆盖配置中的排序方式"""
+        try:
+            return self.rankings.get(tool, RankingProfile()).with_mode(mode)
+        except ValueError as e:
+            raise ToolException(str(e))
+
+    def _prefetch(self, session_id: Optional[str], items: List[dict]) -> None:
+        """搜索返回后为会话预取前几条详情（未启用预取时为空操作）"""
+        if self.prefetcher is None:
+            return
+        self.prefetcher.schedule(session_id, [item['news_id'] for item in items if item.get('news_id')],
+                                 client=self.client)
 
     async def search_news(
         self,
@@ -13,24 +84,37 @@ class NewsService:
         max_results: int = 10,
         source: Optional[str] = None,
         date_from: Optional[str] = None,
-        date_to: Optional[str] = None
+        date_to: Optional[str] = None,
+        cancel_token: Optional[CancelToken] = None,
+        session_id: Optional[str] = None,
+        ranking: Optional[str] = None
     ) -> List[NewsBaseItem]:
         """按关键词、来源、时间范围搜索新闻，并返回 NewsItem 列表"""
-        limit = min(max_results, es_settings.MAX_RESULTS_LIMIT)
+        limit = min(max_results, self.max_results)
 
         items = await self.client.search_news(
             query=query,
             source=source,
             date_from=date_from,
             date_to=date_to,
-            max_results=limit
+            max_results=limit,
+            cancel_token=cancel_token,
+            ranking=self._ranking("search_news", ranking)
         )
-        return [NewsBaseItem(**item) for item in items]
+        _check_cancelled(cancel_token)
+        self._prefetch(session_id, items)
+        return _convert(NewsBaseItem, items)
 
-    async def read_news(self, news_id: str) -> NewsDetailItem:
-        """按 news_id 获取单条新闻，并返回 NewsDetailItem"""
-        data = await self.client.get_by_id(news_id)
-        return NewsDetailItem(**data)
+    async def read_news(self, news_id: str, cancel_token: Optional[CancelToken] = None,
+                        session_id: Optional[str] = None) -> NewsDetailItem:
+        """按 news_id 获取单条新闻，并返回 NewsDetailItem；优先使用本会话的预取结果"""
+        data = None
+        if self.prefetcher is not None:
+            data = await self.prefetcher.lookup(session_id, news_id)
+        if data is None:
+            data = await self.client.get_by_id(news_id, cancel_token=cancel_token)
+        _check_cancelled(cancel_token)
+        return _convert(NewsDetailItem, [data])[0]
 
     async def search_news_with_secondary_filter(self,
                                               primary_query: str,
@@ -38,19 +122,26 @@ class NewsService:
                                               max_results: int = 10,
                                               source: Optional[str] = None,
                                               date_from: Optional[str] = None,
-                                              date_to: Optional[str] = None) -> List[NewsBaseItem]:
+                                              date_to: Optional[str] = None,
+                                              cancel_token: Optional[CancelToken] = None,
+                                              session_id: Optional[str] = None,
+                                              ranking: Optional[str] = None) -> List[NewsBaseItem]:
         """
         按主、次查询词联合搜索新闻，并包装为 NewsBaseItem 列表
         """
         items = await self.client.search_news_with_secondary_filter(
             primary_query=primary_query,
             secondary_query=secondary_query,
-            max_results=max_results,
+            max_results=min(max_results, self.max_results),
             source=source,
             date_from=date_from,
             date_to=date_to,
+            cancel_token=cancel_token,
+            ranking=self._ranking("search_news_with_secondary_filter", ranking),
         )
-        return [NewsBaseItem(**item) for item in items]
+        _check_cancelled(cancel_token)
+        self._prefetch(session_id, items)
+        return _convert(NewsBaseItem, items)
 
     async def search_topic_news(
             self,
@@ -60,21 +151,180 @@ class NewsService:
             sources: Optional[str] = None,
             search_word=None,
             date_from: Optional[str] = None,
-            date_to: Optional[str] = None
+            date_to: Optional[str] = None,
+            cancel_token: Optional[CancelToken] = None,
+            session_id: Optional[str] = None,
+            ranking: Optional[str] = None
+    ) -> dict:
+        """
+        新功能：按多个主关键词(组)与次关键词组合(A&D|B&D|...)搜索新闻，并返回 NewsBaseItem 列表。
+        发往 ES 前先估算查询代价，超出预算时拆分、降级或拒绝，处理结果记录在 query_plan 中。
+        """
+        profile = self._ranking("search_topic_news", ranking)
+        plan = self._plan_topic_query("search_topic_news", primary_queries, secondary_query, sources,
+                                      max_results, search_word, date_from, date_to)
+        if plan.rejected:
+            raise QueryTooCostlyException("Topic query exceeds the cost budget", plan.feedback)
+        if plan.filter_only and profile.scored:
+            # 降级为 filter 上下文后没有相关性得分，退回按时间排序
+            profile = profile.with_mode(RANKING_TIME)
+        data, total = await self._search_topic_chunks(
+            plan,
+            ranking=profile,
+            secondary_query=secondary_query,
+            search_word=search_word,
+            date_from=date_from,
+            date_to=date_to,
+            cancel_token=cancel_token
+        )
+        _check_cancelled(cancel_token)
+        self._prefetch(session_id, data)
+        return {
+            "total": total,
+            "data": _convert(NewsBaseItem, data),
+            "query_plan": plan.feedback
+        }
+
+    def _plan_topic_query(self, tool: str, primary_queries, secondary_query, sources, max_results,
+                          search_word, date_from, date_to) -> QueryPlan:
+        limit = min(max_results, self.max_results)
+        plan = plan_topic_query(primary_queries, secondary_query, sources, limit, self.budget,
+                                search_word=search_word, has_range=bool(date_from or date_to))
+        QUERY_PLANS.labels(tool=tool, action=plan.action).inc()
+        return plan
+
+    async def _search_topic_chunks(self, plan: QueryPlan, ranking: RankingProfile,
+                                   **kwargs) -> Tuple[List[dict], int]:
+        """
+        按查询计划执行；拆分时并发执行各子查询，按 news_id 去重后合并：
+        按时间排序时按发布时间降序，按相关性排序时按 ES 返回的得分降序
+        """
+        semaphore = asyncio.Semaphore(self.budget.fanout_concurrency)
+
+        async def run(chunk):
+            async with semaphore:
+                return await self.client.search_topic_news(primary_queries=chunk.primary_queries,
+                                                           sources=chunk.sources,
+                                                           max_results=plan.size,
+                                                           filter_only=plan.filter_only,
+                                                           ranking=ranking,
+                                                           **kwargs)
+
+        if len(plan.chunks) == 1:
+            response = await run(plan.chunks[0])
+            return response.data, response.total
+        tasks = [asyncio.ensure_future(run(chunk)) for chunk in plan.chunks]
+        try:
+            responses = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        merged = {}
+        for response in responses:
+            scores = response.scores if ranking.scored and response.scores else [0.0] * len(response.data)
+            for item, score in zip(response.data, scores):
+                key = item.get('news_id') or id(item)
+                # 同一新闻命中多个子查询时保留最高得分
+                if key not in merged or score > merged[key][1]:
+                    merged[key] = (item, score)
+        if ranking.scored:
+            ordered = sorted(merged.values(), key=lambda pair: pair[1], reverse=True)
+        else:
+            ordered = sorted(merged.values(), key=lambda pair: pair[0].get('release_time') or '', reverse=True)
+        data = [item for item, _ in ordered]
+        return data[:plan.size], sum(response.total for response in responses)
+
+    async def suggest(self, prefix: str, kind: Optional[str] = None, max_results: int = 10,
+                      cancel_token: Optional[CancelToken] = None) -> dict:
+        """
+        按前缀补全数据源名称、标题高频短语与新闻标题。
+        sources/phrases 取自内存前缀索引；titles 需查询 ES，且仅在前缀非空时查询。
+        """
+        kinds = (kind,) if kind else SUGGEST_KINDS
+        if any(k not in SUGGEST_KINDS for k in kinds):
+            raise ToolException(f"Unsupported suggest kind: {kind}")
+        limit = min(max_results, self.max_results)
+        result = {}
+        memory_kinds = [k for k in kinds if k != SUGGEST_TITLES]
+        if memory_kinds:
+            if self.suggestions is None:
+                raise ToolException("suggest index is disabled")
+            await self.suggestions.ensure_loaded()
+            for k in memory_kinds:
+                result[k] = self.suggestions.complete(k, prefix, limit)
+        if SUGGEST_TITLES in kinds:
+            items = await self.client.suggest_titles(prefix, limit, cancel_token=cancel_token) if prefix.strip() else []
+            _check_cancelled(cancel_token)
+            result[SUGGEST_TITLES] = _convert(NewsBaseItem, items)
+        return result
+
+    async def watch_topic_news(
+            self,
+            primary_queries: List[str],
+            secondary_query: List[str],
+            max_results: int = 10,
+            sources: Optional[List[str]] = None,
+            search_word=None,
+            date_from: Optional[str] = None,
+            subscription: Optional[str] = None,
+            cancel_token: Optional[CancelToken] = None,
+            session_id: Optional[str] = None
     ) -> dict:
         """
-        新功能：按多个主关键词(组)与次关键词组合(A&D|B&D|...)搜索新闻，并返回 NewsBaseItem 列表
+        增量版 search_topic_news：只返回上次水位之后的新闻，并把水位推进到本次最后一条。
+        date_from 仅在尚无水位时生效，为空则回看 WATCH_DEFAULT_LOOKBACK。
         """
-        items = await self.client.search_topic_news(
+        if self.watermarks is None:
+            raise ToolException("watch_topic_news requires a watermark store")
+        if not primary_queries and not sources:
+            raise ToolException("watch_topic_news requires primary_queries or sources")
+        key = watermark_key(session_id, subscription, {
+            "primary_queries": primary_queries,
+            "secondary_query": secondary_query,
+            "sources": sources,
+            "search_word": search_word,
+        }, tenant=self.tenant.name if self.tenant else None)
+        if key is None:
+            raise ToolException("watch_topic_news requires a subscription name when there is no session")
+
+        plan = self._plan_topic_query("watch_topic_news", primary_queries, secondary_query, sources,
+                                      max_results, search_word, date_from, None)
+        if plan.rejected or len(plan.chunks) > 1:
+            # 增量拉取依赖单一的排序游标，无法拆分扇出
+            feedback = dict(plan.feedback, action="reject") if len(plan.chunks) > 1 else plan.feedback
+            raise QueryTooCostlyException("Topic query exceeds the cost budget", feedback)
+        limit = plan.size
+        watermark = await self.watermarks.get(key)
+        if watermark:
+            # 水位的 release_time 作为范围下界，既能裁剪分区，也让 ES 跳过更早的分片
+            search_after, lower_bound = watermark["sort"], watermark["release_time"]
+        else:
+            search_after, lower_bound = None, date_from or app_settings.WATCH_DEFAULT_LOOKBACK
+
+        result = await self.client.watch_topic_news(
             primary_queries=primary_queries,
             secondary_query=secondary_query,
             sources=sources,
-            max_results=max_results,
+            max_results=limit,
             search_word=search_word,
-            date_from=date_from,
-            date_to=date_to
+            date_from=lower_bound,
+            search_after=search_after,
+            cancel_token=cancel_token,
+            filter_only=plan.filter_only
         )
+        # 客户端已断开时不推进水位，下次仍能拿到这批新闻
+        _check_cancelled(cancel_token)
+        if result.data and result.sort:
+            last = result.data[-1]
+            watermark = {"release_time": last.get("release_time"), "news_id": last.get("news_id"), "sort": result.sort}
+            await self.watermarks.set(key, watermark)
+        self._prefetch(session_id, result.data)
         return {
-            "total": items.total,
-            "data": [NewsBaseItem(**item) for item in items.data]
+            "subscription": key,
+            "count": len(result.data),
+            "has_more": len(result.data) >= limit,
+            "watermark": {"release_time": watermark["release_time"], "news_id": watermark["news_id"]} if watermark else None,
+            "query_plan": plan.feedback,
+            "data": _convert(NewsBaseItem, result.data)
         }
@@ -0,0 +1,122 @@
+"""
+搜索后的详情预取：搜索返回后在后台一次性拉取前 K 条新闻详情，
+放入按会话隔离的有界缓存，随后的 read_single_news 直接由本地返回。
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Callable, List, Optional
+from prometheus_client import Counter
+from ..utils.logger import logger
+
+if TYPE_CHECKING:
+    from ..clients.elastic_client import AsyncElasticClient
+
+PREFETCH_LOOKUPS = Counter("mcp_prefetch_lookups_total", "预取缓存查询次数", ["result"])
+PREFETCH_BATCHES = Counter("mcp_prefetch_batches_total", "预取批次", ["outcome"])
+
+
+class PrefetchCache:
+    """按会话隔离的 LRU + TTL 缓存，会话数与单会话条数均有上限"""
+
+    def __init__(self, max_sessions: int = 1000, max_items: int = 50, ttl: float = 300):
+        self.max_sessions = max_sessions
+        self.max_items = max_items
+        self.ttl = ttl
+        self._sessions = OrderedDict()
+
+    def get(self, session_id: str, news_id: str) -> Optional[dict]:
+        items = self._sessions.get(session_id)
+        if items is None or news_id not in items:
+            return None
+        expires_at, doc = items[news_id]
+        if expires_at < time.monotonic():
+            del items[news_id]
+            return None
+        self._sessions.move_to_end(session_id)
+        return doc
+
+    def contains(self, session_id: str, news_id: str) -> bool:
+        return self.get(session_id, news_id) is not None
+
+    def put_many(self, session_id: str, docs: dict) -> None:
+        items = self._sessions.setdefault(session_id, OrderedDict())
+        self._sessions.move_to_end(session_id)
+        expires_at = time.monotonic() + self.ttl
+        for news_id, doc in docs.items():
+            items[news_id] = (expires_at, doc)
+            items.move_to_end(news_id)
+        while len(items) > self.max_items:
+            items.popitem(last=False)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+
+class DetailPrefetcher:
+    """
+    预取调度器。预取只在有空闲预算时进行：同时进行的批次数有上限，
+    且 is_busy() 返回 True（前台负载高）时直接跳过。
+    """
+
+    def __init__(self,
+                 client: "AsyncElasticClient",
+                 cache: PrefetchCache,
+                 top_k: int = 3,
+                 max_concurrent: int = 2,
+                 is_busy: Callable[[], bool] = None,
+                 wait_timeout: float = 1.0):
+        self.client = client
+        self.cache = cache
+        self.top_k = top_k
+        self.max_concurrent = max_concurrent
+        self.is_busy = is_busy or (lambda: False)
+        self.wait_timeout = wait_timeout
+        self._pending = {}  # (session_id, news_id) -> 进行中的预取任务
+
+    def schedule(self, session_id: Optional[str], news_ids: List[str],
+                 client: Optional["AsyncElasticClient"] = None) -> None:
+        """搜索返回后调用：为 session 预取前 top_k 条尚未缓存的详情；client 为租户对应的客户端视图"""
+        if not session_id:
+            return
+        news_ids = [news_id for news_id in news_ids[:self.top_k]
+                    if (session_id, news_id) not in self._pending and not self.cache.contains(session_id, news_id)]
+        if not news_ids:
+            return
+        if len(set(self._pending.values())) >= self.max_concurrent or self.is_busy():
+            PREFETCH_BATCHES.labels(outcome="skipped").inc()
+            return
+        task = asyncio.create_task(self._fetch(session_id, news_ids, client or self.client))
+        for news_id in news_ids:
+            self._pending[(session_id, news_id)] = task
+
+    async def _fetch(self, session_id: str, news_ids: List[str], client: "AsyncElasticClient") -> None:
+        try:
+            docs = await client.get_many(news_ids)
+            self.cache.put_many(session_id, docs)
+            PREFETCH_BATCHES.labels(outcome="fetched").inc()
+        except Exception as e:
+            PREFETCH_BATCHES.labels(outcome="failed").inc()
+            logger.warning("prefetch-failed", session_id=session_id, error=str(e))
+        finally:
+            for news_id in news_ids:
+                self._pending.pop((session_id, news_id), None)
+
+    async def lookup(self, session_id: Optional[str], news_id: str) -> Optional[dict]:
+        """查询预取缓存；该条正在预取时短暂等待其完成"""
+        if not session_id:
+            return None
+        task = self._pending.get((session_id, news_id))
+        if task is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(task), self.wait_timeout)
+            except asyncio.TimeoutError:
+                pass
+        doc = self.cache.get(session_id, news_id)
+        PREFETCH_LOOKUPS.labels(result="hit" if doc is not None else "miss").inc()
+        return doc
+
+    async def close(self) -> None:
+        tasks = set(self._pending.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,176 @@
+"""
+search_topic_news 的查询代价估算与预算检查。
+主题查询按 (主关键词|数据源) × 筛选词 展开为 bool should 分支，列表稍长即可能产生上千个子句。
+在发往 ES 之前估算分支数、子句数与词项展开量，超出预算时按以下顺序处理：
+- 拆分：按主关键词/数据源分组扇出为多个子查询，结果按发布时间合并
+- 降级：改为 filter 上下文（不计算相关性得分，子句可被缓存）并减小返回条数
+- 拒绝：拆分后子查询数仍超限、单个分组本身超限或代价过高时直接拒绝
+每种处理都会生成结构化反馈，说明估算值、预算与建议，供调用方调整查询。
+"""
+import math
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional
+from prometheus_client import Counter
+
+# JSON-RPC 自定义错误码：查询代价超出预算
+QUERY_TOO_COSTLY_ERROR_CODE = -32004
+
+QUERY_PLANS = Counter("mcp_query_plans_total", "主题查询代价检查结果", ["tool", "action"])
+
+ACTION_RUN = "run"
+ACTION_SPLIT = "split"
+ACTION_DOWNGRADE = "downgrade"
+ACTION_REJECT = "reject"
+
+_LATIN_WORD = re.compile(r"[A-Za-z0-9]+")
+_CJK_CHAR = re.compile("[\u3400-\u9fff]")
+
+
+def estimate_terms(text: Optional[str]) -> int:
+    """按 standard 分词器估算词项数：中日韩字符逐字切分，拉丁字母与数字按词切分"""
+    if not text:
+        return 0
+    return max(1, len(_CJK_CHAR.findall(text)) + len(_LATIN_WORD.findall(text)))
+
+
+@dataclass
+class QueryBudget:
+    max_branches: int = 64  # 单个查询的 should 分支数
+    max_clauses: int = 1024  # 单个查询的子句总数，需低于 ES 的 max_clause_count
+    max_cost: int = 2000  # 词项展开量，超过则降级
+    reject_cost: int = 20000  # 词项展开量，超过则拒绝
+    max_fanout: int = 8  # 拆分后的最大子查询数
+    downgrade_size: int = 20  # 降级后的返回条数上限
+    fanout_concurrency: int = 4  # 拆分后子查询的并发数
+
+
+@dataclass
+class QueryCost:
+    branches: int
+    clauses: int
+    cost: int
+
+    def to_dict(self) -> dict:
+        return {"branches": self.branches, "clauses": self.clauses, "cost": self.cost}
+
+
+@dataclass
+class QueryChunk:
+    primary_queries: List[str]
+    sources: List[str]
+
+
+@dataclass
+class QueryPlan:
+    action: str
+    cost: QueryCost
+    chunks: List[QueryChunk] = field(default_factory=list)
+    size: int = 10
+    filter_only: bool = False
+    feedback: Optional[dict] = None
+
+    @property
+    def rejected(self) -> bool:
+        return self.action == ACTION_REJECT
+
+
+def estimate_topic_cost(primary_queries: List[str], secondary_queries: List[str], sources: List[str],
+                        search_word: Optional[str] = None, has_range: bool = False) -> QueryCost:
+    """
+    估算主题查询的规模。每个分支包含锚点（主关键词 match_phrase 或数据源 term）、
+    可选的筛选词 match_phrase、search_word 的 multi_match（title、content 两个字段）与时间范围。
+    代价为各分支需要查找的词项数之和。
+    """
+    primary_queries, secondary_queries, sources = primary_queries or [], secondary_queries or [], sources or []
+    per_anchor = max(1, len(secondary_queries))
+    branches = (len(primary_queries) + len(sources)) * per_anchor
+    clauses_per_branch = 1 + (1 if secondary_queries else 0) + (1 if search_word else 0) + (1 if has_range else 0)
+    # 每个分支外层还有一个 bool
+    clauses = branches * (clauses_per_branch + 1)
+
+    anchor_terms = sum(estimate_terms(q) for q in primary_queries) + len(sources)
+    secondary_terms = sum(estimate_terms(q) for q in secondary_queries)
+    common_terms = estimate_terms(search_word) * 2 + (1 if has_range else 0)
+    cost = (anchor_terms * per_anchor
+            + secondary_terms * (len(primary_queries) + len(sources))
+            + common_terms * branches)
+    return QueryCost(branches=branches, clauses=clauses, cost=cost)
+
+
+def _chunk_anchors(primary_queries: List[str], sources: List[str], anchors_per_chunk: int) -> List[QueryChunk]:
+    anchors = [("primary", q) for q in primary_queries] + [("source", s) for s in sources]
+    chunks = []
+    for start in range(0, len(anchors), anchors_per_chunk):
+        group = anchors[start:start + anchors_per_chunk]
+        chunks.append(QueryChunk(primary_queries=[v for kind, v in group if kind == "primary"],
+                                 sources=[v for kind, v in group if kind == "source"]))
+    return chunks
+
+
+def _feedback(plan: QueryPlan, budget: QueryBudget, requested_size: int, reason: str,
+              suggestions: List[str]) -> dict:
+    return {
+        "action": plan.action,
+        "reason": reason,
+        "estimate": plan.cost.to_dict(),
+        "budget": {"max_branches": budget.max_branches, "max_clauses": budget.max_clauses,
+                   "max_cost": budget.max_cost, "max_fanout": budget.max_fanout},
+        "applied": {"sub_queries": len(plan.chunks), "size": plan.size, "requested_size": requested_size,
+                    "scoring": not plan.filter_only},
+        "suggestions": suggestions,
+    }
+
+
+def plan_topic_query(primary_queries: List[str], secondary_queries: List[str], sources: List[str],
+                     size: int, budget: QueryBudget, search_word: Optional[str] = None,
+                     has_range: bool = False) -> QueryPlan:
+    """按预算决定直接执行、拆分扇出、降级或拒绝"""
+    primary_queries, secondary_queries, sources = primary_queries or [], secondary_queries or [], sources or []
+    cost = estimate_topic_cost(primary_queries, secondary_queries, sources, search_word, has_range)
+    plan = QueryPlan(action=ACTION_RUN, cost=cost, size=size,
+                     chunks=[QueryChunk(primary_queries=list(primary_queries), sources=list(sources))])
+
+    if cost.cost > budget.reject_cost:
+        plan.action, plan.chunks = ACTION_REJECT, []
+        plan.feedback = _feedback(plan, budget, size, "estimated cost exceeds the hard limit",
+                                  ["减少 primary_queries / sources / secondary_querys 的数量",
+                                   "缩短关键词，或拆成多次调用"])
+        return plan
+
+    per_anchor = max(1, len(secondary_queries))
+    per_branch_clauses = cost.clauses // cost.branches if cost.branches else 0
+    if cost.branches > budget.max_branches or cost.clauses > budget.max_clauses:
+        anchors_per_chunk = min(budget.max_branches // per_anchor,
+                                budget.max_clauses // max(1, per_branch_clauses * per_anchor))
+        chunk_count = math.ceil((len(primary_queries) + len(sources)) / anchors_per_chunk) if anchors_per_chunk else 0
+        if anchors_per_chunk == 0 or chunk_count > budget.max_fanout:
+            plan.action, plan.chunks = ACTION_REJECT, []
+            if anchors_per_chunk == 0:
+                reason = "secondary_querys alone exceed the per-query branch budget"
+                suggestions = [f"secondary_querys 不超过 {budget.max_branches} 个"]
+            else:
+                reason = "query needs more sub-queries than the fan-out budget allows"
+                suggestions = [f"primary_queries 与 sources 合计不超过 {anchors_per_chunk * budget.max_fanout} 个",
+                               "或减少 secondary_querys 的数量"]
+            plan.feedback = _feedback(plan, budget, size, reason, suggestions)
+            return plan
+        plan.action = ACTION_SPLIT
+        plan.chunks = _chunk_anchors(primary_queries, sources, anchors_per_chunk)
+
+    if cost.cost > budget.max_cost:
+        plan.action = ACTION_DOWNGRADE if plan.action == ACTION_RUN else f"{ACTION_SPLIT}+{ACTION_DOWNGRADE}"
+        plan.filter_only = True
+        plan.size = min(size, budget.downgrade_size)
+
+    if plan.action != ACTION_RUN:
+        reasons, suggestions = [], []
+        if len(plan.chunks) > 1:
+            reasons.append("branch or clause count exceeds the per-query budget")
+            suggestions.append(f"已拆分为 {len(plan.chunks)} 个子查询并按发布时间合并，total 为各子查询之和，可能偏大")
+        if plan.filter_only:
+            reasons.append("estimated cost exceeds the budget")
+            suggestions.append(f"已关闭相关性评分，返回条数由 {size} 降为 {plan.size}；"
+                               "缩小时间范围或减少关键词组合可获得完整结果")
+        plan.feedback = _feedback(plan, budget, size, "; ".join(reasons), suggestions)
+    return plan
@@ -0,0 +1,166 @@
+"""
+suggest 工具的内存前缀索引：数据源名称与标题高频短语各一棵前缀树，
+数据来自 ES terms 聚合，按 SUGGEST_REFRESH_INTERVAL 在后台刷新（过期后首次查询触发，查询本身不等待）。
+每个节点预先保存前 K 个候选，查询只需沿前缀走到对应节点，耗时与词表大小无关。
+"""
+import asyncio
+import re
+import time
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+from prometheus_client import Counter, Gauge
+from ..utils.logger import logger
+
+if TYPE_CHECKING:
+    from ..clients.elastic_client import AsyncElasticClient
+
+SUGGEST_SOURCES = "sources"
+SUGGEST_PHRASES = "phrases"
+SUGGEST_TITLES = "titles"
+SUGGEST_KINDS = (SUGGEST_SOURCES, SUGGEST_PHRASES, SUGGEST_TITLES)
+
+SUGGEST_ENTRIES = Gauge("mcp_suggest_entries", "suggest 前缀索引中的词条数", ["kind"])
+SUGGEST_REFRESHES = Counter("mcp_suggest_refreshes_total", "suggest 前缀索引刷新次数", ["outcome"])
+
+# 失败后的重试间隔上限（秒），避免 ES 不可用时每次查询都去刷新
+REFRESH_RETRY_AFTER = 60
+# shingle 以空格连接词元，中文按字切分后需去掉字间空格还原短语
+_CJK_GAP = re.compile("(?<=[\u3400-\u9fff]) (?=[\u3400-\u9fff])")
+
+
+def normalize(text: str) -> str:
+    return text.strip().casefold()
+
+
+class _Node:
+    __slots__ = ("children", "top")
+
+    def __init__(self):
+        self.children = {}
+        self.top = []
+
+
+class PrefixTrie:
+    """只读前缀树，构建时每个节点保留按权重降序的前 top_k 个候选"""
+
+    def __init__(self, entries: Iterable[Tuple[str, int]] = (), top_k: int = 20):
+        self.top_k = top_k
+        self.root = _Node()
+        self.size = 0
+        # 按权重降序插入，每个节点先到的即为前 K 个
+        for value, weight in sorted(entries, key=lambda entry: entry[1], reverse=True):
+            self._insert(value, weight)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _insert(self, value: str, weight: int) -> None:
+        key = normalize(value)
+        if not key:
+            return
+        entry = (value, weight)
+        node = self.root
+        if len(node.top) < self.top_k:
+            node.top.append(entry)
+        for char in key:
+            node = node.children.setdefault(char, _Node())
+            if len(node.top) < self.top_k:
+                node.top.append(entry)
+        self.size += 1
+
+    def complete(self, prefix: str, limit: int = 10) -> List[Tuple[str, int]]:
+        node = self.root
+        for char in normalize(prefix):
+            node = node.children.get(char)
+            if node is None:
+                return []
+        return node.top[:limit]
+
+
+def merge_phrases(buckets: Iterable[Tuple[str, int]]) -> Dict[str, int]:
+    """还原中文短语并合并重复项，同一短语保留最大文档数"""
+    phrases = {}
+    for key, count in buckets:
+        phrase = _CJK_GAP.sub("", key)
+        phrases[phrase] = max(count, phrases.get(phrase, 0))
+    return phrases
+
+
+class SuggestIndex:
+    """某个索引（或租户索引）对应的来源名与短语前缀索引"""
+
+    def __init__(self, client: "AsyncElasticClient", source_field: str, phrase_field: str,
+                 refresh_interval: float = 600, source_size: int = 2000, phrase_size: int = 5000,
+                 phrase_lookback: Optional[str] = "now-30d", top_k: int = 20):
+        self.client = client
+        self.source_field = source_field
+        self.phrase_field = phrase_field
+        self.refresh_interval = refresh_interval
+        self.source_size = source_size
+        self.phrase_size = phrase_size
+        self.phrase_lookback = phrase_lookback
+        self.top_k = top_k
+        self.tries = {SUGGEST_SOURCES: PrefixTrie(), SUGGEST_PHRASES: PrefixTrie()}
+        self.refreshed_at: Optional[float] = None
+        self._next_refresh = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self._views: Dict[str, "SuggestIndex"] = {}
+
+    def for_client(self, client: "AsyncElasticClient") -> "SuggestIndex":
+        """
+        同样配置、查询另一个索引的前缀索引（租户视图使用）。
+        按索引名复用，租户配置重载不会重复创建；close 时一并关闭。
+        """
+        view = self._views.get(client.index)
+        if view is None:
+            view = SuggestIndex(client, self.source_field, self.phrase_field, refresh_interval=self.refresh_interval,
+                                source_size=self.source_size, phrase_size=self.phrase_size,
+                                phrase_lookback=self.phrase_lookback, top_k=self.top_k)
+            self._views[client.index] = view
+        return view
+
+    async def refresh(self) -> None:
+        sources, phrases = await asyncio.gather(
+            self.client.terms(self.source_field, self.source_size),
+            self.client.terms(self.phrase_field, self.phrase_size, date_from=self.phrase_lookback),
+        )
+        # 先完整构建再整体替换，查询始终看到一致的快照
+        self.tries = {SUGGEST_SOURCES: PrefixTrie(sources, top_k=self.top_k),
+                      SUGGEST_PHRASES: PrefixTrie(merge_phrases(phrases).items(), top_k=self.top_k)}
+        self.refreshed_at = time.monotonic()
+        for kind, trie in self.tries.items():
+            SUGGEST_ENTRIES.labels(kind=kind).set(len(trie))
+
+    async def _refresh_safely(self) -> None:
+        try:
+            await self.refresh()
+        except Exception as e:
+            self._next_refresh = time.monotonic() + min(self.refresh_interval, REFRESH_RETRY_AFTER)
+            SUGGEST_REFRESHES.labels(outcome="failed").inc()
+            logger.warning("suggest-refresh-failed", index=self.client.index, error=str(e))
+        else:
+            self._next_refresh = self.refreshed_at + self.refresh_interval
+            SUGGEST_REFRESHES.labels(outcome="ok").inc()
+
+    def schedule_refresh(self) -> asyncio.Task:
+        """在后台刷新，已有刷新在进行时复用同一任务"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._refresh_safely())
+        return self._task
+
+    async def ensure_loaded(self) -> None:
+        """尚未加载时等待首次刷新；已加载但过期时后台刷新，本次仍使用旧数据"""
+        if time.monotonic() < self._next_refresh:
+            return
+        task = self.schedule_refresh()
+        if self.refreshed_at is None:
+            await asyncio.shield(task)
+
+    def complete(self, kind: str, prefix: str, limit: int = 10) -> List[dict]:
+        return [{"value": value, "count": count} for value, count in self.tries[kind].complete(prefix, limit)]
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+        for view in self._views.values():
+            await view.close()
+        self._views.clear()
@@ -0,0 +1,80 @@
+"""
+多租户注册表：
+- 每个租户有独立的 ES 索引/别名与配额（单次返回条数上限、每窗口请求数）
+- API Key 只保存 SHA-256 摘要，校验时对摘要做常量时间比较，进程内不保留明文
+- 认证中间件把识别出的租户放入 ASGI scope，工具调用据此选择对应的 NewsService 视图
+
+租户配置为 JSON 列表，例如：
+[{"name": "team-a", "key_sha256": ["<sha256 hex>"], "index": "news-team-a", "max_results": 50, "rate_limit": 200}]
+key_sha256 可通过 `echo -n <api key> | sha256sum` 生成，列出多个摘要即可平滑轮换密钥。
+"""
+import hashlib
+import hmac
+import json
+from dataclasses import dataclass
+from typing import List, Optional
+
+TENANT_SCOPE_KEY = "news_mcp.tenant"
+
+
+def hash_api_key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def key_fingerprint(token: str) -> str:
+    """日志中代替明文 token 的短指纹"""
+    return hash_api_key(token)[:8]
+
+
+@dataclass(frozen=True)
+class Tenant:
+    name: str
+    key_hashes: tuple = ()
+    index: Optional[str] = None  # ES 索引或别名，为空时使用 ES_INDEX
+    index_prefix: Optional[str] = None  # 按月分区时的分区前缀，为空则直接查询别名
+    max_results: Optional[int] = None  # 单次返回条数上限
+    rate_limit: Optional[int] = None  # 每个 RATE_LIMIT_WINDOW 内的请求数上限
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Tenant":
+        hashes = data.get("key_sha256") or []
+        if isinstance(hashes, str):
+            hashes = [hashes]
+        return cls(name=data["name"],
+                   key_hashes=tuple(h.lower() for h in hashes),
+                   index=data.get("index"),
+                   index_prefix=data.get("index_prefix"),
+                   max_results=data.get("max_results"),
+                   rate_limit=data.get("rate_limit"))
+
+
+class TenantRegistry:
+    def __init__(self, tenants: List[Tenant], default: Optional[str] = None):
+        self.tenants = {tenant.name: tenant for tenant in tenants}
+        self._by_hash = {key_hash: tenant for tenant in tenants for key_hash in tenant.key_hashes}
+        # 免认证来源（白名单 IP）使用的租户，未配置时使用全局默认索引与配额
+        self.default = self.tenants.get(default) if default else None
+
+    def __len__(self) -> int:
+        return len(self.tenants)
+
+    def authenticate(self, token: str) -> Optional[Tenant]:
+        """按 API Key 查找租户；以摘要查表，再对摘要做常量时间比较"""
+        digest = hash_api_key(token)
+        tenant = self._by_hash.get(digest)
+        for key_hash in tenant.key_hashes if tenant else ():
+            if hmac.compare_digest(key_hash, digest):
+                return tenant
+        return None
+
+    @classmethod
+    def from_config(cls, tenants_file: Optional[str] = None, api_key: Optional[str] = None,
+                    default: Optional[str] = None) -> "TenantRegistry":
+        """从 TENANTS_FILE 加载租户；兼容旧的单一 API_KEY，视为名为 default 的租户"""
+        tenants = []
+        if tenants_file:
+            with open(tenants_file, encoding="utf-8") as f:
+                tenants = [Tenant.from_dict(item) for item in json.load(f)]
+        if api_key:
+            tenants.append(Tenant(name="default", key_hashes=(hash_api_key(api_key),)))
+        return cls(tenants, default=default)
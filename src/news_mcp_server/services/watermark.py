@@ -0,0 +1,60 @@
+"""
+watch_topic_news 的增量水位：记录每个订阅最后看到的 release_time / news_id 以及 ES 排序值，
+下一次只查询水位之后的文档。水位存于 Redis，多实例之间共享。
+"""
+import hashlib
+import json
+from typing import Optional
+from ..utils.tracing import tracer
+
+
+def watermark_key(session_id: Optional[str], subscription: Optional[str], query: dict,
+                  tenant: Optional[str] = None) -> Optional[str]:
+    """
+    命名订阅直接以名称为 key，可跨会话复用；
+    否则按会话 + 查询条件摘要区分，同一会话内不同主题的水位互不影响。
+    多租户时 key 带租户名前缀，同名订阅互不干扰。
+    """
+    namespace = f"{tenant}:" if tenant else ""
+    if subscription:
+        return f"{namespace}sub:{subscription}"
+    if not session_id:
+        return None
+    digest = hashlib.sha1(json.dumps(query, sort_keys=True, ensure_ascii=False).encode()).hexdigest()[:16]
+    return f"{namespace}session:{session_id}:{digest}"
+
+
+class WatermarkStore:
+    """基于 Redis 的水位存储，每个订阅一个 JSON 值，超过 ttl 未轮询自动过期"""
+
+    KEY_PREFIX = "watermark:"
+
+    def __init__(self, redis_url: str, ttl: int = 7 * 24 * 60 * 60):
+        self.redis_url = redis_url
+        self.ttl = ttl
+        self._redis = None
+
+    async def _get_redis(self):
+        if self._redis is None:
+            from redis import asyncio as aioredis
+            self._redis = await aioredis.from_url(self.redis_url, encoding="utf-8", decode_responses=True)
+        return self._redis
+
+    async def get(self, key: str) -> Optional[dict]:
+        redis = await self._get_redis()
+        with tracer.start_span("redis.get", **{"db.system": "redis"}):
+            raw = await redis.get(self.KEY_PREFIX + key)
+        try:
+            return json.loads(raw) if raw else None
+        except json.JSONDecodeError:
+            return None
+
+    async def set(self, key: str, watermark: dict) -> None:
+        redis = await self._get_redis()
+        with tracer.start_span("redis.setex", **{"db.system": "redis"}):
+            await redis.setex(self.KEY_PREFIX + key, self.ttl, json.dumps(watermark, ensure_ascii=False))
+
+    async def close(self) -> None:
+        if self._redis is not None:
+            await self._redis.close()
+            self._redis = None
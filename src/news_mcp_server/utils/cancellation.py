@@ -0,0 +1,68 @@
+"""
+请求取消：MCP 客户端断开后尽快停止 ES 查询、重试和结果转换
+"""
+import asyncio
+import contextlib
+from typing import Optional
+from prometheus_client import Counter
+from starlette.requests import Request
+from ..exceptions import RequestCancelledException
+from .logger import logger
+
+# 因客户端断开而避免的工作量，stage: es_request / retry / conversion / es_task
+CANCELLED_WORK = Counter("mcp_cancelled_work_total", "客户端断开后被取消的工作", ["stage"])
+
+
+class CancelToken:
+    """在 mcp_server → NewsService → AsyncElasticClient 之间传递的取消信号"""
+
+    def __init__(self):
+        self._event = asyncio.Event()
+        self.reason: Optional[str] = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str = "client_disconnected") -> None:
+        if self.cancelled:
+            return
+        self.reason = reason
+        self._event.set()
+
+    async def wait(self) -> None:
+        await self._event.wait()
+
+    def raise_if_cancelled(self, stage: str) -> None:
+        """已取消时记录被跳过的阶段并抛出 RequestCancelledException"""
+        if not self.cancelled:
+            return
+        CANCELLED_WORK.labels(stage=stage).inc()
+        raise RequestCancelledException(f"Request cancelled before {stage}: {self.reason}")
+
+
+async def watch_disconnect(request: Request, token: CancelToken, interval: float) -> None:
+    """轮询底层连接状态，客户端断开后触发取消"""
+    while not token.cancelled:
+        if await request.is_disconnected():
+            logger.info("client-disconnected", path=request.url.path)
+            token.cancel()
+            return
+        await asyncio.sleep(interval)
+
+
+@contextlib.asynccontextmanager
+async def cancel_on_disconnect(request: Optional[Request], interval: float = 0.5):
+    """
+    为一次工具调用创建 CancelToken，并在后台监听客户端断开。
+    stdio / 内存传输没有 HTTP 请求，此时返回的 token 永远不会被触发。
+    """
+    token = CancelToken()
+    watcher = None
+    if request is not None:
+        watcher = asyncio.create_task(watch_disconnect(request, token, interval))
+    try:
+        yield token
+    finally:
+        if watcher is not None:
+            watcher.cancel()
@@ -1,30 +1,38 @@
 import os
 import logging
 from pathlib import Path
+import structlog
 from structlog import get_logger
 from logging.handlers import TimedRotatingFileHandler
+from .tracing import add_trace_context
 BASE_DIR = Path(__file__).parent.parent.parent
 
 
+# 日志自动附带当前 trace_id / span_id
+structlog.configure(processors=[add_trace_context, *structlog.get_config()["processors"]])
 logger = get_logger("suwen-news-mcp-server")
 # === 文件日志处理器 ===
 LOG_DIR = os.getenv("LOG_DIR", os.path.join(BASE_DIR, "logs"))
-os.makedirs(LOG_DIR, exist_ok=True)
 LOG_FILE = os.path.join(LOG_DIR, "es_news_mcp_server.log")
 
-# === 标准库日志根配置 ===
-root_logger = logging.getLogger()
-root_logger.setLevel(logging.INFO)
 
-# 控制台 Handler（保留 JSON 格式）
-console_handler = logging.StreamHandler()
-console_handler.setFormatter(logging.Formatter("%(message)s"))
+def configure_logging() -> None:
+    """配置标准库日志（控制台 + 按日轮转文件），由应用工厂在启动时调用，重复调用无副作用"""
+    # === 标准库日志根配置 ===
+    root_logger = logging.getLogger()
+    # 仅在首次配置时添加（防止重复）
+    if root_logger.handlers:
+        return
+    root_logger.setLevel(logging.INFO)
+    os.makedirs(LOG_DIR, exist_ok=True)
 
-# 文件 Handler：每日 0 点轮转，保留 7 天
-file_handler = TimedRotatingFileHandler(LOG_FILE, when="midnight", backupCount=7, encoding="utf-8")
-file_handler.setFormatter(logging.Formatter("%(message)s"))
+    # 控制台 Handler（保留 JSON 格式）
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(logging.Formatter("%(message)s"))
+
+    # 文件 Handler：每日 0 点轮转，保留 7 天
+    file_handler = TimedRotatingFileHandler(LOG_FILE, when="midnight", backupCount=7, encoding="utf-8")
+    file_handler.setFormatter(logging.Formatter("%(message)s"))
 
-# 仅在首次配置时添加（防止重复）
-if not root_logger.handlers:
     root_logger.addHandler(console_handler)
     root_logger.addHandler(file_handler)
@@ -0,0 +1,289 @@
+"""
+轻量级链路追踪，数据模型与 OpenTelemetry 保持一致：
+- W3C traceparent 传播，trace_id/span_id 与 OTel 格式相同
+- span 按 trace 缓冲，根 span 结束后做尾部采样（错误、慢请求必留，其余按比例）
+- 采样后的 trace 以 OTLP/JSON 格式写入本地文件，或 POST 到 collector 的 /v1/traces
+- structlog 处理器把当前 trace_id/span_id 注入日志
+"""
+import abc
+import contextlib
+import json
+import os
+import queue
+import random
+import threading
+import time
+import urllib.request
+from collections import OrderedDict
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Optional
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+STATUS_UNSET = 0
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+
+def _new_id(nbytes: int) -> str:
+    return random.getrandbits(nbytes * 8).to_bytes(nbytes, "big").hex()
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str] = None
+    start_ns: int = field(default_factory=time.time_ns)
+    end_ns: int = 0
+    attributes: dict = field(default_factory=dict)
+    status: int = STATUS_UNSET
+    status_message: str = ""
+
+    @property
+    def duration(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e9
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def set_attributes(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+    def record_exception(self, exc: BaseException) -> None:
+        self.status = STATUS_ERROR
+        self.status_message = f"{type(exc).__name__}: {exc}"
+
+    def to_otlp(self) -> dict:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_otlp_attribute(k, v) for k, v in self.attributes.items() if v is not None],
+            "status": {"code": self.status, "message": self.status_message},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+def _otlp_attribute(key: str, value) -> dict:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[tuple]:
+    """解析 W3C traceparent，返回 (trace_id, parent_span_id)"""
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    trace_id, span_id = parts[1].lower(), parts[2].lower()
+    if trace_id == "0" * 32 or span_id == "0" * 16:
+        return None
+    try:
+        int(trace_id, 16), int(span_id, 16)
+    except ValueError:
+        return None
+    return trace_id, span_id
+
+
+class BatchSpanExporter(abc.ABC):
+    """后台线程批量导出，避免在事件循环中做 I/O"""
+
+    def __init__(self, max_queue: int = 10000, batch_size: int = 256):
+        self._queue = queue.Queue(maxsize=max_queue)
+        self.batch_size = batch_size
+        self.dropped = 0
+        self._thread = threading.Thread(target=self._run, name=type(self).__name__, daemon=True)
+        self._thread.start()
+
+    def export(self, spans: list) -> None:
+        try:
+            self._queue.put_nowait(spans)
+        except queue.Full:
+            self.dropped += len(spans)
+
+    def flush(self, timeout: float = 5.0) -> None:
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write([span for spans in batch for span in spans])
+            except Exception:
+                self.dropped += sum(len(spans) for spans in batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _payload(self, spans: list) -> dict:
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [_otlp_attribute("service.name", tracer.service_name)]},
+                "scopeSpans": [{
+                    "scope": {"name": "news_mcp_server"},
+                    "spans": [span.to_otlp() for span in spans],
+                }],
+            }]
+        }
+
+    @abc.abstractmethod
+    def _write(self, spans: list) -> None:
+        """在导出线程中写出一批 span，抛出异常时整批计入 dropped"""
+
+
+class FileSpanExporter(BatchSpanExporter):
+    """每批写一行 OTLP/JSON，可由 otel-collector 的 otlpjsonfile receiver 读取"""
+
+    def __init__(self, path: str, **kwargs):
+        self.path = path
+        super().__init__(**kwargs)
+
+    def _write(self, spans: list) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(self._payload(spans), ensure_ascii=False) + "\n")
+
+
+class OtlpHttpSpanExporter(BatchSpanExporter):
+    """以 OTLP/HTTP JSON 协议 POST 到 collector（或任意兼容的替身服务）"""
+
+    def __init__(self, endpoint: str, timeout: float = 5.0, **kwargs):
+        self.endpoint = endpoint
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def _write(self, spans: list) -> None:
+        request = urllib.request.Request(self.endpoint,
+                                         data=json.dumps(self._payload(spans)).encode(),
+                                         headers={"Content-Type": "application/json"},
+                                         method="POST")
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+
+
+class TailSampler:
+    """
+    尾部采样：span 按 trace_id 缓冲，本地根 span 结束时决定整条 trace 是否导出。
+    出错或根 span 耗时超过阈值的 trace 一定保留，其余按 sample_ratio 随机保留。
+    """
+
+    def __init__(self, exporter: Optional[BatchSpanExporter], latency_threshold: float = 1.0,
+                 sample_ratio: float = 0.01, max_traces: int = 2000):
+        self.exporter = exporter
+        self.latency_threshold = latency_threshold
+        self.sample_ratio = sample_ratio
+        self.max_traces = max_traces
+        self._buffers = OrderedDict()
+        # 已决策 trace 的结果，用于处理根 span 结束后才结束的子 span（如后台任务）
+        self._decisions = OrderedDict()
+
+    def on_end(self, span: Span, is_root: bool) -> None:
+        decision = self._decisions.get(span.trace_id)
+        if decision is not None:
+            if decision:
+                self.exporter.export([span])
+            return
+        spans = self._buffers.setdefault(span.trace_id, [])
+        spans.append(span)
+        if len(self._buffers) > self.max_traces:
+            self._buffers.popitem(last=False)
+        if is_root:
+            self._decide(span)
+
+    def _decide(self, root: Span) -> None:
+        spans = self._buffers.pop(root.trace_id, [])
+        keep = (root.duration >= self.latency_threshold
+                or any(span.status == STATUS_ERROR for span in spans)
+                or random.random() < self.sample_ratio)
+        self._decisions[root.trace_id] = keep
+        if len(self._decisions) > self.max_traces:
+            self._decisions.popitem(last=False)
+        if keep:
+            self.exporter.export(spans)
+
+
+class Tracer:
+    def __init__(self, service_name: str, sampler: Optional[TailSampler] = None):
+        self.service_name = service_name
+        self.sampler = sampler
+
+    def configure(self, sampler: Optional[TailSampler]) -> None:
+        self.sampler = sampler
+
+    @contextlib.contextmanager
+    def start_span(self, name: str, parent: Optional[Span] = None, traceparent: Optional[tuple] = None,
+                   **attributes):
+        """
+        创建 span 并设为当前 span。父 span 依次取 parent、traceparent (trace_id, span_id)、当前上下文；
+        没有父 span（或父 span 来自远端）时本 span 作为本地根，结束时触发尾部采样。
+        """
+        parent = parent or (None if traceparent else _current_span.get())
+        if parent is not None:
+            span = Span(name, parent.trace_id, _new_id(8), parent.span_id, attributes=attributes)
+        elif traceparent is not None:
+            span = Span(name, traceparent[0], _new_id(8), traceparent[1], attributes=attributes)
+        else:
+            span = Span(name, _new_id(16), _new_id(8), attributes=attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_exception(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end_ns = time.time_ns()
+            if self.sampler is not None:
+                self.sampler.on_end(span, is_root=parent is None)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def add_trace_context(logger, method_name, event_dict):
+    """structlog 处理器：为日志附加 trace_id / span_id"""
+    span = _current_span.get()
+    if span is not None:
+        event_dict.setdefault("trace_id", span.trace_id)
+        event_dict.setdefault("span_id", span.span_id)
+    return event_dict
+
+
+tracer = Tracer("news-mcp-server")
+
+
+def setup_tracing(settings) -> None:
+    """按配置安装尾部采样器与导出器，未启用时 span 只用于日志关联"""
+    if not settings.TRACING_ENABLED:
+        tracer.configure(None)
+        return
+    if settings.TRACE_EXPORTER == "otlp":
+        exporter = OtlpHttpSpanExporter(settings.TRACE_OTLP_ENDPOINT)
+    else:
+        exporter = FileSpanExporter(settings.TRACE_FILE)
+    tracer.configure(TailSampler(exporter,
+                                 latency_threshold=settings.TRACE_LATENCY_THRESHOLD,
+                                 sample_ratio=settings.TRACE_SAMPLE_RATIO))
@@ -0,0 +1,422 @@
+"""
+长时间压测（soak）：在本机启动 ES 与 Redis 的替身服务，以完整中间件链运行应用并持续施压，
+定期采样 RSS、tracemalloc 内存、打开的文件描述符/socket 数以及事件循环延迟，
+预热后的内存或文件描述符增长超过阈值即失败。
+
+替身服务与压测客户端运行在子进程中，采样只反映服务端本身。结束时打印采样序列和
+tracemalloc 增长最多的分配位置，以 pytest -s 查看：
+
+    SOAK_SECONDS=3600 pytest -s -m integration tests/integration/test_soak.py
+
+可调参数（环境变量）：
+- SOAK_SECONDS：压测时长，未设置时跳过本测试，避免 make test 被拖长
+- SOAK_WARMUP：预热时长，预热期间的增长不计入，默认 max(5, SOAK_SECONDS * 0.2)
+- SOAK_INTERVAL：采样间隔，默认 2
+- SOAK_CONCURRENCY / SOAK_CALLS_PER_SESSION：并发会话数与每个会话的工具调用次数
+- SOAK_MAX_RSS_GROWTH_MB / SOAK_MAX_TRACED_GROWTH_MB / SOAK_MAX_FD_GROWTH：失败阈值
+"""
+import asyncio
+import gc
+import json
+import multiprocessing
+import os
+import random
+import socket
+import statistics
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import List, Optional
+import pytest
+
+SOAK_SECONDS = float(os.getenv("SOAK_SECONDS") or 0)
+SOAK_WARMUP = float(os.getenv("SOAK_WARMUP", max(5.0, SOAK_SECONDS * 0.2)))
+SOAK_INTERVAL = float(os.getenv("SOAK_INTERVAL", 2))
+SOAK_CONCURRENCY = int(os.getenv("SOAK_CONCURRENCY", 8))
+SOAK_CALLS_PER_SESSION = int(os.getenv("SOAK_CALLS_PER_SESSION", 5))
+SOAK_MAX_RSS_GROWTH_MB = float(os.getenv("SOAK_MAX_RSS_GROWTH_MB", 64))
+SOAK_MAX_TRACED_GROWTH_MB = float(os.getenv("SOAK_MAX_TRACED_GROWTH_MB", 16))
+SOAK_MAX_FD_GROWTH = int(os.getenv("SOAK_MAX_FD_GROWTH", 16))
+SOAK_MAX_ERROR_RATE = float(os.getenv("SOAK_MAX_ERROR_RATE", 0.01))
+
+SOAK_API_KEY = "soak-key"
+SOAK_INDEX = "news-soak"
+# 替身 ES 中的新闻 ID 数量，有限的 ID 集合让预取、降级缓存等按 ID 的缓存达到稳态
+DOC_COUNT = 500
+
+CALLS = [
+    ("search_news", {"query": "人工智能", "max_results": 20}),
+    ("search_news_with_secondary_filter", {"primary_query": "芯片", "secondary_query": "出口", "max_results": 20}),
+    ("search_topic_news", {"primary_queries": ["AI", "芯片"], "secondary_querys": ["美国"], "max_results": 15}),
+    ("read_single_news", None),
+]
+
+
+# ---------------------------------------------------------------- ES 替身
+
+def make_doc(n: int) -> dict:
+    return {
+        "news_id": f"{n}_1",
+        "title": f"替身新闻标题 {n}",
+        "release_time": f"2024-06-{n % 28 + 1:02d} 08:00:00",
+        "source": "替身通讯社",
+        "content": "替身新闻正文。" * 20,
+    }
+
+
+async def serve_fake_es(port: int):
+    """只实现 _search：按请求的 size 返回随机新闻，并带上客户端校验的产品头"""
+    from aiohttp import web
+
+    async def search(request):
+        payload = await request.read()
+        body = json.loads(payload) if payload else {}
+        size = int(request.query.get("size") or body.get("size") or 10)
+        hits = [{"_score": random.random() * 10, "_source": make_doc(random.randrange(DOC_COUNT))}
+                for _ in range(min(size, 100))]
+        return web.json_response({"took": 1,
+                                  "_shards": {"total": 1, "successful": 1, "failed": 0},
+                                  "hits": {"total": {"value": DOC_COUNT, "relation": "eq"}, "hits": hits}},
+                                 headers={"X-Elastic-Product": "Elasticsearch"})
+
+    app = web.Application()
+    app.router.add_route("*", "/{index}/_search", search)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+
+
+# ---------------------------------------------------------------- Redis 替身
+
+class FakeRedis:
+    """RESP 协议的最小实现，覆盖服务用到的 GET/SET/SETEX/INCRBY/EXPIRE 等命令，支持过期；客户端 HELLO 3 时按 RESP3 编码空值"""
+
+    def __init__(self):
+        self.data = {}
+        self.expires = {}
+
+    def _alive(self, key: str) -> bool:
+        expire_at = self.expires.get(key)
+        if expire_at is not None and expire_at <= time.monotonic():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return key in self.data
+
+    def execute(self, command: str, args: List[str]):
+        if command in ("CLIENT", "SELECT", "HELLO"):
+            return "+OK"
+        if command == "PING":
+            return "+PONG"
+        if command == "GET":
+            return self.data[args[0]] if self._alive(args[0]) else None
+        if command == "SET":
+            self.data[args[0]] = args[1]
+            self.expires.pop(args[0], None)
+            return "+OK"
+        if command == "SETEX":
+            self.data[args[0]] = args[2]
+            self.expires[args[0]] = time.monotonic() + int(args[1])
+            return "+OK"
+        if command in ("INCR", "INCRBY"):
+            step = int(args[1]) if command == "INCRBY" else 1
+            value = int(self.data[args[0]]) + step if self._alive(args[0]) else step
+            self.data[args[0]] = str(value)
+            return value
+        if command == "EXPIRE":
+            if not self._alive(args[0]):
+                return 0
+            self.expires[args[0]] = time.monotonic() + int(args[1])
+            return 1
+        if command == "DEL":
+            return sum(1 for key in args if self._alive(key) and self.data.pop(key, None) is not None)
+        return f"-ERR unknown command '{command}'"
+
+    @staticmethod
+    def encode(reply, resp3: bool = False) -> bytes:
+        if reply is None:
+            return b"_\r\n" if resp3 else b"$-1\r\n"
+        if isinstance(reply, int):
+            return f":{reply}\r\n".encode()
+        if reply.startswith(("+", "-")):
+            return f"{reply}\r\n".encode()
+        raw = reply.encode()
+        return b"$%d\r\n%s\r\n" % (len(raw), raw)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        resp3 = False
+        try:
+            while True:
+                header = await reader.readline()
+                if not header:
+                    break
+                args = []
+                for _ in range(int(header[1:])):
+                    length = int((await reader.readline())[1:])
+                    args.append((await reader.readexactly(length + 2))[:-2].decode())
+                command = args[0].upper()
+                if command == "HELLO":
+                    resp3 = args[1:2] == ["3"]
+                writer.write(self.encode(self.execute(command, args[1:]), resp3))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+def run_standins(es_port: int, redis_port: int):
+    async def main():
+        await serve_fake_es(es_port)
+        server = await asyncio.start_server(FakeRedis().handle, "127.0.0.1", redis_port)
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(main())
+
+
+# ---------------------------------------------------------------- 压测客户端
+
+async def generate_load(url: str, seconds: float, concurrency: int, calls_per_session: int) -> dict:
+    """每个 worker 反复新建 MCP 会话、调用若干次工具后关闭，覆盖会话创建与销毁路径"""
+    import httpx
+    from fastmcp import Client
+    from fastmcp.client.transports import StreamableHttpTransport
+
+    base = url.split("/mcp-server")[0]
+    async with httpx.AsyncClient() as http:
+        for _ in range(200):
+            try:
+                if (await http.get(f"{base}/healthcheck")).status_code == 200:
+                    break
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.1)
+
+    stats = {"ok": 0, "errors": 0, "sessions": 0}
+    deadline = time.monotonic() + seconds
+
+    async def worker():
+        while time.monotonic() < deadline:
+            transport = StreamableHttpTransport(url, headers={"Authorization": f"Bearer {SOAK_API_KEY}"})
+            try:
+                async with Client(transport) as client:
+                    stats["sessions"] += 1
+                    for _ in range(calls_per_session):
+                        name, args = random.choice(CALLS)
+                        if args is None:
+                            args = {"news_id": f"{random.randrange(DOC_COUNT)}_1"}
+                        try:
+                            await client.call_tool(name, args)
+                            stats["ok"] += 1
+                        except Exception:
+                            stats["errors"] += 1
+            except Exception:
+                stats["errors"] += 1
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return stats
+
+
+def run_load(url: str, seconds: float, concurrency: int, calls_per_session: int, results):
+    results.put(asyncio.run(generate_load(url, seconds, concurrency, calls_per_session)))
+
+
+# ---------------------------------------------------------------- 服务端采样
+
+@dataclass
+class Sample:
+    elapsed: float
+    rss_mb: float
+    traced_mb: float
+    fds: int
+    sockets: int
+    loop_lag_ms: float
+
+
+class LoopLagMonitor:
+    """以固定间隔 sleep，实际唤醒时间超出间隔的部分即事件循环延迟；每次采样读取区间内最大值"""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.max_lag = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.max_lag = max(self.max_lag, time.perf_counter() - start - self.interval)
+
+    def start(self):
+        self._task = asyncio.ensure_future(self._run())
+
+    def stop(self):
+        self._task.cancel()
+
+    def reset(self) -> float:
+        lag, self.max_lag = self.max_lag, 0.0
+        return lag
+
+
+def read_rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        pages = int(f.read().split()[1])
+    return pages * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+
+
+def count_fds() -> tuple:
+    fds = sockets = 0
+    for fd in os.listdir("/proc/self/fd"):
+        try:
+            target = os.readlink(f"/proc/self/fd/{fd}")
+        except OSError:
+            continue
+        fds += 1
+        sockets += target.startswith("socket:")
+    return fds, sockets
+
+
+def take_sample(elapsed: float, loop_lag: float) -> Sample:
+    fds, sockets = count_fds()
+    return Sample(elapsed=elapsed,
+                  rss_mb=read_rss_mb(),
+                  traced_mb=tracemalloc.get_traced_memory()[0] / 1024 / 1024,
+                  fds=fds,
+                  sockets=sockets,
+                  loop_lag_ms=loop_lag * 1000)
+
+
+def growth(samples: List[Sample], field: str, window: int = 3) -> float:
+    """稳态首尾各取 window 个采样的中位数之差，避免单次抖动误判"""
+    window = max(1, min(window, len(samples) // 2))
+    first = statistics.median(getattr(s, field) for s in samples[:window])
+    last = statistics.median(getattr(s, field) for s in samples[-window:])
+    return last - first
+
+
+def top_allocators(before: tracemalloc.Snapshot, after: tracemalloc.Snapshot, limit: int = 10) -> List[str]:
+    ignore = (tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__))
+    stats = after.filter_traces(ignore).compare_to(before.filter_traces(ignore), "lineno")
+    return [str(stat) for stat in stats[:limit]]
+
+
+async def serve_and_sample(app, port: int, load) -> tuple:
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    serving = asyncio.ensure_future(server.serve())
+    lag = LoopLagMonitor()
+    lag.start()
+    samples, baseline = [], None
+    start = time.monotonic()
+    try:
+        while load.is_alive():
+            await asyncio.sleep(SOAK_INTERVAL)
+            elapsed = time.monotonic() - start
+            samples.append(take_sample(elapsed, lag.reset()))
+            if baseline is None and elapsed >= SOAK_WARMUP:
+                gc.collect()
+                baseline = tracemalloc.take_snapshot()
+                lag.reset()  # 快照本身会阻塞事件循环，不计入延迟
+        gc.collect()
+        final = tracemalloc.take_snapshot()
+        # 压测结束后稍作停留，记录连接关闭后的空闲状态
+        await asyncio.sleep(SOAK_INTERVAL)
+        idle = take_sample(time.monotonic() - start, lag.reset())
+    finally:
+        lag.stop()
+        server.should_exit = True
+        await serving
+    return samples, idle, baseline, final
+
+
+# ---------------------------------------------------------------- 测试
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port: int, timeout: float = 10):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+
+
+@pytest.mark.integration
+@pytest.mark.skipif(not SOAK_SECONDS, reason="设置 SOAK_SECONDS 后运行，或使用 make soak")
+def test_soak_memory_and_fd_growth(monkeypatch, tmp_path):
+    es_port, redis_port, app_port = free_port(), free_port(), free_port()
+    redis_url = f"redis://127.0.0.1:{redis_port}/0"
+    monkeypatch.setenv("API_KEY", SOAK_API_KEY)
+    monkeypatch.setenv("ES_API_KEY", "soak")
+    monkeypatch.setenv("LOG_DIR", os.getenv("LOG_DIR", str(tmp_path)))
+
+    from src.news_mcp_server.config.settings import app_settings, es_settings
+    from src.news_mcp_server.middlewares.redis_session import RedisSessionMiddleware
+    from src.news_mcp_server.app import create_app
+
+    monkeypatch.setattr(app_settings, "REDIS_URL", redis_url)
+    monkeypatch.setattr(app_settings, "RATE_LIMIT_MAX", 10 ** 9)
+    monkeypatch.setattr(es_settings, "URL", f"http://127.0.0.1:{es_port}")
+    monkeypatch.setattr(es_settings, "ES_HOST", f"http://127.0.0.1:{es_port}")
+    monkeypatch.setattr(es_settings, "ES_INDEX", SOAK_INDEX)
+    monkeypatch.setattr(es_settings, "ES_INDEX_PARTITION", "none")
+
+    # 替身与压测客户端在 asyncio 启动前 fork，子进程不继承事件循环
+    ctx = multiprocessing.get_context("fork")
+    standins = ctx.Process(target=run_standins, args=(es_port, redis_port), daemon=True)
+    standins.start()
+    results = ctx.Queue()
+    load = ctx.Process(target=run_load, daemon=True,
+                       args=(f"http://127.0.0.1:{app_port}/mcp-server/es-news-mcp/", SOAK_SECONDS,
+                             SOAK_CONCURRENCY, SOAK_CALLS_PER_SESSION, results))
+    tracemalloc.start()
+    try:
+        wait_for_port(es_port)
+        wait_for_port(redis_port)
+        app = create_app()
+        # 应用默认未挂载 RedisSessionMiddleware，压测时一并覆盖其惰性创建的 Redis 连接
+        app.add_middleware(RedisSessionMiddleware, secret_key="soak-secret", redis_url=redis_url)
+        load.start()
+        samples, idle, baseline, final = asyncio.run(serve_and_sample(app, app_port, load))
+        stats = results.get(timeout=30)
+    finally:
+        tracemalloc.stop()
+        for process in (load, standins):
+            if process.is_alive():
+                process.terminate()
+            process.join(timeout=5)
+
+    print(f"\nsoak: {SOAK_SECONDS:.0f}s  sessions: {stats['sessions']}  ok: {stats['ok']}  errors: {stats['errors']}")
+    print(f"{'elapsed':>8} {'rss_mb':>8} {'traced':>8} {'fds':>5} {'socks':>5} {'lag_ms':>7}")
+    for s in samples:
+        print(f"{s.elapsed:8.1f} {s.rss_mb:8.1f} {s.traced_mb:8.2f} {s.fds:5d} {s.sockets:5d} {s.loop_lag_ms:7.1f}")
+    print(f"{'idle':>8} {idle.rss_mb:8.1f} {idle.traced_mb:8.2f} {idle.fds:5d} {idle.sockets:5d} {idle.loop_lag_ms:7.1f}")
+    if baseline is not None:
+        print("top allocators since warmup:")
+        for line in top_allocators(baseline, final):
+            print(f"  {line}")
+
+    total = stats["ok"] + stats["errors"]
+    assert stats["ok"] > 0, "soak load made no successful tool calls"
+    assert stats["errors"] / total <= SOAK_MAX_ERROR_RATE, stats
+
+    # 只比较施压期间的采样，收尾阶段连接陆续关闭会掩盖增长
+    steady = [s for s in samples if SOAK_WARMUP <= s.elapsed <= SOAK_SECONDS]
+    assert len(steady) >= 2, "soak too short: raise SOAK_SECONDS or lower SOAK_WARMUP/SOAK_INTERVAL"
+    rss_growth = growth(steady, "rss_mb")
+    traced_growth = growth(steady, "traced_mb")
+    fd_growth = growth(steady, "fds")
+    print(f"growth after warmup: rss {rss_growth:.1f}MB  traced {traced_growth:.2f}MB  fds {fd_growth:.0f}  "
+          f"max loop lag {max(s.loop_lag_ms for s in steady):.1f}ms")
+    assert rss_growth <= SOAK_MAX_RSS_GROWTH_MB, f"RSS grew {rss_growth:.1f}MB after warmup"
+    assert traced_growth <= SOAK_MAX_TRACED_GROWTH_MB, f"traced memory grew {traced_growth:.2f}MB after warmup"
+    assert fd_growth <= SOAK_MAX_FD_GROWTH, f"open file descriptors grew by {fd_growth:.0f} after warmup"
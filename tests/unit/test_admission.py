@@ -0,0 +1,157 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock
+from fastmcp.server.middleware import MiddlewareContext
+from mcp import McpError
+from mcp.types import CallToolRequestParams
+from src.news_mcp_server.exceptions import OverloadException
+from src.news_mcp_server.middlewares.admission import (
+    OVERLOADED_ERROR_CODE,
+    AdaptiveLimiter,
+    AdmissionMiddleware,
+)
+
+
+@pytest.mark.asyncio
+async def test_acquire_within_limit():
+    limiter = AdaptiveLimiter(initial_limit=2, max_queue=1)
+    await limiter.acquire()
+    await limiter.acquire()
+    assert limiter.inflight == 2
+    limiter.release()
+    assert limiter.inflight == 1
+
+
+@pytest.mark.asyncio
+async def test_queue_full_rejects_fast():
+    limiter = AdaptiveLimiter(initial_limit=1, max_queue=1, queue_timeout=1)
+    await limiter.acquire()
+    waiter = asyncio.create_task(limiter.acquire(priority=1))
+    await asyncio.sleep(0)
+    with pytest.raises(OverloadException, match="queue_full"):
+        await limiter.acquire(priority=1)
+    limiter.release()
+    await waiter
+    assert limiter.inflight == 1
+
+
+@pytest.mark.asyncio
+async def test_zero_queue_rejects_when_saturated():
+    limiter = AdaptiveLimiter(initial_limit=1, max_queue=0, queue_timeout=1)
+    await limiter.acquire()
+    with pytest.raises(OverloadException, match="queue_full"):
+        await limiter.acquire(priority=0)
+    assert limiter.queued == 0
+
+
+@pytest.mark.asyncio
+async def test_queued_count_tracks_waiters():
+    limiter = AdaptiveLimiter(initial_limit=1, max_queue=2, queue_timeout=1)
+    await limiter.acquire()
+    heavy = asyncio.create_task(limiter.acquire(priority=2))
+    light = asyncio.create_task(limiter.acquire(priority=1))
+    await asyncio.sleep(0)
+    assert limiter.queued == 2
+    cheap = asyncio.create_task(limiter.acquire(priority=0))
+    await asyncio.sleep(0)
+    assert limiter.queued == 2
+    with pytest.raises(OverloadException, match="shed"):
+        await heavy
+    limiter.release()
+    await cheap
+    assert limiter.queued == 1
+    light.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await light
+    assert limiter.queued == 0
+
+
+@pytest.mark.asyncio
+async def test_higher_priority_sheds_queued_request():
+    limiter = AdaptiveLimiter(initial_limit=1, max_queue=1, queue_timeout=1)
+    await limiter.acquire()
+    heavy = asyncio.create_task(limiter.acquire(priority=2))
+    await asyncio.sleep(0)
+    cheap = asyncio.create_task(limiter.acquire(priority=0))
+    await asyncio.sleep(0)
+    with pytest.raises(OverloadException, match="shed"):
+        await heavy
+    limiter.release()
+    await cheap
+    assert limiter.inflight == 1
+
+
+@pytest.mark.asyncio
+async def test_priority_order():
+    limiter = AdaptiveLimiter(initial_limit=1, max_queue=10, queue_timeout=1)
+    await limiter.acquire()
+    order = []
+
+    async def call(priority):
+        await limiter.acquire(priority)
+        order.append(priority)
+        limiter.release()
+
+    tasks = [asyncio.create_task(call(p)) for p in (2, 1, 0)]
+    await asyncio.sleep(0)
+    limiter.release()
+    await asyncio.gather(*tasks)
+    assert order == [0, 1, 2]
+
+
+@pytest.mark.asyncio
+async def test_queue_timeout():
+    limiter = AdaptiveLimiter(initial_limit=1, queue_timeout=0.01)
+    await limiter.acquire()
+    with pytest.raises(OverloadException, match="queue_timeout"):
+        await limiter.acquire()
+    assert limiter.queued == 0
+
+
+@pytest.mark.asyncio
+async def test_grant_racing_queue_timeout_returns_slot():
+    loop = asyncio.get_running_loop()
+    for _ in range(20):
+        limiter = AdaptiveLimiter(initial_limit=1, queue_timeout=0.02)
+        await limiter.acquire()
+        # 放行与 wait_for 超时落在同一轮事件循环：超时抛出时槽位已经移交
+        loop.call_later(0.02, limiter.release)
+        try:
+            await limiter.acquire()
+        except OverloadException:
+            pass
+        else:
+            limiter.release()
+        assert limiter.inflight == 0
+        assert limiter.queued == 0
+
+
+@pytest.mark.asyncio
+async def test_aimd_adjusts_limit():
+    limiter = AdaptiveLimiter(initial_limit=10, min_limit=2, target_latency=0.1, backoff=0.5)
+    await limiter.acquire()
+    limiter.release(latency=1.0)
+    assert limiter.limit == 5
+    for _ in range(5):
+        await limiter.acquire()
+    limiter.release(latency=0.01)
+    assert limiter.limit > 5
+
+
+@pytest.mark.asyncio
+async def test_middleware_rejects_with_overloaded_error():
+    limiter = AdaptiveLimiter(initial_limit=1, min_limit=1, max_limit=1, max_queue=0, queue_timeout=1)
+    middleware = AdmissionMiddleware(limiter, priorities={'search_topic_news': 2})
+    context = MiddlewareContext(message=CallToolRequestParams(name='search_topic_news', arguments={}))
+    call_next = AsyncMock(return_value='ok')
+
+    assert await middleware.on_call_tool(context, call_next) == 'ok'
+    assert limiter.inflight == 0
+
+    await limiter.acquire()
+    with pytest.raises(McpError) as excinfo:
+        await middleware.on_call_tool(context, call_next)
+    assert excinfo.value.error.code == OVERLOADED_ERROR_CODE
+    assert excinfo.value.error.data == {'reason': 'queue_full', 'retry_after': 1}
+    assert call_next.await_count == 1
+    assert limiter.inflight == 1
@@ -0,0 +1,74 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from elastic_transport import ConnectionError as ESConnectionError
+from src.news_mcp_server.clients.elastic_client import AsyncElasticClient
+from src.news_mcp_server.exceptions import RequestCancelledException
+from src.news_mcp_server.utils.cancellation import CancelToken, cancel_on_disconnect
+
+
+def _scoped_client(client, search):
+    scoped = MagicMock()
+    scoped.search = search
+    return patch.object(client._client, 'options', new=MagicMock(return_value=scoped))
+
+
+@pytest.mark.asyncio
+async def test_search_cancelled_in_flight():
+    client = AsyncElasticClient()
+    token = CancelToken()
+    started = asyncio.Event()
+
+    async def slow_search(**kwargs):
+        started.set()
+        await asyncio.sleep(10)
+
+    with _scoped_client(client, slow_search):
+        task = asyncio.create_task(client.search_news(query='test', cancel_token=token))
+        await started.wait()
+        token.cancel()
+        with pytest.raises(RequestCancelledException):
+            await task
+
+
+@pytest.mark.asyncio
+async def test_search_skipped_when_already_cancelled():
+    client = AsyncElasticClient()
+    token = CancelToken()
+    token.cancel()
+    search = AsyncMock()
+    with _scoped_client(client, search):
+        with pytest.raises(RequestCancelledException):
+            await client.search_news(query='test', cancel_token=token)
+    search.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_retries_stop_after_cancel():
+    client = AsyncElasticClient()
+    token = CancelToken()
+
+    async def failing_search(**kwargs):
+        token.cancel()
+        raise ESConnectionError("boom")
+
+    search = AsyncMock(side_effect=failing_search)
+    with _scoped_client(client, search):
+        with pytest.raises(ESConnectionError):
+            await client.search_news(query='test', cancel_token=token)
+    assert search.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_cancel_on_disconnect():
+    request = MagicMock()
+    request.is_disconnected = AsyncMock(side_effect=[False, True])
+    async with cancel_on_disconnect(request, interval=0.01) as token:
+        await asyncio.wait_for(token.wait(), timeout=1)
+    assert token.cancelled
+
+
+@pytest.mark.asyncio
+async def test_cancel_on_disconnect_without_request():
+    async with cancel_on_disconnect(None) as token:
+        assert not token.cancelled
@@ -0,0 +1,147 @@
+import asyncio
+import os
+import time
+import pytest
+from unittest.mock import AsyncMock
+from elastic_transport import ApiResponseMeta, ConnectionError, HttpHeaders, NodeConfig
+from elasticsearch import BadRequestError
+from src.news_mcp_server.clients.circuit_breaker import (
+    STATE_CLOSED,
+    STATE_HALF_OPEN,
+    STATE_OPEN,
+    CircuitBreaker,
+)
+from src.news_mcp_server.clients.elastic_client import AsyncElasticClient
+from src.news_mcp_server.clients.stale_cache import DiskStaleCache
+from src.news_mcp_server.exceptions import CircuitOpenException, ToolException
+
+HITS = {'hits': {'hits': [{'_source': {'news_id': '1', 'title': 'AI', 'release_time': '2024-06-01'}}]}}
+
+
+def bad_request():
+    meta = ApiResponseMeta(status=400, http_version='1.1', headers=HttpHeaders(), duration=0.0,
+                           node=NodeConfig('http', 'localhost', 9200))
+    return BadRequestError('bad request', meta, {})
+
+
+def test_opens_on_failure_rate_and_recovers_through_half_open():
+    breaker = CircuitBreaker(failure_rate=0.5, min_calls=4, open_seconds=0, half_open_calls=2)
+    for _ in range(2):
+        breaker.before_call()
+        breaker.on_success(0.01)
+    breaker.before_call()
+    breaker.on_failure()
+    assert breaker.state == STATE_CLOSED
+    breaker.before_call()
+    breaker.on_failure()
+    assert breaker.state == STATE_OPEN
+
+    # open_seconds 到期后进入半开，只放行 half_open_calls 个探测
+    breaker.before_call()
+    breaker.before_call()
+    assert breaker.state == STATE_HALF_OPEN
+    with pytest.raises(CircuitOpenException):
+        breaker.before_call()
+    breaker.on_success(0.01)
+    breaker.on_success(0.01)
+    assert breaker.state == STATE_CLOSED
+
+
+def test_opens_on_slow_calls_and_reopens_on_failed_probe():
+    breaker = CircuitBreaker(slow_call_threshold=0.5, slow_call_rate=0.5, min_calls=2, open_seconds=60)
+    breaker.on_success(1.0)
+    breaker.on_success(1.0)
+    assert breaker.state == STATE_OPEN
+    with pytest.raises(CircuitOpenException):
+        breaker.before_call()
+
+    breaker.open_seconds = 0
+    breaker.before_call()
+    breaker.on_failure()
+    assert breaker.state == STATE_OPEN
+
+
+@pytest.mark.asyncio
+async def test_client_errors_do_not_trip_breaker():
+    client = AsyncElasticClient(breaker=CircuitBreaker(min_calls=1))
+    client._client.search = AsyncMock(side_effect=bad_request())
+    with pytest.raises(BadRequestError):
+        await client.search_news_with_secondary_filter('AI', '芯片')
+    assert client.breaker.state == STATE_CLOSED
+
+
+@pytest.mark.asyncio
+async def test_serves_stale_results_while_open(tmp_path):
+    client = AsyncElasticClient(breaker=CircuitBreaker(min_calls=1, open_seconds=60),
+                                stale_cache=DiskStaleCache(str(tmp_path)))
+    client._client.search = AsyncMock(return_value=HITS)
+    fresh = await client.search_news_with_secondary_filter('AI', '芯片')
+    assert 'stale' not in fresh[0]
+    await asyncio.sleep(0.05)  # 等待后台写缓存
+
+    client._client.search = AsyncMock(side_effect=ConnectionError('connection refused'))
+    stale = await client.search_news_with_secondary_filter('AI', '芯片')
+    assert stale[0]['news_id'] == '1'
+    assert stale[0]['stale'] is True
+    assert client.breaker.state == STATE_OPEN
+
+    # 打开期间不再请求 ES
+    again = await client.search_news_with_secondary_filter('AI', '芯片')
+    assert again[0]['stale'] is True
+    assert client._client.search.await_count == 1
+
+    # 没有缓存的查询照常报错
+    with pytest.raises(CircuitOpenException):
+        await client.search_news_with_secondary_filter('AI', '汽车')
+
+
+@pytest.mark.asyncio
+async def test_get_by_id_serves_stale_before_wrapping_errors(tmp_path):
+    client = AsyncElasticClient(breaker=CircuitBreaker(min_calls=1, open_seconds=60),
+                                stale_cache=DiskStaleCache(str(tmp_path)))
+    client._client.search = AsyncMock(return_value=HITS)
+    await client.get_by_id('1')
+    await asyncio.sleep(0.05)  # 等待后台写缓存
+
+    client._client.search = AsyncMock(side_effect=ConnectionError('connection refused'))
+    stale = await client.get_by_id('1')
+    assert stale['news_id'] == '1'
+    assert stale['stale'] is True
+    assert client.breaker.state == STATE_OPEN
+
+
+@pytest.mark.asyncio
+async def test_get_by_id_wraps_errors_after_stale_miss(tmp_path):
+    client = AsyncElasticClient(stale_cache=DiskStaleCache(str(tmp_path)))
+    client._client.search = AsyncMock(side_effect=ConnectionError('connection refused'))
+    with pytest.raises(ToolException, match='news_id 2'):
+        await client.get_by_id('2')
+
+
+@pytest.mark.asyncio
+async def test_disk_cache_deletes_expired_entries(tmp_path):
+    cache = DiskStaleCache(str(tmp_path), ttl=60)
+    await cache.set('old', {'value': 1})
+    path = cache._path('old')
+    stale_mtime = time.time() - 120
+    os.utime(path, (stale_mtime, stale_mtime))
+    assert await cache.get('old') is None
+    assert not os.path.exists(path)
+
+
+def test_disk_cache_sweep_bounds_entries(tmp_path):
+    cache = DiskStaleCache(str(tmp_path), ttl=60, max_entries=3, sweep_interval=3600)
+    for i in range(5):
+        cache._write(f'k{i}', {'value': i})
+        os.utime(cache._path(f'k{i}'), (time.time() - 10 + i, time.time() - 10 + i))
+    expired = cache._path('expired')
+    with open(expired, 'w') as f:
+        f.write('{}')
+    os.utime(expired, (time.time() - 120, time.time() - 120))
+    leftover = os.path.join(str(tmp_path), 'k9.json.1.tmp')
+    with open(leftover, 'w') as f:
+        f.write('{')
+    os.utime(leftover, (time.time() - 120, time.time() - 120))
+
+    assert cache.sweep() == 4
+    assert sorted(os.listdir(tmp_path)) == ['k2.json', 'k3.json', 'k4.json']
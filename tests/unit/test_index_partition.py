@@ -0,0 +1,88 @@
+import pytest
+from datetime import date
+from unittest.mock import AsyncMock, patch
+from src.news_mcp_server.clients.elastic_client import AsyncElasticClient
+from src.news_mcp_server.clients.index_partition import (
+    build_index_template,
+    build_routing_pipeline,
+    resolve_indices,
+    routing_pipeline_name,
+)
+
+
+def test_resolve_indices_single_index():
+    assert resolve_indices("news", "news-", "none", "2024-06-01", "2024-06-07") == "news"
+
+
+def test_resolve_indices_narrow_window():
+    result = resolve_indices("news", "news-", "monthly", "2024-06-01", "2024-06-07")
+    assert result == "news-2024.06"
+
+
+def test_resolve_indices_across_year():
+    result = resolve_indices("news", "news-", "monthly", "2023-11-15", "2024-01-02 10:00:00")
+    assert result == "news-2023.11,news-2023.12,news-2024.01"
+
+
+def test_resolve_indices_open_end_uses_today():
+    result = resolve_indices("news", "news-", "monthly", "2024-05-20", None, today=date(2024, 6, 3))
+    assert result == "news-2024.05,news-2024.06"
+
+
+@pytest.mark.parametrize("date_from, date_to", [
+    (None, "2024-06-07"),
+    ("bad-date", "2024-06-07"),
+    ("2024-06-07", "2024-06-01"),
+    ("2020-01-01", "2024-06-01"),
+])
+def test_resolve_indices_falls_back_to_alias(date_from, date_to):
+    assert resolve_indices("news", "news-", "monthly", date_from, date_to, max_partitions=24) == "news"
+
+
+def test_build_index_template():
+    template = build_index_template("news-", "news")
+    assert template["index_patterns"] == ["news-*"]
+    assert "news" in template["template"]["aliases"]
+    assert template["template"]["mappings"]["properties"]["release_time"]["type"] == "date"
+    title = template["template"]["mappings"]["properties"]["title"]
+    assert title["fields"]["suggest"]["type"] == "search_as_you_type"
+    assert title["fields"]["phrases"]["analyzer"] in template["template"]["settings"]["analysis"]["analyzer"]
+
+
+def test_routing_pipeline_matches_read_pruning():
+    # 写入按 release_time 月份落到 <prefix>yyyy.MM，与 resolve_indices 读取的分区名一致
+    processor = build_routing_pipeline("news-")["processors"][0]["date_index_name"]
+    assert processor["field"] == "release_time"
+    assert processor["index_name_prefix"] == "news-"
+    assert processor["date_rounding"] == "M"
+    assert processor["index_name_format"] == "yyyy.MM"
+    template = build_index_template("news-", "news", pipeline=routing_pipeline_name("news-"))
+    assert template["template"]["settings"]["index.default_pipeline"] == "news-route-by-release-time"
+    assert "index.default_pipeline" not in build_index_template("news-", "news")["template"]["settings"]
+
+
+@pytest.mark.asyncio
+async def test_put_index_template_uses_routing_pipeline():
+    client = AsyncElasticClient()
+    put_pipeline = AsyncMock(return_value={'acknowledged': True})
+    put_template = AsyncMock(return_value={'acknowledged': True})
+    with patch.object(client._client.ingest, 'put_pipeline', new=put_pipeline), \
+            patch.object(client._client.indices, 'put_index_template', new=put_template):
+        await client.put_routing_pipeline()
+        await client.put_index_template()
+    pipeline_id = put_pipeline.call_args.kwargs['id']
+    assert pipeline_id == routing_pipeline_name(client.index_prefix)
+    settings = put_template.call_args.kwargs['template']['settings']
+    assert settings['index.default_pipeline'] == pipeline_id
+
+
+@pytest.mark.asyncio
+async def test_search_hits_pruned_partitions():
+    client = AsyncElasticClient()
+    client.partition = "monthly"
+    search = AsyncMock(return_value={'hits': {'hits': []}})
+    with patch.object(client._client, 'search', new=search):
+        await client.search_news(query='test', date_from='2024-06-01', date_to='2024-07-02')
+    kwargs = search.call_args.kwargs
+    assert kwargs['index'] == f"{client.index_prefix}2024.06,{client.index_prefix}2024.07"
+    assert kwargs['ignore_unavailable'] is True
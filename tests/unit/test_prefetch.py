@@ -0,0 +1,83 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from src.news_mcp_server.services.news_service import NewsService
+from src.news_mcp_server.services.prefetch import DetailPrefetcher, PrefetchCache
+
+
+def make_doc(news_id):
+    return {'news_id': news_id, 'title': f'title {news_id}', 'release_time': '2024-01-01'}
+
+
+def make_client(docs):
+    client = MagicMock()
+    client.search_news = AsyncMock(return_value=docs)
+    client.get_many = AsyncMock(side_effect=lambda ids: {i: make_doc(i) for i in ids})
+    client.get_by_id = AsyncMock(side_effect=lambda news_id, cancel_token=None: make_doc(news_id))
+    return client
+
+
+def test_cache_bounds_and_ttl():
+    cache = PrefetchCache(max_sessions=1, max_items=2, ttl=60)
+    cache.put_many('s1', {'a': 1, 'b': 2, 'c': 3})
+    assert cache.get('s1', 'a') is None
+    assert cache.get('s1', 'c') == 3
+    cache.put_many('s2', {'a': 1})
+    assert cache.get('s1', 'c') is None
+    expired = PrefetchCache(ttl=-1)
+    expired.put_many('s1', {'a': 1})
+    assert expired.get('s1', 'a') is None
+
+
+@pytest.mark.asyncio
+async def test_read_served_from_prefetch():
+    client = make_client([make_doc('1'), make_doc('2'), make_doc('3')])
+    prefetcher = DetailPrefetcher(client, PrefetchCache(), top_k=2)
+    service = NewsService(client, prefetcher=prefetcher)
+
+    await service.search_news(query='x', session_id='s1')
+    item = await service.read_news('1', session_id='s1')
+
+    assert item.news_id == '1'
+    client.get_many.assert_awaited_once_with(['1', '2'])
+    client.get_by_id.assert_not_called()
+
+    await service.read_news('3', session_id='s1')
+    client.get_by_id.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_prefetch_is_per_session():
+    client = make_client([make_doc('1')])
+    service = NewsService(client, prefetcher=DetailPrefetcher(client, PrefetchCache()))
+    await service.search_news(query='x', session_id='s1')
+    await service.read_news('1', session_id='s2')
+    client.get_by_id.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_prefetch_skipped_when_busy():
+    client = make_client([make_doc('1')])
+    prefetcher = DetailPrefetcher(client, PrefetchCache(), is_busy=lambda: True)
+    prefetcher.schedule('s1', ['1'])
+    await asyncio.sleep(0)
+    client.get_many.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_prefetch_concurrency_budget():
+    client = make_client([])
+    release = asyncio.Event()
+
+    async def slow_get_many(ids):
+        await release.wait()
+        return {}
+
+    client.get_many = AsyncMock(side_effect=slow_get_many)
+    prefetcher = DetailPrefetcher(client, PrefetchCache(), max_concurrent=1)
+    prefetcher.schedule('s1', ['1'])
+    prefetcher.schedule('s2', ['2'])
+    await asyncio.sleep(0)
+    assert client.get_many.await_count == 1
+    release.set()
+    await prefetcher.close()
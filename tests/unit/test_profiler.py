@@ -0,0 +1,64 @@
+import time
+import pytest
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+from src.news_mcp_server.config.settings import app_settings
+from src.news_mcp_server.middlewares.profiling import RequestWindowProfilingMiddleware, get_profile
+from src.news_mcp_server.utils.profiler import SamplingProfiler
+
+
+def busy_work(seconds: float):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        sum(range(1000))
+
+
+def test_sampling_profiler_folded_output():
+    profiler = SamplingProfiler(interval=0.001).start()
+    busy_work(0.1)
+    profiler.stop()
+    assert profiler.sample_count > 0
+    folded = profiler.folded()
+    line = folded.splitlines()[0]
+    stack, count = line.rsplit(" ", 1)
+    assert int(count) > 0
+    assert "busy_work" in folded
+
+
+@pytest.fixture
+def profiled_app(monkeypatch):
+    monkeypatch.setattr(app_settings, "PROFILE_TOKEN", "secret")
+
+    async def slow(request):
+        busy_work(0.05)
+        return PlainTextResponse("ok")
+
+    app = Starlette(routes=[Route("/slow", slow),
+                            Route("/debug/profile/{profile_id}", get_profile)],
+                    middleware=[Middleware(RequestWindowProfilingMiddleware)])
+    return TestClient(app)
+
+
+def test_profiling_middleware_captures_request(profiled_app):
+    response = profiled_app.get("/slow", headers={"X-Profile-Token": "secret"})
+    assert response.text == "ok"
+    profile_id = response.headers["X-Profile-Id"]
+    profile = profiled_app.get(f"/debug/profile/{profile_id}", headers={"X-Profile-Token": "secret"})
+    assert profile.status_code == 200
+    assert "slow" in profile.text
+
+
+def test_profiling_middleware_off_without_token(profiled_app):
+    response = profiled_app.get("/slow", headers={"X-Profile-Token": "wrong"})
+    assert "X-Profile-Id" not in response.headers
+    assert profiled_app.get("/slow").status_code == 200
+
+
+def test_profiling_middleware_passthrough_when_disabled(profiled_app, monkeypatch):
+    monkeypatch.setattr(app_settings, "PROFILE_TOKEN", None)
+    response = profiled_app.get("/slow", headers={"X-Profile-Token": "secret"})
+    assert response.text == "ok"
+    assert "X-Profile-Id" not in response.headers
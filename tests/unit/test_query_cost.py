@@ -0,0 +1,103 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from mcp import McpError
+from src.news_mcp_server.clients.elastic_client import AsyncElasticClient
+from src.news_mcp_server.exceptions import QueryTooCostlyException
+from src.news_mcp_server.mcp_server import reject_costly_queries
+from src.news_mcp_server.services.news_service import NewsService
+from src.news_mcp_server.services.query_cost import (
+    ACTION_DOWNGRADE,
+    ACTION_REJECT,
+    ACTION_RUN,
+    ACTION_SPLIT,
+    QUERY_TOO_COSTLY_ERROR_CODE,
+    QueryBudget,
+    estimate_terms,
+    estimate_topic_cost,
+    plan_topic_query,
+)
+
+
+def words(prefix, n):
+    return [f'{prefix}{i}' for i in range(n)]
+
+
+def test_estimate_terms():
+    assert estimate_terms('人工智能') == 4
+    assert estimate_terms('华为 5G') == 3
+    assert estimate_terms('') == 0
+
+
+def test_estimate_topic_cost():
+    cost = estimate_topic_cost(['AI', '芯片'], ['美国', '出口'], ['新华社'], search_word='制裁', has_range=True)
+    assert cost.branches == 6
+    # 每个分支：锚点 + 筛选词 + search_word + 时间范围 + 外层 bool
+    assert cost.clauses == 30
+    assert cost.cost == (1 + 2 + 1) * 2 + (2 + 2) * 3 + (2 * 2 + 1) * 6
+
+
+def test_small_query_runs_unchanged():
+    plan = plan_topic_query(['AI'], ['芯片'], [], 15, QueryBudget())
+    assert plan.action == ACTION_RUN
+    assert plan.feedback is None
+    assert plan.size == 15
+
+
+def test_wide_query_is_split():
+    plan = plan_topic_query(words('p', 30), words('s', 4), words('src', 2), 15, QueryBudget(max_branches=40))
+    assert plan.action == ACTION_SPLIT
+    assert [len(c.primary_queries) + len(c.sources) for c in plan.chunks] == [10, 10, 10, 2]
+    assert [q for c in plan.chunks for q in c.primary_queries] == words('p', 30)
+    assert plan.feedback['applied']['sub_queries'] == 4
+
+
+def test_costly_query_is_downgraded():
+    plan = plan_topic_query(['人工智能产业链'], words('关键词', 10), [], 50, QueryBudget(max_cost=50))
+    assert plan.action == ACTION_DOWNGRADE
+    assert plan.filter_only is True
+    assert plan.size == 20
+    assert plan.feedback['applied'] == {'sub_queries': 1, 'size': 20, 'requested_size': 50, 'scoring': False}
+
+
+@pytest.mark.parametrize('primary, secondary, budget', [
+    (words('p', 100), words('s', 10), QueryBudget(max_branches=50, max_fanout=4)),
+    (['AI'], words('s', 80), QueryBudget(max_branches=64)),
+    (words('p', 10), words('s', 10), QueryBudget(reject_cost=100)),
+])
+def test_oversized_query_is_rejected(primary, secondary, budget):
+    plan = plan_topic_query(primary, secondary, [], 15, budget)
+    assert plan.action == ACTION_REJECT
+    assert plan.feedback['suggestions']
+
+
+@pytest.mark.asyncio
+async def test_split_query_fans_out_and_merges():
+    client = MagicMock()
+
+    async def search_topic_news(primary_queries, sources, max_results, filter_only, **kwargs):
+        data = [{'news_id': q, 'title': q, 'release_time': f'2024-06-{int(q[1:]) + 1:02d}'} for q in primary_queries]
+        # 不同子查询可能命中同一条新闻
+        data.append({'news_id': 'shared', 'title': 'shared', 'release_time': '2024-05-01'})
+        return AsyncElasticClient.SearchResponse(data=data, total=len(data))
+
+    client.search_topic_news = AsyncMock(side_effect=search_topic_news)
+    service = NewsService(client, budget=QueryBudget(max_branches=2))
+    result = await service.search_topic_news(words('p', 5), [], max_results=4)
+
+    assert client.search_topic_news.await_count == 3
+    assert [item.news_id for item in result['data']] == ['p4', 'p3', 'p2', 'p1']
+    assert result['total'] == 8
+    assert result['query_plan']['action'] == ACTION_SPLIT
+
+
+@pytest.mark.asyncio
+async def test_rejection_surfaces_structured_error():
+    service = NewsService(MagicMock(), budget=QueryBudget(reject_cost=1))
+    with pytest.raises(McpError) as exc_info:
+        async with reject_costly_queries():
+            await service.search_topic_news(['人工智能'], ['芯片'])
+    assert exc_info.value.error.code == QUERY_TOO_COSTLY_ERROR_CODE
+    assert exc_info.value.error.data['action'] == ACTION_REJECT
+
+    with pytest.raises(QueryTooCostlyException):
+        await service.search_topic_news(['人工智能'], ['芯片'])
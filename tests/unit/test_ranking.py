@@ -0,0 +1,126 @@
+import pytest
+from unittest.mock import AsyncMock
+from src.news_mcp_server.clients.elastic_client import AsyncElasticClient
+from src.news_mcp_server.clients.ranking import (
+    DEFAULT_PROFILES,
+    RANKING_HYBRID,
+    RANKING_RELEVANCE,
+    RANKING_TIME,
+    RankingProfile,
+    apply_ranking,
+    load_profiles,
+)
+from src.news_mcp_server.exceptions import ToolException
+from src.news_mcp_server.services.news_service import NewsService
+from src.news_mcp_server.services.query_cost import QueryBudget
+
+
+def test_time_ranking_sorts_by_release_time():
+    body = apply_ranking({'query': {'match_all': {}}}, RankingProfile(mode=RANKING_TIME))
+    assert body['sort'] == [{'release_time': {'order': 'desc'}}]
+    assert body['query'] == {'match_all': {}}
+
+
+def test_relevance_ranking_keeps_score_order():
+    body = apply_ranking({'query': {'match_all': {}}}, RankingProfile(mode=RANKING_RELEVANCE))
+    assert 'sort' not in body
+    assert RankingProfile(mode=RANKING_RELEVANCE).title_field() == 'title'
+    assert RankingProfile(mode=RANKING_RELEVANCE, title_boost=3).title_field() == 'title^3'
+    assert RankingProfile(mode=RANKING_TIME).title_field() == 'title'
+
+
+def test_hybrid_ranking_wraps_function_score():
+    profile = RankingProfile(mode=RANKING_HYBRID, scale='2d', recency_weight=0.6)
+    body = apply_ranking({'query': {'match_all': {}}}, profile)
+    function_score = body['query']['function_score']
+    assert function_score['query'] == {'match_all': {}}
+    assert function_score['score_mode'] == 'sum' and function_score['boost_mode'] == 'multiply'
+    constant, decay = function_score['functions']
+    assert constant == {'weight': pytest.approx(0.4)}
+    assert decay['gauss']['release_time']['scale'] == '2d'
+    assert decay['weight'] == 0.6
+    assert 'sort' not in body
+
+    only_decay = apply_ranking({'query': {}}, RankingProfile(mode=RANKING_HYBRID, recency_weight=1))
+    assert len(only_decay['query']['function_score']['functions']) == 1
+
+
+def test_load_profiles_overrides_and_validates():
+    profiles = load_profiles({'search_news': {'mode': 'hybrid', 'scale': '1d'}})
+    assert profiles['search_news'].mode == RANKING_HYBRID
+    assert profiles['search_news'].scale == '1d'
+    assert profiles['search_topic_news'] is DEFAULT_PROFILES['search_topic_news']
+    with pytest.raises(ValueError):
+        load_profiles({'search_news': {'mode': 'random'}})
+    with pytest.raises(ValueError):
+        load_profiles({'search_news': {'weight': 1}})
+
+
+@pytest.mark.asyncio
+async def test_default_profiles_keep_baseline_query_bodies():
+    client = AsyncElasticClient()
+    client._client.search = AsyncMock(return_value={'hits': {'hits': []}})
+    service = NewsService(client)
+
+    await service.search_news(query='AI', source='新华社')
+    assert client._client.search.await_args.kwargs['body'] == {'query': {'bool': {'must': [
+        {'multi_match': {'query': 'AI', 'fields': ['title', 'content']}},
+        {'term': {'source.keyword': '新华社'}},
+    ]}}}
+
+    await service.search_news_with_secondary_filter(primary_query='AI', secondary_query='芯片')
+    assert client._client.search.await_args.kwargs['body'] == {'query': {'bool': {'must': [
+        {'multi_match': {'query': 'AI', 'fields': ['title', 'content']}},
+        {'multi_match': {'query': '芯片', 'fields': ['title', 'content']}},
+    ]}}}
+
+
+@pytest.mark.asyncio
+async def test_service_passes_ranking_to_es():
+    client = AsyncElasticClient()
+    client._client.search = AsyncMock(return_value={'hits': {'hits': []}})
+    service = NewsService(client, rankings=load_profiles({'search_news': {'title_boost': 3}}))
+
+    await service.search_news(query='AI', ranking='hybrid')
+    params = client._client.search.await_args.kwargs
+    assert 'function_score' in params['body']['query']
+    assert 'title^3' in str(params['body'])
+
+    await service.search_news(query='AI')
+    assert 'function_score' not in client._client.search.await_args.kwargs['body']['query']
+
+    with pytest.raises(ToolException):
+        await service.search_news(query='AI', ranking='random')
+
+
+@pytest.mark.asyncio
+async def test_split_topic_query_merges_by_score():
+    client = AsyncElasticClient()
+    client._client.search = AsyncMock(side_effect=[
+        {'hits': {'total': {'value': 2}, 'hits': [
+            {'_score': 5.0, '_source': {'news_id': 'a', 'title': 'a', 'release_time': '2024-01-01'}},
+            {'_score': 1.0, '_source': {'news_id': 'b', 'title': 'b', 'release_time': '2024-03-01'}},
+        ]}},
+        {'hits': {'total': {'value': 2}, 'hits': [
+            {'_score': 3.0, '_source': {'news_id': 'c', 'title': 'c', 'release_time': '2024-02-01'}},
+            {'_score': 9.0, '_source': {'news_id': 'b', 'title': 'b', 'release_time': '2024-03-01'}},
+        ]}},
+    ])
+    service = NewsService(client, budget=QueryBudget(max_branches=1, fanout_concurrency=1))
+    result = await service.search_topic_news(primary_queries=['AI', '芯片'], secondary_query=[],
+                                             max_results=10, ranking='relevance')
+    assert result['query_plan']['action'] == 'split'
+    assert [item.news_id for item in result['data']] == ['b', 'a', 'c']
+
+
+@pytest.mark.asyncio
+async def test_downgraded_topic_query_falls_back_to_time():
+    client = AsyncElasticClient()
+    client._client.search = AsyncMock(return_value={'hits': {'hits': []}})
+    service = NewsService(client, budget=QueryBudget(max_cost=1))
+    result = await service.search_topic_news(primary_queries=['AI'], secondary_query=['芯片'],
+                                             max_results=10, ranking='hybrid')
+    assert result['query_plan']['action'] == 'downgrade'
+    body = client._client.search.await_args.kwargs['body']
+    assert 'function_score' not in str(body)
+    assert body['sort'] == [{'release_time': {'order': 'desc'}}]
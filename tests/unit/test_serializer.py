@@ -0,0 +1,94 @@
+import gzip
+import json
+import time
+import pytest
+from unittest.mock import AsyncMock
+from elasticsearch.serializer import JsonSerializer
+from src.news_mcp_server.clients.elastic_client import AsyncElasticClient
+from src.news_mcp_server.clients.serializers import SEARCH_FILTER_PATH, build_serializer
+
+try:
+    from elasticsearch.serializer import OrjsonSerializer
+except ImportError:
+    OrjsonSerializer = None
+
+ROUNDS = 200
+
+
+def make_response(hits: int = 100, filtered: bool = False) -> dict:
+    """模拟 search_topic_news 的 100 条命中响应，filtered 为按 SEARCH_FILTER_PATH 裁剪后的形态"""
+    docs = []
+    for i in range(hits):
+        source = {'news_id': f'600001_{i}', 'title': f'人工智能产业动态第{i}期：大模型应用加速落地',
+                  'source': '财经日报', 'url': f'https://news.example.com/a/{i}.html',
+                  'release_time': '2024-06-01 10:00:00'}
+        hit = {'_source': source, 'sort': [1717236000000, f'600001_{i}']}
+        if not filtered:
+            hit.update({'_index': 'news-2024.06', '_id': f'id-{i}', '_score': None, '_ignored': ['content.keyword']})
+        docs.append(hit)
+    response = {'took': 12, '_shards': {'total': 3, 'successful': 3, 'skipped': 0, 'failed': 0},
+                'hits': {'total': {'value': 1000, 'relation': 'gte'}, 'hits': docs}}
+    if not filtered:
+        response.update({'timed_out': False})
+        response['hits']['max_score'] = None
+    return response
+
+
+def cpu_per_response(decode, payload: bytes) -> float:
+    start = time.process_time()
+    for _ in range(ROUNDS):
+        decode(payload)
+    return (time.process_time() - start) / ROUNDS
+
+
+def test_build_serializer():
+    assert build_serializer('json') is None
+    with pytest.raises(ValueError):
+        build_serializer('yaml')
+    orjson_serializer = build_serializer('orjson')
+    assert (orjson_serializer is None) == (OrjsonSerializer is None)
+
+
+@pytest.mark.asyncio
+async def test_search_uses_filter_path():
+    client = AsyncElasticClient()
+    client._client.search = AsyncMock(return_value={'hits': {'hits': []}})
+    await client.search_news(query='test')
+    assert client._client.search.await_args.kwargs['filter_path'] == SEARCH_FILTER_PATH
+
+
+SERIALIZERS = [
+    ('json', JsonSerializer()),
+    pytest.param('orjson', OrjsonSerializer() if OrjsonSerializer else None,
+                 marks=pytest.mark.skipif(OrjsonSerializer is None, reason='orjson not installed')),
+]
+
+
+@pytest.mark.parametrize('name, serializer', SERIALIZERS)
+def test_filtered_response_decodes_and_shrinks(name, serializer):
+    full = json.dumps(make_response(), ensure_ascii=False).encode()
+    filtered = json.dumps(make_response(filtered=True), ensure_ascii=False).encode()
+    assert serializer.loads(full) == make_response()
+    assert serializer.loads(filtered) == make_response(filtered=True)
+    assert serializer.loads(gzip.decompress(gzip.compress(filtered))) == make_response(filtered=True)
+    assert len(filtered) < len(full)
+
+
+@pytest.mark.integration
+@pytest.mark.parametrize('name, serializer', SERIALIZERS)
+def test_response_decode_cpu_report(name, serializer):
+    """
+    每条 100 命中响应的解码 CPU 时间（含 gzip 解压），只输出报告不做断言，需显式运行：
+        pytest -s -m integration tests/unit/test_serializer.py
+    输出示例：
+    json   full: 0.326ms  filtered: 0.257ms  gzip+filtered: 0.297ms  bytes: 35435/26306/1502
+    """
+    full = json.dumps(make_response(), ensure_ascii=False).encode()
+    filtered = json.dumps(make_response(filtered=True), ensure_ascii=False).encode()
+    compressed = gzip.compress(filtered)
+
+    full_cpu = cpu_per_response(serializer.loads, full)
+    filtered_cpu = cpu_per_response(serializer.loads, filtered)
+    gzip_cpu = cpu_per_response(lambda payload: serializer.loads(gzip.decompress(payload)), compressed)
+    print(f"{name:<6} full: {full_cpu * 1000:.3f}ms  filtered: {filtered_cpu * 1000:.3f}ms  "
+          f"gzip+filtered: {gzip_cpu * 1000:.3f}ms  bytes: {len(full)}/{len(filtered)}/{len(compressed)}")
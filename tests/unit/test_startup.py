@@ -0,0 +1,44 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent.parent.parent
+
+# 冷启动预算（秒），可通过环境变量按机器性能调整
+IMPORT_TIME_BUDGET = float(os.getenv("IMPORT_TIME_BUDGET", 0.2))
+STARTUP_TIME_BUDGET = float(os.getenv("STARTUP_TIME_BUDGET", 3.0))
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import src.news_mcp_server.app as app_module
+imported = time.perf_counter()
+heavy_after_import = [m for m in ("fastapi", "fastmcp", "elasticsearch", "redis", "prometheus_client") if m in sys.modules]
+app_module.create_app()
+created = time.perf_counter()
+print(json.dumps({
+    "import": imported - start,
+    "startup": created - start,
+    "heavy_after_import": heavy_after_import,
+    "heavy_after_startup": [m for m in ("elasticsearch", "redis") if m in sys.modules],
+}))
+"""
+
+
+def run_probe() -> dict:
+    env = {**os.environ, "LOG_DIR": os.getenv("LOG_DIR", "/tmp/news_mcp_logs")}
+    env.setdefault("API_KEY", "test-key")
+    output = subprocess.run([sys.executable, "-c", PROBE], cwd=ROOT_DIR, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def test_cold_import_and_startup_budget():
+    result = run_probe()
+    assert result["heavy_after_import"] == []
+    assert result["import"] < IMPORT_TIME_BUDGET, f"import took {result['import']:.3f}s"
+    assert result["startup"] < STARTUP_TIME_BUDGET, f"create_app took {result['startup']:.3f}s"
+    # ES / Redis 客户端在 lifespan 与首个请求时才导入
+    assert result["heavy_after_startup"] == []
@@ -0,0 +1,128 @@
+import asyncio
+import time
+import pytest
+from unittest.mock import AsyncMock
+from src.news_mcp_server.clients.elastic_client import AsyncElasticClient
+from src.news_mcp_server.clients.serializers import TERMS_FILTER_PATH
+from src.news_mcp_server.exceptions import ToolException
+from src.news_mcp_server.services.news_service import NewsService
+from src.news_mcp_server.services.suggest import PrefixTrie, SuggestIndex, merge_phrases
+from src.news_mcp_server.services.tenants import Tenant
+
+SOURCES = [('新华社', 900), ('新华网', 500), ('新京报', 300), ('Reuters', 200), ('人民日报', 800)]
+PHRASES = [('人 工 智 能', 120), ('人 工', 150), ('芯 片', 90), ('open ai', 40)]
+
+
+def terms_response(buckets):
+    return {'aggregations': {'values': {'buckets': [{'key': k, 'doc_count': c} for k, c in buckets]}}}
+
+
+def make_index(search):
+    client = AsyncElasticClient()
+    client._client.search = search
+    return client, SuggestIndex(client, source_field='source.keyword', phrase_field='title.phrases',
+                                refresh_interval=600)
+
+
+def test_prefix_trie_orders_by_weight():
+    trie = PrefixTrie(SOURCES, top_k=3)
+    assert trie.complete('新') == [('新华社', 900), ('新华网', 500), ('新京报', 300)]
+    assert trie.complete('新华', limit=1) == [('新华社', 900)]
+    assert trie.complete('reu') == [('Reuters', 200)]
+    assert trie.complete('新闻') == []
+    assert trie.complete('') == [('新华社', 900), ('人民日报', 800), ('新华网', 500)]
+    assert len(trie) == len(SOURCES)
+
+
+def test_prefix_trie_keeps_top_k_per_node():
+    # 候选在构建时按节点预存，查询结果与词表大小无关，只取决于前缀节点上的前 K 个
+    trie = PrefixTrie(((f'来源{i:05d}', i) for i in range(20000)), top_k=20)
+    assert len(trie.complete('来源', 50)) == 20
+    assert [value for value, _ in trie.complete('来源0', 3)] == ['来源09999', '来源09998', '来源09997']
+    assert trie.complete('来源123', 10)[0] == ('来源12399', 12399)
+
+
+def test_merge_phrases_restores_cjk():
+    assert merge_phrases([('人 工 智 能', 3), ('open ai', 2), ('人工 智能', 5)]) == {'人工智能': 5, 'open ai': 2}
+
+
+@pytest.mark.asyncio
+async def test_suggest_index_refreshes_from_terms_aggregation():
+    search = AsyncMock(side_effect=[terms_response(SOURCES), terms_response(PHRASES)])
+    client, index = make_index(search)
+    await index.ensure_loaded()
+
+    source_call, phrase_call = search.await_args_list
+    assert source_call.kwargs['size'] == 0
+    assert source_call.kwargs['filter_path'] == TERMS_FILTER_PATH
+    assert source_call.kwargs['body']['aggs']['values']['terms'] == {'field': 'source.keyword', 'size': 2000}
+    assert phrase_call.kwargs['body']['query'] == {'range': {'release_time': {'gte': 'now-30d'}}}
+
+    assert index.complete('sources', '新华') == [{'value': '新华社', 'count': 900}, {'value': '新华网', 'count': 500}]
+    assert index.complete('phrases', '人工') == [{'value': '人工', 'count': 150}, {'value': '人工智能', 'count': 120}]
+
+    # 未过期时不再查询 ES
+    await index.ensure_loaded()
+    assert search.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_suggest_index_keeps_serving_when_refresh_fails():
+    search = AsyncMock(side_effect=[terms_response(SOURCES), terms_response(PHRASES), ConnectionError('down')])
+    client, index = make_index(search)
+    await index.ensure_loaded()
+    index._next_refresh = 0  # 模拟过期
+    await index.ensure_loaded()
+    await index._task
+    assert index.complete('sources', '人民') == [{'value': '人民日报', 'count': 800}]
+    assert index._next_refresh > time.monotonic()
+
+
+@pytest.mark.asyncio
+async def test_service_suggest_combines_memory_and_titles():
+    search = AsyncMock(side_effect=[
+        terms_response(SOURCES), terms_response(PHRASES),
+        {'hits': {'hits': [{'_source': {'news_id': '1', 'title': '人工智能芯片出口'}}]}},
+    ])
+    client, index = make_index(search)
+    service = NewsService(client, suggestions=index)
+
+    result = await service.suggest('人工', max_results=5)
+    assert result['sources'] == []
+    assert result['phrases'][0] == {'value': '人工', 'count': 150}
+    assert result['titles'][0].title == '人工智能芯片出口'
+    multi_match = search.await_args.kwargs['body']['query']['multi_match']
+    assert multi_match['type'] == 'bool_prefix'
+    assert multi_match['fields'] == ['title.suggest', 'title.suggest._2gram', 'title.suggest._3gram']
+
+    only_sources = await service.suggest('', kind='sources', max_results=2)
+    assert list(only_sources) == ['sources']
+    assert [item['value'] for item in only_sources['sources']] == ['新华社', '人民日报']
+    assert search.await_count == 3
+
+    with pytest.raises(ToolException):
+        await service.suggest('人工', kind='labels')
+
+
+def test_tenant_views_get_their_own_suggest_index():
+    client, index = make_index(AsyncMock())
+    service = NewsService(client, suggestions=index)
+    isolated = service.for_tenant(Tenant(name='a', key_hashes=(), index='news-a'))
+    shared = service.for_tenant(Tenant(name='b', key_hashes=()))
+    assert isolated.suggestions is not index and isolated.suggestions.client.index == 'news-a'
+    assert shared.suggestions is index
+
+
+@pytest.mark.asyncio
+async def test_closing_suggest_index_cancels_tenant_views():
+    client, index = make_index(AsyncMock())
+    service = NewsService(client, suggestions=index)
+    view = service.for_tenant(Tenant(name='a', key_hashes=(), index='news-a')).suggestions
+    # 租户配置重载后同一索引复用已有视图
+    reloaded = service.for_tenant(Tenant(name='a', key_hashes=(), index='news-a')).suggestions
+    assert reloaded is view
+    task = view.schedule_refresh()
+    await index.close()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert index._views == {}
@@ -0,0 +1,96 @@
+import pytest
+from unittest.mock import AsyncMock
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+from src.news_mcp_server.clients.elastic_client import AsyncElasticClient
+from src.news_mcp_server.middlewares.auth import IpAllowlist, SimpleAuthMiddleware
+from src.news_mcp_server.services.news_service import NewsService
+from src.news_mcp_server.services.tenants import TENANT_SCOPE_KEY, Tenant, TenantRegistry, hash_api_key
+
+TEAM_A = Tenant(name='team-a', key_hashes=(hash_api_key('key-a-old'), hash_api_key('key-a')),
+                index='news-team-a', max_results=5)
+TEAM_B = Tenant.from_dict({'name': 'team-b', 'key_sha256': hash_api_key('key-b').upper(), 'index': 'news-team-b'})
+
+
+def make_registry():
+    return TenantRegistry([TEAM_A, TEAM_B], default='team-b')
+
+
+def test_registry_authenticates_by_hash():
+    registry = make_registry()
+    assert registry.authenticate('key-a') is TEAM_A
+    assert registry.authenticate('key-a-old') is TEAM_A
+    assert registry.authenticate('key-b') is TEAM_B
+    assert registry.authenticate('wrong') is None
+    assert registry.default is TEAM_B
+
+
+def test_legacy_api_key_becomes_default_tenant():
+    registry = TenantRegistry.from_config(api_key='legacy')
+    tenant = registry.authenticate('legacy')
+    assert tenant.name == 'default' and tenant.index is None
+    assert 'legacy' not in repr(registry.tenants)
+
+
+def test_ip_allowlist_matches_cidrs_and_caches():
+    allowlist = IpAllowlist(['203.0.113.0/24', '2001:db8::/32'], allow_private=False, cache_size=2)
+    assert allowlist.is_allowed('203.0.113.7')
+    assert allowlist.is_allowed('2001:db8::1')
+    assert not allowlist.is_allowed('198.51.100.1')
+    assert not allowlist.is_allowed('not-an-ip')
+    assert allowlist.is_allowed('203.0.113.7')
+    info = allowlist.is_allowed.cache_info()
+    assert info.maxsize == 2 and info.hits == 0  # 容量为 2，前面的判定已被淘汰
+    assert allowlist.is_allowed('not-an-ip') is False
+    assert allowlist.is_allowed.cache_info().hits == 1
+    assert IpAllowlist([], allow_private=True).is_allowed('10.1.2.3')
+
+
+def make_app(seen):
+    async def whoami(request):
+        tenant = request.scope.get(TENANT_SCOPE_KEY)
+        seen.append(tenant)
+        return PlainTextResponse(tenant.name if tenant else '-')
+
+    return Starlette(routes=[Route('/whoami', whoami)],
+                     middleware=[Middleware(SimpleAuthMiddleware, registry=make_registry(),
+                                            allowlist=IpAllowlist([], allow_private=False))])
+
+
+def test_auth_middleware_sets_tenant():
+    seen = []
+    client = TestClient(make_app(seen))
+    assert client.get('/whoami', headers={'Authorization': 'Bearer key-a'}).text == 'team-a'
+    assert client.get('/whoami').status_code == 401
+    assert client.get('/whoami', headers={'Authorization': 'Bearer nope'}).status_code == 403
+    assert client.get('/whoami', headers={'Authorization': 'Bearer key-b', 'X-Forwarded-For': '8.8.8.8'}).text == 'team-b'
+    assert seen == [TEAM_A, TEAM_B]
+
+
+def test_auth_middleware_uses_default_tenant_for_allowlisted_ip():
+    app = Starlette(routes=[Route('/whoami', lambda r: PlainTextResponse(r.scope[TENANT_SCOPE_KEY].name))],
+                    middleware=[Middleware(SimpleAuthMiddleware, registry=make_registry(),
+                                           allowlist=IpAllowlist(['203.0.113.0/24'], allow_private=False))])
+    response = TestClient(app).get('/whoami', headers={'X-Forwarded-For': '203.0.113.9'})
+    assert response.text == 'team-b'
+
+
+@pytest.mark.asyncio
+async def test_tenant_views_route_index_and_cap_results():
+    client = AsyncElasticClient()
+    client._client.search = AsyncMock(return_value={'hits': {'hits': []}})
+    service = NewsService(client)
+
+    view = service.for_tenant(TEAM_A)
+    assert service.for_tenant(TEAM_A) is view
+    assert service.for_tenant(None) is service
+    await view.search_news(query='AI', max_results=50)
+    params = client._client.search.await_args.kwargs
+    assert params['index'] == 'news-team-a'
+    assert params['size'] == 5
+
+    await service.search_news(query='AI', max_results=50)
+    assert client._client.search.await_args.kwargs['index'] == client.index
@@ -0,0 +1,97 @@
+import json
+import pytest
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+from src.news_mcp_server.middlewares.tracing import SpanMiddleware, TracingMiddleware
+from src.news_mcp_server.utils.tracing import (
+    BatchSpanExporter,
+    FileSpanExporter,
+    TailSampler,
+    Tracer,
+    add_trace_context,
+    parse_traceparent,
+    tracer,
+)
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+class ListExporter:
+    def __init__(self):
+        self.spans = []
+
+    def export(self, spans):
+        self.spans.extend(spans)
+
+
+def test_parse_traceparent():
+    assert parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-01") == (TRACE_ID, PARENT_ID)
+    assert parse_traceparent("garbage") is None
+    assert parse_traceparent(f"00-{'0' * 32}-{PARENT_ID}-01") is None
+    assert parse_traceparent(None) is None
+
+
+def test_spans_nest_and_share_trace():
+    exporter = ListExporter()
+    local_tracer = Tracer("test", TailSampler(exporter, sample_ratio=1.0))
+    with local_tracer.start_span("root") as root:
+        with local_tracer.start_span("child") as child:
+            assert add_trace_context(None, "info", {})["span_id"] == child.span_id
+    assert child.trace_id == root.trace_id
+    assert child.parent_id == root.span_id
+    assert [span.name for span in exporter.spans] == ["child", "root"]
+
+
+def test_tail_sampler_keeps_errors_and_drops_fast_traces():
+    exporter = ListExporter()
+    local_tracer = Tracer("test", TailSampler(exporter, latency_threshold=10, sample_ratio=0.0))
+    with local_tracer.start_span("fast"):
+        pass
+    assert exporter.spans == []
+    with pytest.raises(ValueError):
+        with local_tracer.start_span("failing"):
+            with local_tracer.start_span("inner"):
+                raise ValueError("boom")
+    assert {span.name for span in exporter.spans} == {"failing", "inner"}
+
+
+def test_file_exporter_writes_otlp_json(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    exporter = FileSpanExporter(str(path))
+    local_tracer = Tracer("test", TailSampler(exporter, sample_ratio=1.0))
+    with local_tracer.start_span("es.search", **{"es.took_ms": 12}):
+        pass
+    exporter.flush()
+    payload = json.loads(path.read_text().splitlines()[0])
+    span = payload["resourceSpans"][0]["scopeSpans"][0]["spans"][0]
+    assert span["name"] == "es.search"
+    assert {"key": "es.took_ms", "value": {"intValue": "12"}} in span["attributes"]
+
+
+def test_batch_exporter_requires_write():
+    class NoWriteExporter(BatchSpanExporter):
+        pass
+
+    # 抽象基类在启动导出线程前就拒绝实例化
+    with pytest.raises(TypeError):
+        NoWriteExporter()
+
+
+def test_tracing_middleware_propagates_traceparent(monkeypatch):
+    exporter = ListExporter()
+    monkeypatch.setattr(tracer, "sampler", TailSampler(exporter, sample_ratio=1.0))
+
+    async def hello(request):
+        return PlainTextResponse("ok")
+
+    app = Starlette(routes=[Route("/hello", hello)],
+                    middleware=[Middleware(TracingMiddleware), Middleware(SpanMiddleware, name="auth")])
+    response = TestClient(app).get("/hello", headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-01"})
+    assert response.headers["x-trace-id"] == TRACE_ID
+    names = {span.name: span for span in exporter.spans}
+    assert names["http.request"].parent_id == PARENT_ID
+    assert names["middleware.auth"].parent_id == names["http.request"].span_id
@@ -0,0 +1,95 @@
+import pytest
+from unittest.mock import AsyncMock
+from src.news_mcp_server.clients.elastic_client import AsyncElasticClient
+from src.news_mcp_server.exceptions import ToolException
+from src.news_mcp_server.services.news_service import NewsService
+from src.news_mcp_server.services.watermark import watermark_key
+
+
+class MemoryWatermarks:
+    def __init__(self):
+        self.values = {}
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def set(self, key, watermark):
+        self.values[key] = watermark
+
+
+def make_doc(news_id, release_time):
+    return {'news_id': news_id, 'title': f'AI {news_id}', 'source': 'x', 'release_time': release_time}
+
+
+class FakeIndex:
+    """按 (release_time, news_id) 排序并实现 search_after 的简易替身"""
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.bodies = []
+
+    async def search(self, index, body, size, **kwargs):
+        self.bodies.append(body)
+        ordered = sorted(self.docs, key=lambda d: (d['release_time'], d['news_id']))
+        after = body.get('search_after')
+        if after:
+            ordered = [d for d in ordered if [d['release_time'], d['news_id']] > after]
+        hits = [{'_source': d, 'sort': [d['release_time'], d['news_id']]} for d in ordered[:size]]
+        return {'hits': {'hits': hits}}
+
+
+def make_service(docs):
+    client = AsyncElasticClient()
+    index = FakeIndex(docs)
+    client._client.search = AsyncMock(side_effect=index.search)
+    return NewsService(client, watermarks=MemoryWatermarks()), index
+
+
+def test_watermark_key():
+    assert watermark_key('s1', 'daily-ai', {'q': 1}) == 'sub:daily-ai'
+    assert watermark_key('s1', '', {'q': 1}) != watermark_key('s1', '', {'q': 2})
+    assert watermark_key(None, '', {'q': 1}) is None
+
+
+@pytest.mark.asyncio
+async def test_watch_returns_only_new_documents():
+    docs = [make_doc('1', '2024-06-01 10:00:00'), make_doc('2', '2024-06-01 10:00:00'),
+            make_doc('3', '2024-06-01 11:00:00')]
+    service, index = make_service(docs)
+
+    first = await service.watch_topic_news(['AI'], [], max_results=2, session_id='s1')
+    assert [item.news_id for item in first['data']] == ['1', '2']
+    assert first['has_more'] is True
+    assert first['watermark'] == {'release_time': '2024-06-01 10:00:00', 'news_id': '2'}
+
+    second = await service.watch_topic_news(['AI'], [], max_results=2, session_id='s1')
+    assert [item.news_id for item in second['data']] == ['3']
+    assert index.bodies[-1]['search_after'] == ['2024-06-01 10:00:00', '2']
+    # 水位的 release_time 作为范围下界
+    assert {'range': {'release_time': {'gte': '2024-06-01 10:00:00'}}} in \
+        index.bodies[-1]['query']['bool']['should'][0]['bool']['must']
+
+    docs.append(make_doc('4', '2024-06-01 12:00:00'))
+    third = await service.watch_topic_news(['AI'], [], max_results=2, session_id='s1')
+    assert [item.news_id for item in third['data']] == ['4']
+
+    empty = await service.watch_topic_news(['AI'], [], max_results=2, session_id='s1')
+    assert empty['count'] == 0
+    assert empty['watermark']['news_id'] == '4'
+
+
+@pytest.mark.asyncio
+async def test_named_subscription_survives_sessions():
+    service, index = make_service([make_doc('1', '2024-06-01 10:00:00')])
+    await service.watch_topic_news(['AI'], [], subscription='ai', session_id='s1')
+    result = await service.watch_topic_news(['AI'], [], subscription='ai', session_id='s2')
+    assert result['count'] == 0
+    # 首次调用未给 date_from 时使用默认回看窗口
+    assert 'search_after' not in index.bodies[0]
+
+
+@pytest.mark.asyncio
+async def test_watch_requires_session_or_subscription():
+    service, _ = make_service([])
+    with pytest.raises(ToolException):
+        await service.watch_topic_news(['AI'], [])